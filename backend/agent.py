@@ -0,0 +1,96 @@
+"""节点 agent：在节点本地周期性采集 GPU、守护进程、CPU 和内存（复用 probe.collect），批量推送到后端 /api/ingest。
+
+与 SSH 拉取相比，采样和 nvidia-smi 输出的解析都在节点上完成，后端只需应用上报的数据。
+host 文件中该节点需标记 source=push。脚本只依赖标准库，和 start_task.sh 一样从共享的 backend 目录运行（见 start_agent.sh）。
+
+示例:
+    python3 agent.py http://monitor:5000 --sample-interval 5 --push-interval 15
+"""
+import argparse
+import gzip
+import json
+import os
+import socket
+import sys
+import time
+from collections import deque
+from urllib import request as urllib_request
+from urllib.error import HTTPError, URLError
+
+from gpu_csv import parse_gpu_csv  # 同目录下的纯标准库模块
+from probe import collect
+
+script_dir = os.path.dirname(os.path.abspath(__file__))
+
+MAX_PENDING_REPORTS = 720  # 后端不可达时最多缓存的样本数，超出后丢弃最早的
+PUSH_TIMEOUT = 10  # 单次推送的超时时间（秒）
+
+
+def sample(guard_name: str, pidfile: str) -> dict:
+    """采集一个样本，GPU 信息在本地解析为行（格式见 gpu_csv.parse_gpu_csv），采集失败时 gpus 为 None。"""
+    data = collect(guard_name, pidfile=pidfile)
+    gpu_csv = data.pop('gpu_csv')
+    data['gpus'] = None if gpu_csv is None else parse_gpu_csv(gpu_csv)
+    data['ts'] = time.time()
+    return data
+
+
+def push(url: str, hostname: str, reports: list, token: str = None) -> bool:
+    """推送一批样本，返回这批样本是否可以丢弃：成功或被后端拒绝（4xx，重试无意义）时为 True。"""
+    body = gzip.compress(json.dumps({'hostname': hostname, 'reports': reports}, separators=(',', ':')).encode())
+    headers = {'Content-Type': 'application/json', 'Content-Encoding': 'gzip'}
+    if token:
+        headers['X-Ingest-Token'] = token
+    try:
+        with urllib_request.urlopen(urllib_request.Request(url, data=body, headers=headers, method='POST'),
+                                    timeout=PUSH_TIMEOUT):
+            return True
+    except HTTPError as e:
+        print(f"push rejected ({e.code}): {e.read()[:200].decode(errors='ignore')}", file=sys.stderr, flush=True)
+        return 400 <= e.code < 500
+    except (URLError, OSError) as e:
+        print(f"push failed, {len(reports)} reports pending: {e}", file=sys.stderr, flush=True)
+        return False
+
+
+def run(args):
+    url = args.server.rstrip('/') + '/api/ingest'
+    pending = deque(maxlen=MAX_PENDING_REPORTS)
+    next_push = time.monotonic()
+    while True:
+        started = time.monotonic()
+        try:
+            pending.append(sample(args.guard_name, args.pidfile))
+        except Exception as e:
+            print(f"sample failed: {e}", file=sys.stderr, flush=True)
+        if pending and started >= next_push:
+            if push(url, args.hostname, list(pending), args.token):
+                pending.clear()
+            next_push = started + args.push_interval
+        time.sleep(max(0.0, args.sample_interval - (time.monotonic() - started)))
+
+
+def main():
+    hostname = socket.gethostname()
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('server', type=str, help='后端地址，如 http://monitor:5000')
+    parser.add_argument('--hostname', type=str, default=hostname, help='上报的主机名，须与 host 文件中一致')
+    parser.add_argument('--guard-name', type=str, default=None, help='守护进程名，默认 gpu_guard_<主机名>')
+    parser.add_argument('--pidfile', type=str, default=None,
+                        help='start_task.sh 写入的守护进程 PID 文件，默认 ../tmp/<主机名>/gpu_guard.pid')
+    parser.add_argument('--sample-interval', type=float, default=5, help='采样间隔（秒）')
+    parser.add_argument('--push-interval', type=float, default=15, help='推送间隔（秒），期间的样本合并为一批')
+    parser.add_argument('--token', type=str, default=os.environ.get('GPU_MONITOR_INGEST_TOKEN'),
+                        help='与后端 GPU_MONITOR_INGEST_TOKEN 一致的令牌')
+    args = parser.parse_args()
+    # 默认值与后端 Node 的 guard_name/guard_pidfile 一致
+    args.guard_name = args.guard_name or f"gpu_guard_{args.hostname}"
+    args.pidfile = args.pidfile or os.path.normpath(os.path.join(script_dir, '../tmp', args.hostname, 'gpu_guard.pid'))
+    try:
+        run(args)
+    except KeyboardInterrupt:
+        return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,14 +1,131 @@
-from flask import Flask, render_template, jsonify, request
+from flask import Flask, render_template, jsonify, request, Response, stream_with_context, g
 from flask_cors import CORS # 引入 Flask-CORS，用于处理跨域问题
-from nodes import Nodes  # 引入 fake_nodes.py 中的 Nodes 类
+from nodes import Nodes  # 节点管理器；没有 GPU/SSH 时可传入 node_factory=fake_nodes.SimulatedNode 模拟节点（见 bench.py）
+from collector import Collector
+from history_store import HistoryStore
+from auto_guard import AutoGuard
+from guard_jobs import GuardJobs
+from metrics import REGISTRY, HTTP_REQUEST_SECONDS, export_cluster_state
+from wire import EncodedCache, ENCODINGS, dumps, to_compact
+from node_query import query_nodes
+from snapshot_store import SnapshotPublisher, SnapshotReader
+from power_trace import TraceRecorder
+from guard_sim import DEFAULT_INTERVALS, DEFAULT_STEP, DEFAULT_THRESHOLDS, HAS_NUMPY, parse_grid, simulate
+from functools import wraps
+from urllib import request as urllib_request
+from urllib.error import HTTPError, URLError
+import gzip
+import hmac
+import json
+import os
+import time
+import zlib
 from loguru import logger
 
 app = Flask(__name__)
 # 允许来自前端应用的跨域请求。在开发环境中，通常允许所有源。
 # 在生产环境中，建议只允许您的前端应用的特定来源。
-CORS(app) # 默认允许所有来源
+CORS(app, expose_headers=["ETag", "X-Snapshot-Age", "X-Snapshot-Time"]) # 默认允许所有来源，并暴露快照相关响应头
+
+HOST_FILE = os.environ.get("GPU_MONITOR_HOST_FILE", "/etc/volcano/all.host")  # 节点列表文件，可用环境变量覆盖
+COLLECT_INTERVAL = 5  # 后台采集周期（秒）
+FIRST_SNAPSHOT_TIMEOUT = 30  # 等待第一次采集完成的最长时间（秒）
+MAX_WORKERS = 32  # 并发操作节点的线程数
+NODE_TIMEOUT = 30  # 单个节点一次操作的截止时间（秒），超时的节点本轮返回旧数据
+STREAM_INTERVAL_MS = None  # 设置为毫秒数（如 500）开启常驻 nvidia-smi 采样，None 表示随采集周期获取
+HOST_FILE_WATCH_INTERVAL = 10  # 检查 host 文件变化的间隔（秒），变化后增量增删节点，无需重启
+HISTORY_DB_PATH = "../tmp/history.db"  # GPU 指标历史数据库（与日志同在 tmp 目录下）
+TRACE_DIR = "../tmp/traces"  # GPU 功耗轨迹目录，供 /api/guard_sim 和 guard_sim.py 离线回放守护策略
+TRACE_SAMPLE_INTERVAL = 15  # 每个 GPU 记录轨迹的最小间隔（秒）
+TRACE_RETENTION_DAYS = 14  # 功耗轨迹保留天数
+GUARD_SIM_MAX_CELLS = 20_000_000  # /api/guard_sim 回放的 GPU 数 × 时间步数上限（功耗矩阵约 160 MB）
+SSE_KEEPALIVE = 15  # 推送连接无数据时发送心跳注释的间隔（秒）
+AUTO_GUARD_ENABLED = True  # 是否默认开启后端自动守护
+# 守护进程参数：按目标利用率调节负载，GPU 上出现其他任务时立即退出让出显卡（见 gpu_guard.py --help）
+GUARD_ARGS = "--target-util 30 --yield-on-foreign"
+# 运行角色：all 为单进程（开发服务器）；collector 为唯一的采集进程，持有节点连接和守护状态，
+# 把快照发布到 SNAPSHOT_PATH 并在 CONTROL_PORT 上处理写操作；web 为无状态 worker（如 gunicorn 多进程），只读快照
+ROLE = os.environ.get("GPU_MONITOR_ROLE", "all")
+SNAPSHOT_PATH = os.environ.get("GPU_MONITOR_SNAPSHOT", "../tmp/snapshot.json")  # 采集进程发布的快照文件
+CONTROL_PORT = int(os.environ.get("GPU_MONITOR_CONTROL_PORT", 5001))  # 采集进程监听的本地端口（仅 127.0.0.1）
+CONTROL_URL = f"http://127.0.0.1:{CONTROL_PORT}"
+CONTROL_TIMEOUT = 30  # Web worker 转发写操作的超时时间（秒）
+# 设置后 agent.py 推送样本时须在 X-Ingest-Token 头中携带相同的值
+INGEST_TOKEN = os.environ.get("GPU_MONITOR_INGEST_TOKEN")
+FORWARDED_HEADERS = ('Content-Encoding', 'X-Ingest-Token')  # 转发给采集进程时保留的请求头（Content-Type 之外）
+QUERY_PARAMS = ('status', 'prefix', 'q', 'sort', 'order', 'page', 'limit')  # 出现任意一个时 /api/nodes_data 按查询返回
+
+if ROLE == 'web':
+    # 无状态 Web worker：只读取采集进程发布的快照，写操作转发给采集进程，不连接任何节点
+    nodes_manager = guard_jobs = auto_guard = None
+    collector = SnapshotReader(SNAPSHOT_PATH)
+    history_store = HistoryStore(HISTORY_DB_PATH) # 只用于查询，写入由采集进程完成
+    collector.start()  # /metrics 转发给采集进程，本进程的 REGISTRY 只记录接口耗时（见 /metrics/worker）
+else:
+    nodes_manager = Nodes(HOST_FILE, max_workers=MAX_WORKERS, node_timeout=NODE_TIMEOUT,
+                          stream_interval_ms=STREAM_INTERVAL_MS, watch_interval=HOST_FILE_WATCH_INTERVAL,
+                          guard_args=GUARD_ARGS) # 初始化节点管理器
+    collector = Collector(nodes_manager, interval=COLLECT_INTERVAL) # 后台采集器，负责按周期轮询节点
+    history_store = HistoryStore(HISTORY_DB_PATH) # GPU 指标持久化存储
+    nodes_manager.add_sample_listener(history_store.on_sample)
+    history_store.start()
+    trace_recorder = TraceRecorder(TRACE_DIR, sample_interval=TRACE_SAMPLE_INTERVAL,
+                                   retention_days=TRACE_RETENTION_DAYS) # 功耗轨迹，供守护策略离线回放
+    nodes_manager.add_sample_listener(trace_recorder.on_sample)
+    trace_recorder.start()
+    guard_jobs = GuardJobs(nodes_manager) # 守护进程启停任务，接口立即返回任务 ID
+    guard_jobs.add_listener(lambda job: collector.refresh()) # 任务完成后立即刷新快照，让前端尽快看到守护状态变化
+    auto_guard = AutoGuard(guard_jobs, enabled=AUTO_GUARD_ENABLED) # 后端自动守护策略，随采集周期评估
+
+    collector.add_listener(auto_guard.evaluate)
+    collector.add_listener(trace_recorder.on_snapshot) # 轨迹中标记守护期间的样本
+    if ROLE == 'collector':
+        collector.add_listener(SnapshotPublisher(SNAPSHOT_PATH, collector, nodes_manager).publish) # 发布快照给 Web worker
+    collector.start()
+    REGISTRY.add_collector(lambda: export_cluster_state(nodes_manager, collector)) # /metrics 抓取时导出节点和 GPU 状态
+    if nodes_manager.push_nodes and not INGEST_TOKEN:
+        logger.warning("host 文件中有 source=push 的节点，但未设置 GPU_MONITOR_INGEST_TOKEN，/api/ingest 将拒绝所有上报")
+response_cache = EncodedCache() # 按快照版本缓存序列化、压缩后的 /api/nodes_data 响应体
+
+
+@app.before_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+
+
+@app.after_request
+def record_request_time(response):
+    """记录每个接口的处理耗时（流式响应只统计到开始返回为止）。"""
+    started = g.pop('request_started', None)
+    if started is not None:
+        endpoint = request.url_rule.rule if request.url_rule else 'unmatched'
+        HTTP_REQUEST_SECONDS.observe(time.perf_counter() - started, endpoint=endpoint,
+                                     method=request.method, status=response.status_code)
+    return response
+
+
+def forward_to_collector(view):
+    """web 角色下把写操作和守护任务查询原样转发给采集进程（守护状态只在采集进程中维护）。"""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        if ROLE != 'web':
+            return view(*args, **kwargs)
+        headers = {name: request.headers[name] for name in FORWARDED_HEADERS if name in request.headers}
+        headers['Content-Type'] = request.content_type or 'application/json'
+        forwarded = urllib_request.Request(
+            CONTROL_URL + request.full_path.rstrip('?'), data=request.get_data() or None, method=request.method,
+            headers=headers)
+        try:
+            with urllib_request.urlopen(forwarded, timeout=CONTROL_TIMEOUT) as upstream:
+                status, body, content_type = upstream.status, upstream.read(), upstream.headers.get('Content-Type')
+        except HTTPError as e:
+            status, body, content_type = e.code, e.read(), e.headers.get('Content-Type')
+        except URLError as e:
+            logger.error(f"转发请求到采集进程失败: {e}")
+            return jsonify({"error": f"Collector unavailable: {e.reason}"}), 502
+        return Response(body, status=status, content_type=content_type)
+    return wrapper
 
-nodes_manager = Nodes("/etc/volcano/all.host") # 初始化节点管理器
 
 @app.route('/')
 def index():
@@ -20,32 +137,240 @@ def index():
 
 @app.route('/api/nodes_data')
 def get_nodes_data():
-    """API 端点：获取更新后的节点数据。"""
-    nodes_manager.update() # 更新节点信息
-    return jsonify(nodes_manager.to_dict()) # 返回 JSON 格式的节点数据
+    """API 端点：返回后台采集器缓存的最新节点快照，不在请求中执行远程命令。
+
+    不带参数时返回节点列表，并支持 ETag/If-None-Match（快照未变化时返回 304）。
+    带 since=<version>&epoch=<epoch> 时返回该版本之后的增量：
+    {"epoch", "version", "full", "nodes", "removed"}，epoch 不匹配或版本过旧时返回全量（full=true）。
+    增量形式可加 format=compact，GPU 数据按列存放（见 wire.to_compact）。
+    带 status/prefix/q/sort/order/page/limit 中任意参数时在服务端筛选、排序和分页（见 node_query.query_nodes），
+    返回 {"epoch", "version", "total", "page", "limit", "nodes", "summary"}，summary 为集群汇总（见 Collector.summary）。
+    响应体按快照版本缓存，并按 Accept-Encoding 使用 br/gzip 压缩。
+    """
+    collector.wait_ready(FIRST_SNAPSHOT_TIMEOUT) # 服务刚启动时等待第一次采集完成
+    since = request.args.get('since', type=int)
+    compact = request.args.get('format') == 'compact'
+    encoding = request.accept_encodings.best_match(ENCODINGS)
+    etag = None
+    if any(name in request.args for name in QUERY_PARAMS):
+        args = request.args
+        try:
+            page, limit = args.get('page', 1, type=int), args.get('limit', type=int)
+            snapshot = collector.full()
+            total, nodes = query_nodes(snapshot['nodes'], status=args.get('status', 'all'), prefix=args.get('prefix'),
+                                       search=args.get('q'), sort=args.get('sort', 'hostname'),
+                                       order=args.get('order'), page=page, limit=limit)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        payload = {'epoch': snapshot['epoch'], 'version': snapshot['version'], 'total': total, 'page': page,
+                   'limit': limit, 'nodes': nodes, 'summary': collector.summary()}
+        etag = f"{payload['epoch']}-{payload['version']}-{zlib.crc32(request.query_string):08x}"
+        if request.if_none_match.contains(etag):
+            response = app.response_class(status=304)
+            response.set_etag(etag)
+            return add_snapshot_headers(response)
+        key = ('query', payload['epoch'], payload['version'], request.query_string)
+        build = lambda: dumps(to_compact(payload) if compact else payload)
+    elif since is not None:
+        payload = None
+        if request.args.get('epoch') == collector.epoch:
+            payload = collector.delta(since)
+        if payload is None:
+            payload = collector.full()
+        key = ('payload', payload['epoch'], payload['version'], None if payload['full'] else since, compact)
+        build = lambda: dumps(to_compact(payload) if compact else payload)
+    else:
+        payload = collector.full()
+        etag = f"{payload['epoch']}-{payload['version']}"
+        if request.if_none_match.contains(etag):
+            response = app.response_class(status=304)
+            response.set_etag(etag)
+            return add_snapshot_headers(response)
+        key = ('list', payload['epoch'], payload['version'])
+        build = lambda: dumps(payload['nodes']) # 返回 JSON 格式的节点数据
+
+    body, used_encoding = response_cache.encoded(key, build, encoding)
+    response = app.response_class(body, mimetype='application/json')
+    response.vary.add('Accept-Encoding')
+    if used_encoding:
+        response.headers['Content-Encoding'] = used_encoding
+    if etag:
+        response.set_etag(etag)
+    return add_snapshot_headers(response)
+
+
+def add_snapshot_headers(response):
+    _, snapshot_time = collector.snapshot()
+    age = collector.age()
+    if age is not None:
+        # 快照的生成时间和年龄（秒），前端可据此判断数据新鲜度
+        response.headers['X-Snapshot-Age'] = f"{age:.3f}"
+        response.headers['X-Snapshot-Time'] = f"{snapshot_time:.3f}"
+    return response
+
+
+@app.route('/api/status')
+def get_status():
+    """API 端点：后端运行状态（节点初始化进度、启动耗时、采集耗时与快照年龄）。"""
+    status = nodes_manager.status() if nodes_manager is not None else {} # web 角色的节点状态随快照一起发布
+    status.update(collector.status())
+    status['role'] = ROLE
+    return jsonify(status)
+
+
+@app.route('/metrics')
+@forward_to_collector
+def metrics():
+    """Prometheus 抓取端点：命令耗时、SSH 重连、采集耗时、快照年龄、守护启停次数和每个 GPU 的数值。
+
+    web 角色下转发给采集进程，因此无论请求落到哪个 worker，抓取到的都是采集进程的指标。
+    """
+    return worker_metrics()
+
+
+@app.route('/metrics/worker')
+def worker_metrics():
+    """本进程的指标；web 角色下只有该 worker 的接口耗时（每个 gunicorn worker 各自计数）。"""
+    return Response(REGISTRY.render(), mimetype='text/plain; version=0.0.4; charset=utf-8')
+
+
+@app.route('/api/stream')
+def stream_nodes_data():
+    """SSE 端点：快照变化时推送节点增量（格式同 /api/nodes_data?since=...）。
+
+    连接建立时先推送一次全量或 since 之后的增量，之后每次采集到变化就推送一次。
+    事件 id 为 "<epoch>:<version>"，浏览器断线重连时通过 Last-Event-ID 续传。format=compact 时推送紧凑格式。
+    view=summary 时只推送 summary 事件 {"epoch", "version", "summary"}，前端据此刷新集群汇总并重新请求当前页。
+    """
+    if request.args.get('view') == 'summary':
+        return Response(stream_with_context(summary_events()), mimetype='text/event-stream',
+                        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+    since = request.args.get('since', type=int)
+    compact = request.args.get('format') == 'compact'
+    epoch = request.args.get('epoch')
+    last_event_id = request.headers.get('Last-Event-ID')
+    if last_event_id and ':' in last_event_id:
+        epoch, _, last_version = last_event_id.partition(':')
+        since = int(last_version) if last_version.isdigit() else None
+
+    def events():
+        collector.wait_ready(FIRST_SNAPSHOT_TIMEOUT)
+        version = since if epoch == collector.epoch else None
+        current_epoch = collector.epoch
+        while True:
+            payload = collector.delta(version) if version is not None else None
+            if payload is None or payload['epoch'] != current_epoch: # 采集进程重启后版本号重新计数，改发全量
+                payload = collector.full()
+            current_epoch = payload['epoch']
+            if payload['full'] or payload['nodes'] or payload['removed']:
+                # 与 /api/nodes_data 共用缓存，多个推送连接只序列化一次
+                key = ('payload', payload['epoch'], payload['version'], None if payload['full'] else version, compact)
+                body, _ = response_cache.encoded(key, lambda: dumps(to_compact(payload) if compact else payload), None)
+                data = body.decode('utf-8')
+                yield f"id: {payload['epoch']}:{payload['version']}\nevent: nodes\ndata: {data}\n\n"
+            version = payload['version']
+            if not collector.wait_for_change(version, timeout=SSE_KEEPALIVE):
+                yield ": keepalive\n\n"
+
+    return Response(stream_with_context(events()), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+
+def summary_events():
+    collector.wait_ready(FIRST_SNAPSHOT_TIMEOUT)
+    while True:
+        snapshot = collector.full()
+        data = dumps({'epoch': snapshot['epoch'], 'version': snapshot['version'], 'summary': collector.summary()})
+        yield f"id: {snapshot['epoch']}:{snapshot['version']}\nevent: summary\ndata: {data.decode('utf-8')}\n\n"
+        while not collector.wait_for_change(snapshot['version'], timeout=SSE_KEEPALIVE):
+            yield ": keepalive\n\n"
+
+
+@app.route('/api/history')
+def get_history():
+    """API 端点：查询 GPU 指标历史。
+
+    参数: metric (utilization/memory_used/power_draw/temperature/power_max，默认 power_draw)，
+    start/end (Unix 秒，默认最近 1 小时)，hostname、gpu (可选)，tier (raw/1m/1h，默认按范围自动选择)。
+    """
+    end = request.args.get('end', default=time.time(), type=float)
+    start = request.args.get('start', default=end - 3600, type=float)
+    try:
+        result = history_store.query(
+            metric=request.args.get('metric', 'power_draw'),
+            start=start,
+            end=end,
+            hostname=request.args.get('hostname'),
+            gpu=request.args.get('gpu', type=int),
+            tier=request.args.get('tier'),
+        )
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    return jsonify(result)
+
+
+@app.route('/api/guard_sim')
+def api_guard_sim():
+    """API 端点：用记录的功耗轨迹离线回放一组守护策略（见 guard_sim.simulate），不影响在线守护。
+
+    参数: hours (回放最近多少小时，默认 24)，end (Unix 秒，默认当前时间)，
+    thresholds/intervals (活跃功耗阈值 W/不活跃判断间隔分钟，"50,100,150" 或 "50:300:25"，默认见 guard_sim)，
+    step (时间网格步长秒，默认 60)，guard_power (守护功耗 W，默认从轨迹估计)，prefix (主机名前缀)。
+    需要 numpy；GPU 数 × 时间步数超过 GUARD_SIM_MAX_CELLS 时返回 400。
+    """
+    if not HAS_NUMPY:
+        return jsonify({"error": "guard_sim requires numpy, install it or run guard_sim.py offline"}), 503
+    end = request.args.get('end', default=time.time(), type=float)
+    hours = request.args.get('hours', default=24, type=float)
+    try:
+        thresholds = parse_grid(request.args['thresholds']) if 'thresholds' in request.args else DEFAULT_THRESHOLDS
+        intervals = parse_grid(request.args['intervals']) if 'intervals' in request.args else DEFAULT_INTERVALS
+        result = simulate(TRACE_DIR, end - hours * 3600, end, thresholds, intervals,
+                          step=request.args.get('step', default=DEFAULT_STEP, type=float),
+                          guard_power=request.args.get('guard_power', type=float),
+                          prefix=request.args.get('prefix'), max_cells=GUARD_SIM_MAX_CELLS)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    return jsonify(result)
 
 
 @app.route('/api/start_guard', methods=['POST'])
+@forward_to_collector
 def api_start_guard():
-    """API 端点：在指定节点（或所有节点）上启动守护进程。"""
+    """API 端点：在指定节点（或所有节点）上启动守护进程。
+
+    立即返回 202 和任务信息 {"id", "status", "results", ...}，通过 /api/guard_jobs/<id> 查询确认结果。
+    """
     data = request.get_json() # 获取 POST 请求的 JSON 数据
     hostnames = data.get('hostnames', []) # 获取 hostnames 列表，默认为空列表
     logger.info(f"尝试在以下节点启动守护进程: {hostnames if hostnames else '所有节点'}")
-    results = nodes_manager.start_guard(hostnames) # 调用节点管理器的启动方法
-    return jsonify({"status": "success", "results": results}) # 返回操作结果
+    job = guard_jobs.submit('start', hostnames) # 后台执行启动和确认
+    return jsonify({"status": "accepted", "job_id": job['id'], "job": job}), 202
 
 
 @app.route('/api/stop_guard', methods=['POST'])
+@forward_to_collector
 def api_stop_guard():
-    """API 端点：在指定节点（或所有节点）上停止守护进程。"""
+    """API 端点：在指定节点（或所有节点）上停止守护进程，返回方式同 /api/start_guard。"""
     data = request.get_json()
     hostnames = data.get('hostnames', [])
     logger.info(f"尝试在以下节点停止守护进程: {hostnames if hostnames else '所有节点'}")
-    results = nodes_manager.stop_guard(hostnames)
-    return jsonify({"status": "success", "results": results})
+    job = guard_jobs.submit('stop', hostnames)
+    return jsonify({"status": "accepted", "job_id": job['id'], "job": job}), 202
+
+
+@app.route('/api/guard_jobs/<job_id>')
+@forward_to_collector
+def api_guard_job(job_id):
+    """API 端点：查询守护进程启停任务。status 为 done 时 results 中是每个节点的最终结果。"""
+    job = guard_jobs.get(job_id)
+    if job is None:
+        return jsonify({"error": f"Unknown job: {job_id}"}), 404
+    return jsonify(job)
 
 
 @app.route('/api/guard_policy', methods=['POST'])
+@forward_to_collector
 def api_updagte_guard_policy():
     """API 端点：更新守护策略。"""
     received_data = request.get_json()
@@ -54,26 +379,89 @@ def api_updagte_guard_policy():
 
     active_power_threshold = policy_data.get('active_power_threshold')
     guard_interval_minutes = policy_data.get('guard_interval_minutes')
+    enabled = policy_data.get('enabled') # 自动守护开关（可选）
 
+    # 先校验全部字段，任何一个不合法时都不做修改
     if active_power_threshold is None or guard_interval_minutes is None:
         return jsonify({"error": "Missing 'active_power_threshold' or 'guard_interval_minutes' in policy data"}), 400
+    if enabled is not None and not isinstance(enabled, bool):
+        return jsonify({"error": "Invalid value for 'enabled'. Must be a boolean."}), 400
+    try:
+        active_power_threshold = int(active_power_threshold)
+        guard_interval_minutes = int(guard_interval_minutes)
+    except (TypeError, ValueError):
+        return jsonify({"error": "Invalid value for threshold or interval. Must be integers."}), 400
 
     try:
-        # 调用 nodes_manager.update_guard_policy
-        # 确保参数名称和顺序与 FakeNode.update_guard_policy(self, need_guard_interval, active_power_threshold) 匹配
+        # 调用 nodes_manager.update_guard_policy，参数与 Node.update_guard_policy(need_guard_interval, active_power_threshold) 一致
         nodes_manager.update_guard_policy(
-            need_guard_interval=int(guard_interval_minutes), # 对应 FakeNode 的 need_guard_interval
-            active_power_threshold=int(active_power_threshold) # 对应 FakeNode 的 active_power_threshold
+            need_guard_interval=guard_interval_minutes, # 不活跃判断间隔（分钟）
+            active_power_threshold=active_power_threshold # 活跃功耗阈值（W）
         )
+        if enabled is not None:
+            auto_guard.update(enabled=enabled)
+        collector.refresh() # need_guard 依赖策略参数，刷新快照
         logger.info(f"在全部节点更新守护进程策略: Active Power Threshold={active_power_threshold}, Guard Interval Minutes={guard_interval_minutes}")
         return jsonify({"status": "success", "message": "Guard policy updated successfully"})
-    except ValueError:
-        return jsonify({"error": "Invalid value for threshold or interval. Must be integers."}), 400
     except Exception as e:
         logger.error(f"更新守护策略失败: {e}")
         return jsonify({"error": f"Failed to update guard policy: {str(e)}"}), 500
 
 
+@app.route('/api/auto_guard', methods=['GET', 'POST'])
+@forward_to_collector
+def api_auto_guard():
+    """API 端点：查询或修改后端自动守护的状态与参数。
+
+    POST 请求体可包含 enabled、confirm_rounds、cooldown、max_starts_per_round 中的任意字段。
+    """
+    if request.method == 'POST':
+        data = request.get_json() or {}
+        try:
+            auto_guard.update(
+                enabled=data.get('enabled'),
+                confirm_rounds=data.get('confirm_rounds'),
+                cooldown=data.get('cooldown'),
+                max_starts_per_round=data.get('max_starts_per_round'),
+            )
+        except (TypeError, ValueError):
+            return jsonify({"error": "Invalid auto guard settings. 'enabled' must be a boolean and numeric fields integers."}), 400
+        logger.info(f"更新自动守护设置: {data}")
+    return jsonify(auto_guard.to_dict())
+
+
+@app.route('/api/ingest', methods=['POST'])
+@forward_to_collector
+def api_ingest():
+    """API 端点：接收节点 agent.py 推送的一批样本 {"hostname", "reports": [...]}，请求体可用 gzip 压缩。
+
+    只接受 host 文件中标记为 source=push 的节点，其他主机返回 404；样本格式见 PushNode.ingest。
+    必须设置 GPU_MONITOR_INGEST_TOKEN，未设置时拒绝所有上报（503）。
+    """
+    if not INGEST_TOKEN:
+        return jsonify({"error": "Ingest is disabled: set GPU_MONITOR_INGEST_TOKEN on the server"}), 503
+    if not hmac.compare_digest(request.headers.get('X-Ingest-Token', ''), INGEST_TOKEN):
+        return jsonify({"error": "Invalid ingest token"}), 403
+    try:
+        body = request.get_data()
+        if request.content_encoding == 'gzip':
+            body = gzip.decompress(body)
+        data = json.loads(body)
+        hostname, reports = data['hostname'], data['reports']
+        if not isinstance(reports, list):
+            raise TypeError("reports must be a list")
+        accepted = nodes_manager.ingest(hostname, reports)
+    except (OSError, EOFError, zlib.error, ValueError, KeyError, TypeError, IndexError) as e:
+        return jsonify({"error": f"Invalid ingest payload: {e}"}), 400
+    if not accepted:
+        return jsonify({"error": f"Unknown push host: {hostname}"}), 404
+    return jsonify({"status": "ok", "accepted": len(reports)})
+
+
 if __name__ == '__main__':
-    # 运行 Flask 应用，监听所有网络接口的 5000 端口，并关闭调试模式
-    app.run(debug=False, host='0.0.0.0', port=5000)
\ No newline at end of file
+    if ROLE == 'collector':
+        # 采集进程只在本机提供写操作接口，对外服务由 web worker 承担（见 start_prod.sh）
+        app.run(debug=False, host='127.0.0.1', port=CONTROL_PORT, threaded=True)
+    else:
+        # 运行 Flask 应用，监听所有网络接口的 5000 端口，并关闭调试模式
+        app.run(debug=False, host='0.0.0.0', port=5000, threaded=True) # 每个推送连接占用一个线程
\ No newline at end of file
@@ -0,0 +1,101 @@
+import threading
+import time
+from collections import deque
+from typing import List
+
+from loguru import logger
+
+
+class AutoGuard:
+    """后端自动守护策略：每次采集完成后根据快照判断哪些节点需要守护并启动守护进程。
+
+    - 滞回：节点需连续 confirm_rounds 次采集都判定为需要守护才会启动，避免瞬时低功耗触发；
+    - 冷却：对同一节点发起启动后 cooldown 秒内不再重复尝试；
+    - 限速：每轮最多启动 max_starts_per_round 个节点，其余留到下一轮。
+
+    启动通过 GuardJobs 异步执行，不阻塞采集线程；recent_actions 记录任务 ID，可通过 /api/guard_jobs/<id> 查询结果。
+    """
+
+    def __init__(self, guard_jobs, enabled=True, confirm_rounds=2, cooldown=600, max_starts_per_round=20):
+        self.guard_jobs = guard_jobs
+        self.enabled = enabled
+        self.confirm_rounds = confirm_rounds
+        self.cooldown = cooldown
+        self.max_starts_per_round = max_starts_per_round
+
+        self._lock = threading.Lock()
+        self._idle_rounds = {}  # hostname -> 连续判定为需要守护的次数
+        self._last_start = {}  # hostname -> 上次发起启动的时间
+        self.recent_actions = deque(maxlen=50)
+
+    def update(self, enabled=None, confirm_rounds=None, cooldown=None, max_starts_per_round=None):
+        """修改参数，None 表示不变。先校验全部参数，不合法时抛出 TypeError/ValueError，不修改任何参数。"""
+        if enabled is not None and not isinstance(enabled, bool):
+            raise TypeError(f"enabled must be a boolean, got {enabled!r}")
+        confirm_rounds = None if confirm_rounds is None else max(1, int(confirm_rounds))
+        cooldown = None if cooldown is None else max(0, int(cooldown))
+        max_starts_per_round = None if max_starts_per_round is None else max(1, int(max_starts_per_round))
+        with self._lock:
+            if enabled is not None:
+                self.enabled = enabled
+            if confirm_rounds is not None:
+                self.confirm_rounds = confirm_rounds
+            if cooldown is not None:
+                self.cooldown = cooldown
+            if max_starts_per_round is not None:
+                self.max_starts_per_round = max_starts_per_round
+            if not self.enabled:
+                self._idle_rounds.clear()
+
+    def evaluate(self, snapshot: List[dict]) -> List[str]:
+        """采集器回调：评估快照，返回本轮启动守护的节点列表。"""
+        with self._lock:
+            if not self.enabled:
+                return []
+            now = time.time()
+            candidates = []
+            for node in snapshot:
+                hostname = node['hostname']
+                # need_guard 表示存在空闲且未守护的 GPU，启动时只会守护这些 GPU
+                idle = node['is_online'] and not node.get('stale') and node['need_guard']
+                self._idle_rounds[hostname] = self._idle_rounds.get(hostname, 0) + 1 if idle else 0
+                if self._idle_rounds[hostname] < self.confirm_rounds:
+                    continue
+                if now - self._last_start.get(hostname, 0) < self.cooldown:
+                    continue
+                candidates.append(hostname)
+            # 清理已从集群移除的节点
+            hostnames = {node['hostname'] for node in snapshot}
+            for states in (self._idle_rounds, self._last_start):
+                for hostname in [h for h in states if h not in hostnames]:
+                    del states[hostname]
+            launch = candidates[:self.max_starts_per_round]
+            for hostname in launch:
+                self._last_start[hostname] = now
+                self._idle_rounds[hostname] = 0
+
+        if not launch:
+            return []
+        logger.info(f"自动守护：检测到 {launch} 需要守护，正在启动")
+        job = self.guard_jobs.submit('start', launch)
+        self.recent_actions.appendleft({
+            'time': time.strftime('%Y-%m-%d %H:%M:%S'),
+            'hostnames': launch,
+            'job_id': job['id'],
+            'deferred': len(candidates) - len(launch),
+        })
+        return launch
+
+    def to_dict(self) -> dict:
+        with self._lock:
+            now = time.time()
+            return {
+                'enabled': self.enabled,
+                'confirm_rounds': self.confirm_rounds,
+                'cooldown': self.cooldown,
+                'max_starts_per_round': self.max_starts_per_round,
+                'pending': {h: n for h, n in self._idle_rounds.items() if n > 0},
+                'cooling_down': {h: round(self.cooldown - (now - t)) for h, t in self._last_start.items()
+                                 if now - t < self.cooldown},
+                'recent_actions': list(self.recent_actions),
+            }
@@ -0,0 +1,206 @@
+"""在没有 GPU 的机器上压测后端：用 fake_nodes.SimulatedNode 模拟 N 个节点，测量采集耗时、接口延迟、内存和 CPU。
+
+示例:
+    python bench.py --nodes 2000 --latency 0.05 --failure-rate 0.01 --sweeps 5 --requests 500
+    python bench.py --nodes 500 --gpu-format mixed --json bench.json
+"""
+import argparse
+import json
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from fake_nodes import GPU_FORMATS, SimulatedNode, SimulationProfile
+from gpu_csv import parse_gpu_batch
+
+
+def percentile(values, pct):
+    values = sorted(values)
+    if not values:
+        return None
+    k = min(len(values) - 1, max(0, round(pct / 100 * (len(values) - 1))))
+    return values[k]
+
+
+def rss_mib() -> float:
+    """当前进程常驻内存（MiB），读取 /proc/self/statm。"""
+    try:
+        with open('/proc/self/statm') as f:
+            pages = int(f.read().split()[1])
+        return pages * os.sysconf('SC_PAGE_SIZE') / 2 ** 20
+    except (OSError, ValueError):
+        return float('nan')
+
+
+def write_host_file(path: str, count: int):
+    with open(path, 'w') as f:
+        for i in range(count):
+            f.write(f"sim-{i:05d} slots=8\n")
+
+
+def bench_sweeps(collector, sweeps: int, trace: bool) -> list:
+    rows = []
+    if trace:
+        tracemalloc.start()
+    for i in range(sweeps):
+        cpu_started = time.process_time()
+        started = time.perf_counter()
+        collector.collect()
+        row = {
+            'sweep': i,
+            'seconds': time.perf_counter() - started,
+            'cpu_seconds': time.process_time() - cpu_started,
+            'rss_mib': rss_mib(),
+            'version': collector.version,
+        }
+        if trace:
+            row['traced_mib'] = tracemalloc.get_traced_memory()[0] / 2 ** 20
+        rows.append(row)
+    if trace:
+        tracemalloc.stop()
+    return rows
+
+
+def bench_parse(nodes, repeats: int = 5) -> dict:
+    """用 gpu_csv.parse_gpu_batch 一次解析全部节点的 nvidia-smi 输出，返回平均耗时。"""
+    outputs = [(node.hostname, node._gpu_csv()) for node in nodes]
+    started = time.perf_counter()
+    for _ in range(repeats):
+        rows = parse_gpu_batch(outputs)
+    seconds = (time.perf_counter() - started) / repeats
+    gpus = sum(len(node_rows) for node_rows in rows.values())
+    return {'gpus': gpus, 'ms': seconds * 1000, 'us_per_gpu': seconds * 1e6 / max(1, gpus)}
+
+
+def bench_api(web, requests: int) -> dict:
+    """用 Flask 测试客户端请求 /api/nodes_data 的三种形式和 /metrics，返回每种的延迟分位数（毫秒）。"""
+    client = web.app.test_client()
+    first = client.get('/api/nodes_data')
+    etag = first.headers.get('ETag')
+    version = web.collector.version
+    cases = {
+        'full': lambda: client.get('/api/nodes_data'),
+        'etag_304': lambda: client.get('/api/nodes_data', headers={'If-None-Match': etag}),
+        'delta': lambda: client.get(f'/api/nodes_data?since={max(0, version - 1)}&epoch={web.collector.epoch}'),
+        'compact_gzip': lambda: client.get(f'/api/nodes_data?since=0&epoch={web.collector.epoch}&format=compact',
+                                           headers={'Accept-Encoding': 'gzip'}),
+        'metrics': lambda: client.get('/metrics'),
+    }
+    results = {}
+    for name, call in cases.items():
+        latencies = []
+        size = 0
+        for _ in range(requests):
+            started = time.perf_counter()
+            response = call()
+            latencies.append((time.perf_counter() - started) * 1000)
+            size = len(response.get_data())
+        results[name] = {
+            'p50_ms': percentile(latencies, 50),
+            'p99_ms': percentile(latencies, 99),
+            'mean_ms': statistics.mean(latencies),
+            'bytes': size,
+        }
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--nodes', type=int, default=1000, help='模拟节点数')
+    parser.add_argument('--gpus', type=int, default=8, help='每个节点的 GPU 数')
+    parser.add_argument('--latency', type=float, default=0.05, help='单条命令的平均往返耗时（秒）')
+    parser.add_argument('--jitter', type=float, default=0.02, help='命令耗时的标准差（秒）')
+    parser.add_argument('--connect-latency', type=float, default=0.2, help='建立连接的耗时（秒）')
+    parser.add_argument('--failure-rate', type=float, default=0.0, help='命令失败概率')
+    parser.add_argument('--timeout-rate', type=float, default=0.0, help='命令挂起直到超时的概率')
+    parser.add_argument('--gpu-format', choices=GPU_FORMATS, default='normal', help='nvidia-smi 输出格式')
+    parser.add_argument('--cmd-timeout', type=float, default=5, help='模拟节点单条命令的超时时间（秒）')
+    parser.add_argument('--workers', type=int, default=32, help='线程池大小（同 app.MAX_WORKERS）')
+    parser.add_argument('--node-timeout', type=float, default=30, help='单个节点一次操作的截止时间（秒）')
+    parser.add_argument('--sweeps', type=int, default=5, help='采集轮数')
+    parser.add_argument('--requests', type=int, default=200, help='每种接口请求的次数')
+    parser.add_argument('--tracemalloc', action='store_true', help='同时用 tracemalloc 统计 Python 堆内存（会变慢）')
+    parser.add_argument('--json', type=str, default=None, help='把结果写入 JSON 文件，便于 CI 比较')
+    args = parser.parse_args()
+    if args.json:
+        args.json = os.path.abspath(args.json)
+
+    # 在临时目录中运行：节点的 ../tmp/<host> 目录和历史数据库都写到这里
+    workdir = tempfile.mkdtemp(prefix='gpu-monitor-bench-')
+    os.makedirs(os.path.join(workdir, 'run'))
+    os.chdir(os.path.join(workdir, 'run'))
+    host_file = os.path.join(workdir, 'bench.host')
+    write_host_file(host_file, args.nodes)
+
+    # app 模块在导入时创建节点管理器和采集器：让它读取一个空 host 文件，再换成模拟集群
+    empty_host_file = os.path.join(workdir, 'empty.host')
+    open(empty_host_file, 'w').close()
+    os.environ['GPU_MONITOR_HOST_FILE'] = empty_host_file
+    import app as web
+    from collector import Collector
+    from nodes import Nodes
+
+    web.collector.stop()
+    web.auto_guard.update(enabled=False)
+    profile = SimulationProfile(gpus=args.gpus, latency=args.latency, jitter=args.jitter,
+                                connect_latency=args.connect_latency, failure_rate=args.failure_rate,
+                                timeout_rate=args.timeout_rate, gpu_format=args.gpu_format)
+
+    rss_before = rss_mib()
+    started = time.perf_counter()
+    nodes_manager = Nodes(host_file, max_workers=args.workers, node_timeout=args.node_timeout,
+                          node_factory=lambda hostname, **kwargs: SimulatedNode(
+                              hostname, profile, cmd_timeout=args.cmd_timeout, **kwargs))
+    parse_seconds = time.perf_counter() - started
+    nodes_manager.wait_initialized()
+    collector = Collector(nodes_manager, interval=web.COLLECT_INTERVAL)
+    web.nodes_manager, web.collector = nodes_manager, collector
+
+    sweeps = bench_sweeps(collector, args.sweeps, args.tracemalloc)
+    parse = bench_parse(nodes_manager.nodes)
+    api = bench_api(web, args.requests)
+
+    seconds = [row['seconds'] for row in sweeps]
+    report = {
+        'config': vars(args),
+        'startup': {'parse_seconds': parse_seconds, 'init_seconds': nodes_manager.startup_seconds},
+        'sweeps': sweeps,
+        'sweep_summary': {
+            'p50_seconds': percentile(seconds, 50),
+            'max_seconds': max(seconds),
+            'cpu_seconds_mean': statistics.mean(row['cpu_seconds'] for row in sweeps),
+            'rss_growth_mib': sweeps[-1]['rss_mib'] - sweeps[0]['rss_mib'],
+            'rss_total_mib': sweeps[-1]['rss_mib'] - rss_before,
+            'stale_nodes': sum(1 for node in nodes_manager.nodes if node.is_stale),
+        },
+        'parse': parse,
+        'api': api,
+    }
+
+    print(f"节点: {args.nodes} x {args.gpus} GPU, 延迟 {args.latency}s±{args.jitter}s, "
+          f"失败率 {args.failure_rate}, 超时率 {args.timeout_rate}, 格式 {args.gpu_format}")
+    print(f"启动: 解析 {parse_seconds * 1000:.1f} ms, 初始化 {nodes_manager.startup_seconds:.2f} s")
+    for row in sweeps:
+        print(f"采集 #{row['sweep']}: {row['seconds']:.2f} s, CPU {row['cpu_seconds']:.2f} s, RSS {row['rss_mib']:.1f} MiB"
+              + (f", 堆 {row['traced_mib']:.1f} MiB" if 'traced_mib' in row else ''))
+    summary = report['sweep_summary']
+    print(f"采集汇总: p50 {summary['p50_seconds']:.2f} s, 最大 {summary['max_seconds']:.2f} s, "
+          f"RSS 增长 {summary['rss_growth_mib']:.1f} MiB, 过期节点 {summary['stale_nodes']}")
+    print(f"批量解析 nvidia-smi 输出: {parse['gpus']} 个 GPU, {parse['ms']:.2f} ms ({parse['us_per_gpu']:.2f} us/GPU)")
+    for name, row in api.items():
+        print(f"{'/metrics' if name == 'metrics' else f'/api/nodes_data [{name}]'}: p50 {row['p50_ms']:.2f} ms, p99 {row['p99_ms']:.2f} ms, {row['bytes']} bytes")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)
+    nodes_manager.executor.shutdown(wait=False)
+    shutil.rmtree(workdir, ignore_errors=True)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,269 @@
+import threading
+import time
+import uuid
+from typing import Callable, Dict, List, Optional, Tuple
+
+from loguru import logger
+
+from metrics import SWEEP_SECONDS
+
+# 判断节点是否变化时忽略的字段（每次采集都会变化，但不代表节点状态有变化）
+VOLATILE_FIELDS = ('last_updated', 'gpus')
+MAX_TOMBSTONES = 1000  # 保留的已移除节点记录数，超出后更早的 since 版本只能拿到全量数据
+# 集群汇总中累加的字段，每个节点的贡献见 node_summary()
+SUMMARY_FIELDS = ('nodes', 'nodes_online', 'nodes_guarding', 'nodes_need_guard', 'gpus', 'gpus_idle', 'gpus_guarded',
+                  'gpus_active', 'power_draw', 'power_draw_gpus', 'utilization', 'memory_used', 'memory_total')
+
+
+def node_summary(node: dict) -> tuple:
+    """单个节点对集群汇总的贡献，顺序同 SUMMARY_FIELDS。不可用（None）的 GPU 数值不计入。"""
+    gpus = node['gpus']
+    power = [gpu['power_draw'] for gpu in gpus if gpu.get('power_draw') is not None]
+    utilization = [gpu['utilization'] for gpu in gpus if gpu.get('utilization') is not None]
+    return (
+        1, int(bool(node.get('is_online'))), int(bool(node.get('guard_running'))), int(bool(node.get('need_guard'))),
+        len(gpus), len(node.get('idle_gpus') or []), len(node.get('guarded_gpus') or []),
+        sum(1 for value in utilization if value > 0), sum(power), len(power), sum(utilization),
+        sum(gpu.get('memory_used') or 0 for gpu in gpus), sum(gpu.get('memory_total') or 0 for gpu in gpus),
+    )
+
+
+class Collector:
+    """后台采集器：按固定周期轮询所有节点，把结果缓存为内存快照，API 直接读取快照。"""
+
+    def __init__(self, nodes_manager, interval: float = 5):
+        self.nodes_manager = nodes_manager
+        self.interval = interval  # 采集周期（秒）
+
+        self._lock = threading.Lock()
+        self._changed = threading.Condition()  # 快照版本变化时通知等待中的推送连接
+        self._wakeup = threading.Event()  # 用于提前触发一次采集
+        self._stopped = threading.Event()
+        self._ready = threading.Event()  # 第一次采集完成后置位
+        self._thread = None
+
+        self._snapshot: List[dict] = []
+        self._snapshot_time: Optional[float] = None
+        self.last_sweep_seconds = 0.0
+        self.listeners: List[Callable[[List[dict]], None]] = []  # 每次采集完成后以新快照调用
+
+        # 版本号：快照内容有变化时递增；epoch 区分不同的进程生命周期，重启后客户端需重新拉取全量
+        self.epoch = uuid.uuid4().hex[:8]
+        self.version = 0
+        self._min_version = 0  # 能正确计算增量的最小 since 版本
+        # hostname -> {'version', 'fields', 'gpus': {index: (version, gpu)}, 'layout_version', 'summary'}
+        self._node_versions: Dict[str, dict] = {}
+        self._removed: Dict[str, int] = {}  # 已移除节点 hostname -> 移除时的版本
+        self._summary = [0] * len(SUMMARY_FIELDS)  # 集群汇总，只按变化的节点增量更新
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._stopped.clear()
+        self._thread = threading.Thread(target=self._run, name="collector", daemon=True)
+        self._thread.start()
+        logger.info(f"采集线程已启动，采集周期: {self.interval}s")
+
+    def stop(self):
+        self._stopped.set()
+        self._wakeup.set()
+        if self._thread:
+            self._thread.join(timeout=self.interval)
+
+    def add_listener(self, listener: Callable[[List[dict]], None]):
+        """注册采集完成回调，在采集线程中执行。"""
+        self.listeners.append(listener)
+
+    def refresh(self):
+        """不等待下一个周期，立即触发一次采集（例如启动/停止守护进程之后）。"""
+        self._wakeup.set()
+
+    def _run(self):
+        while not self._stopped.is_set():
+            self._wakeup.clear()
+            started = time.time()
+            self.collect()
+            elapsed = time.time() - started
+            self._wakeup.wait(max(0.0, self.interval - elapsed))
+
+    def collect(self):
+        started = time.time()
+        try:
+            self.nodes_manager.update()
+            snapshot = self.nodes_manager.to_dict()
+        except Exception as e:
+            logger.error(f"采集节点数据失败: {e}")
+            return
+        with self._lock:
+            previous_version = self.version
+            self._track_versions(snapshot)
+            self._snapshot = snapshot
+            self._snapshot_time = time.time()
+        self.last_sweep_seconds = time.time() - started
+        SWEEP_SECONDS.observe(self.last_sweep_seconds)
+        self._ready.set()
+        if self.version != previous_version:
+            with self._changed:
+                self._changed.notify_all()
+        for listener in self.listeners:
+            try:
+                listener(snapshot)
+            except Exception as e:
+                logger.error(f"处理采集结果失败: {e}")
+        logger.debug(f"采集完成，共 {len(snapshot)} 个节点，耗时 {self.last_sweep_seconds:.2f}s")
+
+    def _track_versions(self, snapshot: List[dict]):
+        """对比新旧快照，记录每个节点/GPU 最后一次变化时的版本号。"""
+        new_version = self.version + 1
+        changed = False
+        seen = set()
+        for node in snapshot:
+            hostname = node['hostname']
+            seen.add(hostname)
+            fields = {k: v for k, v in node.items() if k not in VOLATILE_FIELDS}
+            gpus = {gpu['index']: gpu for gpu in node['gpus']}
+            state = self._node_versions.get(hostname)
+            if state is None:
+                self._node_versions[hostname] = {
+                    'version': new_version, 'fields': fields, 'layout_version': new_version,
+                    'gpus': {index: (new_version, gpu) for index, gpu in gpus.items()},
+                    'summary': node_summary(node),
+                }
+                self._add_summary(self._node_versions[hostname]['summary'], 1)
+                self._removed.pop(hostname, None)
+                changed = True
+                continue
+
+            node_changed = state['fields'] != fields
+            if set(gpus) != set(state['gpus']):
+                state['layout_version'] = new_version  # GPU 集合变化，客户端需整体替换 gpus 列表
+                node_changed = True
+            gpu_versions = {}
+            for index, gpu in gpus.items():
+                previous = state['gpus'].get(index)
+                if previous is not None and previous[1] == gpu:
+                    gpu_versions[index] = previous
+                else:
+                    gpu_versions[index] = (new_version, gpu)
+                    node_changed = True
+            state['gpus'] = gpu_versions
+            state['fields'] = fields
+            if node_changed:
+                state['version'] = new_version
+                self._add_summary(state['summary'], -1)
+                state['summary'] = node_summary(node)
+                self._add_summary(state['summary'], 1)
+                changed = True
+
+        for hostname in list(self._node_versions):
+            if hostname not in seen:
+                self._add_summary(self._node_versions.pop(hostname)['summary'], -1)
+                self._removed[hostname] = new_version
+                changed = True
+        while len(self._removed) > MAX_TOMBSTONES:
+            oldest = min(self._removed, key=self._removed.get)
+            self._min_version = max(self._min_version, self._removed.pop(oldest))
+
+        if changed:
+            self.version = new_version
+
+    def _add_summary(self, contribution: tuple, sign: int):
+        for i, value in enumerate(contribution):
+            self._summary[i] += sign * value
+
+    def summary(self) -> dict:
+        """集群汇总：节点/GPU 计数、总功耗和显存，以及平均功耗（W）、活跃 GPU 的平均利用率（%）。"""
+        with self._lock:
+            totals = dict(zip(SUMMARY_FIELDS, self._summary))
+        for field in ('power_draw', 'utilization'):
+            totals[field] = round(totals[field], 2)  # 增量加减的浮点误差
+        totals['power_draw_avg'] = (round(totals['power_draw'] / totals['power_draw_gpus'], 2)
+                                    if totals['power_draw_gpus'] else None)
+        totals['utilization_avg'] = (round(totals['utilization'] / totals['gpus_active'], 2)
+                                     if totals['gpus_active'] else 0.0)
+        return totals
+
+    def delta(self, since: int) -> Optional[dict]:
+        """返回 since 版本之后有变化的节点和 GPU；无法计算增量时返回 None（调用方应返回全量）。
+
+        变化节点包含全部标量字段，gpus 只包含变化的 GPU；gpus_replace 为 True 时 gpus 是完整列表。
+        """
+        with self._lock:
+            if since > self.version or since < self._min_version:
+                return None
+            nodes = []
+            for node in self._snapshot:
+                state = self._node_versions[node['hostname']]
+                if state['version'] <= since:
+                    continue
+                partial = dict(node)
+                partial['gpus_replace'] = state['layout_version'] > since
+                if not partial['gpus_replace']:
+                    partial['gpus'] = [gpu for version, gpu in state['gpus'].values() if version > since]
+                nodes.append(partial)
+            removed = [hostname for hostname, version in self._removed.items() if version > since]
+            return {'epoch': self.epoch, 'version': self.version, 'full': False, 'nodes': nodes, 'removed': removed}
+
+    def full(self) -> dict:
+        """全量快照，格式与 delta() 一致。"""
+        with self._lock:
+            return {'epoch': self.epoch, 'version': self.version, 'full': True, 'nodes': self._snapshot, 'removed': []}
+
+    def export_state(self) -> dict:
+        """导出快照和计算增量所需的版本信息，供 snapshot_store 发布给 Web worker 进程。
+
+        GPU 只导出版本号（数据已在快照中），导入端按 index 从快照中取回。
+        """
+        with self._lock:
+            return {
+                'epoch': self.epoch,
+                'version': self.version,
+                'min_version': self._min_version,
+                'snapshot_time': self._snapshot_time,
+                'interval': self.interval,
+                'last_sweep_seconds': self.last_sweep_seconds,
+                'nodes': self._snapshot,
+                'node_versions': {
+                    hostname: {
+                        'version': state['version'],
+                        'layout_version': state['layout_version'],
+                        'gpus': {index: version for index, (version, _) in state['gpus'].items()},
+                    }
+                    for hostname, state in self._node_versions.items()
+                },
+                'removed': dict(self._removed),
+                'summary': list(self._summary),
+            }
+
+    def wait_for_change(self, version: int, timeout: Optional[float] = None) -> bool:
+        """阻塞直到快照版本不再等于 version，超时返回 False。"""
+        with self._changed:
+            return self._changed.wait_for(lambda: self.version != version, timeout)
+
+    def status(self) -> dict:
+        return {
+            'interval': self.interval,
+            'snapshot_age': self.age(),
+            'last_sweep_seconds': self.last_sweep_seconds,
+            'epoch': self.epoch,
+            'version': self.version,
+        }
+
+    @property
+    def etag(self) -> str:
+        return f"{self.epoch}-{self.version}"
+
+    def wait_ready(self, timeout: Optional[float] = None) -> bool:
+        return self._ready.wait(timeout)
+
+    def snapshot(self) -> Tuple[List[dict], Optional[float]]:
+        """返回 (快照, 快照生成时间戳)，不触发任何远程命令。"""
+        with self._lock:
+            return self._snapshot, self._snapshot_time
+
+    def age(self) -> Optional[float]:
+        """快照距今的秒数；尚未完成第一次采集时返回 None。"""
+        with self._lock:
+            if self._snapshot_time is None:
+                return None
+            return time.time() - self._snapshot_time
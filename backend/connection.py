@@ -0,0 +1,107 @@
+import random
+import threading
+import time
+
+from fabric import Connection, Config
+from loguru import logger
+
+
+class CircuitOpenError(ConnectionError):
+    """连接处于熔断状态（退避等待中），本次不尝试连接。"""
+
+
+class SSHLink:
+    """单个远程节点的 SSH 长连接。
+
+    - 一个节点只保持一条 SSH transport，并开启 keepalive；命令和常驻采样都以 channel 的形式复用它；
+    - 建连失败后进入熔断（open）状态，按指数退避加随机抖动等待，等待期间直接拒绝，离线节点几乎零开销；
+    - 退避结束后的第一次尝试为半开（half_open），成功则恢复（closed），失败则继续加倍退避。
+    """
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, hostname: str, connect_timeout: float = 5, keepalive: int = 30,
+                 base_delay: float = 5, max_delay: float = 300):
+        self.hostname = hostname
+        self.connect_timeout = connect_timeout
+        self.keepalive = keepalive
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+        self.conn = None
+        self.state = self.CLOSED
+        self.failures = 0  # 连续建连失败次数
+        self.reconnects = 0  # 成功重连的累计次数（不含第一次连接）
+        self.next_attempt = 0.0  # time.monotonic()，熔断期间下次允许尝试的时间
+        self.next_attempt_at = None  # 同一时刻的 time.time()，对外展示用（每轮快照中保持不变）
+        self._connected_once = False
+        self._lock = threading.Lock()
+
+    def _is_active(self) -> bool:
+        client = self.conn.client if self.conn is not None else None
+        transport = client.get_transport() if client is not None else None
+        return transport is not None and transport.is_active()
+
+    def get(self) -> Connection:
+        """返回可用的连接；需要时重连。熔断期间抛出 CircuitOpenError，建连失败时抛出原始异常。"""
+        with self._lock:
+            if self.conn is not None and self._is_active():
+                return self.conn
+            now = time.monotonic()
+            if self.state == self.OPEN:
+                if now < self.next_attempt:
+                    raise CircuitOpenError(f"熔断中，{self.next_attempt - now:.0f}s 后重试")
+                self.state = self.HALF_OPEN
+            self._close()
+            try:
+                conn = Connection(self.hostname, config=Config(overrides={'connect_timeout': self.connect_timeout}))
+                conn.open()
+                conn.client.get_transport().set_keepalive(self.keepalive)
+            except Exception:
+                self._record_failure()
+                raise
+            self.conn = conn
+            if self._connected_once:
+                self.reconnects += 1
+            self._connected_once = True
+            self.failures = 0
+            self.state = self.CLOSED
+            return conn
+
+    def _record_failure(self):
+        self.failures += 1
+        delay = min(self.max_delay, self.base_delay * 2 ** (self.failures - 1))
+        delay *= random.uniform(0.5, 1.0)  # 抖动，避免大量节点同时重试
+        self.next_attempt = time.monotonic() + delay
+        self.next_attempt_at = time.time() + delay
+        self.state = self.OPEN
+        logger.debug(f"[{self.hostname}] 连接失败 {self.failures} 次，{delay:.0f}s 后重试")
+
+    def mark_broken(self):
+        """命令执行中发现连接已断开：丢弃连接，下一次 get() 立即重连（不计入建连失败）。"""
+        with self._lock:
+            self._close()
+
+    def _close(self):
+        if self.conn is not None:
+            try:
+                self.conn.close()
+            except Exception:
+                pass
+            self.conn = None
+
+    def close(self):
+        with self._lock:
+            self._close()
+
+    def to_dict(self) -> dict:
+        # 发布绝对时间而不是剩余秒数，熔断期间快照内容不随时间变化，不会每轮都产生增量
+        next_attempt = self.next_attempt_at if self.state == self.OPEN else None
+        return {
+            'state': self.state,
+            'failures': self.failures,
+            'reconnects': self.reconnects,
+            'next_attempt': None if next_attempt is None else round(next_attempt, 1),
+        }
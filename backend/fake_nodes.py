@@ -1,170 +1,105 @@
+import json
 import random
-from datetime import datetime, timedelta
-from collections import defaultdict, deque
-from typing import List, Union
-from loguru import logger
-
-# Simulated classes for the fake version
-
-class FakeGPU:
-    def __init__(self, index: int):
-        self.index = index
-        self.name = f"NVIDIA Tesla V100-SXM2-32GB"
-        self.temperature = random.uniform(30, 80)  # Simulate temperature between 30°C to 80°C
-        self.utilization = random.uniform(0, 100)  # Simulate utilization between 0% to 100%
-        self.memory_used = random.randint(0, 16000)  # Simulate used memory (in MiB)
-        self.memory_total = 16000  # 16GB total memory for all GPUs
-        self.power_draw = random.uniform(50, 250)  # Simulate power draw between 50W and 250W
-
-    def __str__(self):
-        return (
-            f"[GPU {self.index}] {self.name} | "
-            f"温度: {self.temperature:.2f}°C | "
-            f"利用率: {self.utilization:.2f}% | "
-            f"显存: {self.memory_used}/{self.memory_total} MiB | "
-            f"功率: {self.power_draw:.2f} W | "
-        )
-
-
-class FakeNode:
-    def __init__(self, hostname: str, need_guard_interval=10, active_power_threshold=100):
-        self.hostname = hostname
-        self.gpus = [FakeGPU(i) for i in range(8)]  # Fake 4 GPUs on each node
-        self.is_guard_running = False
-        self.need_guard_interval = need_guard_interval  # Minutes
-        self.active_power_threshold = active_power_threshold
-        self.last_update_time = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-        self.power_history = defaultdict(lambda: deque())
-
-    def update_gpu_info(self):
-        """Fake update of GPU info."""
-        for gpu in self.gpus:
-            gpu.temperature = random.uniform(30, 80)
-            gpu.utilization = random.uniform(0, 100)
-            gpu.memory_used = random.randint(0, gpu.memory_total)
-            gpu.power_draw = random.uniform(50, 250)
-            self.record_power(gpu.index, gpu.power_draw)
-        self.update_time()
-
-    def record_power(self, gpu_index: int, power_draw: float):
-        now = datetime.now()
-        history = self.power_history[gpu_index]
-        history.append((now, power_draw))
-
-        cutoff = now - timedelta(minutes=30)
-        while history and history[0][0] < cutoff:
-            history.popleft()
-
-    def update_guard_status(self, flag):
-        """Simulate checking guard status."""
-        self.is_guard_running =flag
-        self.update_time()
-
-    def update_time(self):
-        self.last_update_time = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-
-    def start_guard(self):
-        """Simulate starting the guard."""
-        if self.is_guard_running:
-            logger.info(f"[{self.hostname}] 守护进程已运行")
-        else:
-            self.is_guard_running = True
-            logger.info(f"[{self.hostname}] 启动守护进程成功")
-
-    def stop_guard(self):
-        """Simulate stopping the guard."""
-        if not self.is_guard_running:
-            logger.info(f"[{self.hostname}] 守护进程未运行")
-        else:
-            self.is_guard_running = False
-            logger.info(f"[{self.hostname}] 停止守护进程成功")
-
-    def need_guard(self) -> bool:
-        now = datetime.now()  # 只计算一次当前时间
-
-        # 遍历所有 GPU
-        for index, records in self.power_history.items():
-            recent = [p for t, p in records if t >= now - timedelta(minutes=self.need_guard_interval)]
-
-            # 如果近期没有功耗数据，我们认为这个 GPU 处于不活跃状态，需要守护
-            if not recent:
-                return True  # 发现一个不活跃的GPU，立即返回True（需要守护）
-
-            avg_power = sum(recent) / len(recent)
-
-            # 如果平均功耗低于活跃阈值，也认为这个 GPU 处于不活跃状态，需要守护
-            if avg_power < self.active_power_threshold:  # 重点修改：从 >= 改为 <
-                return True  # 发现一个不满足活跃条件的GPU，立即返回True（需要守护）
-
-        # 如果循环结束，意味着所有 GPU 都满足了活跃条件（近期有数据且功耗 >= active_power_threshold）
-        return False  # 所有GPU都活跃，不需要守护
-
-    def to_dict(self) -> dict:
-        """Fake dictionary representation."""
-        self.update_gpu_info()
-
-        data = {
-            'hostname': self.hostname,
-            'gpus': [{
-                'index': gpu.index,
-                'name': gpu.name,
-                'temperature': gpu.temperature,
-                'utilization': gpu.utilization,
-                'memory_used': gpu.memory_used,
-                'memory_total': gpu.memory_total,
-                'power_draw': gpu.power_draw,
-            } for gpu in self.gpus],
-            'guard_running': self.is_guard_running,
-            'last_updated': self.last_update_time,
-            'need_guard': self.need_guard()
-        }
-        return data
-
-    def update_guard_policy(self, need_guard_interval, active_power_threshold):
-        self.active_power_threshold = active_power_threshold
-        self.need_guard_interval = need_guard_interval
-
-
-class Nodes:
-    def __init__(self, host_file_path: str):
-        self.host_file_path = host_file_path
-        self.nodes = self._load_nodes()
-        for node in self.nodes:
-            logger.info(f"加载节点: {node.hostname} 完成")
-
-    def _load_nodes(self) -> List[FakeNode]:
-        # Simulate loading nodes from a fake file
-        nodes = []
-        for i in range(5):  # Fake 5 nodes for the simulation
-            node = FakeNode(f"fake-node-{i}")
-            nodes.append(node)
-        return nodes
-
-    def to_dict(self) -> List[dict]:
-        nodes_data = [node.to_dict() for node in self.nodes]
-        return nodes_data
-
-    def update(self):
-        for node in self.nodes:
-            node.update_gpu_info()
-
-    def start_guard(self, host_names: Union[List[str], None] = None):
-        if host_names is None or len(host_names) == 0:
-            host_names = [node.hostname for node in self.nodes]
-        for node in self.nodes:
-            if node.hostname in host_names:
-                node.start_guard()
-        return {node.hostname: node.is_guard_running for node in self.nodes}
-
-    def stop_guard(self, host_names: Union[List[str], None] = None):
-        if host_names is None or len(host_names) == 0:
-            host_names = [node.hostname for node in self.nodes]
-        print(host_names)
-        for node in self.nodes:
-            if node.hostname in host_names:
-                node.stop_guard()
-        return {node.hostname: not node.is_guard_running for node in self.nodes}
-
-    def update_guard_policy(self, need_guard_interval, active_power_threshold):
-        for node in self.nodes:
-            node.update_guard_policy(need_guard_interval, active_power_threshold)
+import re
+import time
+from dataclasses import dataclass
+from typing import Tuple
+
+from nodes import Node
+
+# Simulated node for benchmarks and tests: the real Node code path with a fake SSH/nvidia-smi behind Node.run_cmd
+
+GPU_FORMATS = ('normal', 'na', 'not_supported', 'mixed')  # nvidia-smi 输出格式，见 SimulatedNode._gpu_csv
+
+
+@dataclass
+class SimulationProfile:
+    """模拟集群的参数。latency/jitter 为单条命令的往返耗时（秒），failure_rate 为命令失败概率，
+    timeout_rate 为命令挂起直到超时的概率，gpu_format 决定 nvidia-smi 输出中不可用字段的写法。"""
+    gpus: int = 8
+    latency: float = 0.05
+    jitter: float = 0.02
+    connect_latency: float = 0.2
+    failure_rate: float = 0.0
+    timeout_rate: float = 0.0
+    gpu_format: str = 'normal'
+
+
+class SimulatedNode(Node):
+    """继承真实 Node，只替换建连和命令执行（run_cmd 调用的 _execute，耗时指标照常记录）：
+    按 SimulationProfile 模拟延迟、失败、超时，并按命令内容返回 probe.py / nvidia-smi / 守护进程相关命令的输出，
+    用于在没有 GPU 的机器上压测。"""
+
+    def __init__(self, hostname: str, profile: SimulationProfile = None, **kwargs):
+        self.profile = profile or SimulationProfile()
+        self.rng = random.Random(hostname)
+        self.sim_guarded = set()  # 模拟的守护进程所在 GPU
+        super().__init__(hostname, **kwargs)
+
+    def _check_is_local(self) -> bool:
+        return False
+
+    def _init_connection_if_remote(self) -> bool:
+        time.sleep(self.profile.connect_latency)
+        return self.rng.random() >= self.profile.failure_rate
+
+    def _gpu_csv(self) -> str:
+        rows = []
+        for index in range(self.profile.gpus):
+            busy = self.rng.random() < 0.5
+            values = [str(index), "NVIDIA A100-SXM4-80GB", f"{self.rng.uniform(30, 80):.0f}",
+                      f"{self.rng.uniform(60, 100) if busy else 0:.0f}", f"{self.rng.randint(0, 81920)}", "81920",
+                      f"{self.rng.uniform(200, 400) if busy or index in self.sim_guarded else self.rng.uniform(50, 90):.2f}"]
+            fmt = self.profile.gpu_format
+            if fmt == 'mixed':
+                fmt = self.rng.choice(GPU_FORMATS[:3])
+            if fmt == 'na':
+                values[6] = "[N/A]"
+            elif fmt == 'not_supported':
+                values[2] = values[6] = "[Not Supported]"
+            rows.append(", ".join(values))
+        return "\n".join(rows)
+
+    def _execute(self, cmd: str, timeout=None, retries=None) -> Tuple[bool, str]:
+        if timeout is None:
+            timeout = self.cmd_timeout
+        profile = self.profile
+        if self.rng.random() < profile.timeout_rate:
+            time.sleep(timeout)
+            self.is_online = False
+            return False, ""
+        time.sleep(max(0.0, self.rng.gauss(profile.latency, profile.jitter)))
+        if self.rng.random() < profile.failure_rate:
+            self.is_online = False
+            return False, ""
+        self.is_online = True
+
+        if 'probe.py' in cmd:
+            memory_used = self.rng.randint(0, 1024 * 1024)
+            return True, json.dumps({
+                'gpu_csv': None if '--skip-gpu' in cmd else self._gpu_csv(),
+                'guard_running': bool(self.sim_guarded),
+                'guarded_gpus': sorted(self.sim_guarded),
+                'cpu': {'percent': round(self.rng.uniform(0, 100), 1), 'load1': round(self.rng.uniform(0, 128), 2),
+                        'cores': 128},
+                'memory': {'used': memory_used, 'total': 1024 * 1024,
+                           'percent': round(100.0 * memory_used / (1024 * 1024), 1)},
+            })
+        if 'start_task.sh' in cmd:
+            match = re.search(r"GUARD_GPUS=([\d,]+)", cmd)
+            gpus = [int(i) for i in match.group(1).split(',')] if match else range(profile.gpus)
+            self.sim_guarded.update(gpus)
+            return True, "Launching per-GPU guards..."
+        if 'kill -0' in cmd:
+            lines = [f"{index}.pid" for index in sorted(self.sim_guarded)]
+            return True, "\n".join(lines + (['running'] if self.sim_guarded else []))
+        if 'rm -f' in cmd:
+            stopped = re.findall(r"_gpu(\d+)\.pid", cmd)
+            if 'pkill' in cmd:
+                self.sim_guarded.clear()
+            else:
+                self.sim_guarded.difference_update(int(i) for i in stopped)
+            return True, ""
+        if 'nvidia-smi' in cmd:
+            return True, self._gpu_csv()
+        return True, ""
@@ -0,0 +1,68 @@
+"""解析 `nvidia-smi --query-gpu=<GPU_QUERY> --format=csv,noheader,nounits` 的输出。
+
+每行解析为一个元组 (index, name, temperature, utilization, memory_used, memory_total, power_draw)，
+[N/A]、[Not Supported] 等不可用的字段为 None，不会导致整行被丢弃。
+"""
+from typing import Dict, Iterable, List, Optional, Tuple
+
+GPU_QUERY = "index,name,temperature.gpu,utilization.gpu,memory.used,memory.total,power.draw"
+GPU_QUERY_CMD = f"nvidia-smi --query-gpu={GPU_QUERY} --format=csv,noheader,nounits"
+FIELD_COUNT = 7
+# nvidia-smi 表示字段不可用的写法（MIG 模式下的利用率、部分型号的功耗/温度等）
+UNAVAILABLE = frozenset(('', 'N/A', '[N/A]', '[Not Supported]', '[Unknown Error]',
+                         '[Insufficient Permissions]', '[GPU is lost]', '[Requires Pro]'))
+
+GpuRow = Tuple[int, str, Optional[float], Optional[float], Optional[int], Optional[int], Optional[float]]
+
+
+def _float(text: str) -> Optional[float]:
+    text = text.strip()
+    if text in UNAVAILABLE:
+        return None
+    try:
+        return float(text)
+    except ValueError:
+        return None
+
+
+def _int(text: str) -> Optional[int]:
+    value = _float(text)
+    return None if value is None else int(value)
+
+
+def parse_gpu_line(line: str, names: Optional[Dict[str, str]] = None) -> Optional[GpuRow]:
+    """解析一行输出；不是 GPU 数据的行（空行、警告、错误信息）返回 None。
+
+    names 用于复用相同的型号字符串（同一批解析中相同型号只保留一个对象）。
+    """
+    parts = line.split(',')
+    if len(parts) < FIELD_COUNT:
+        return None
+    if len(parts) > FIELD_COUNT:  # 型号中含逗号
+        parts = [parts[0], ','.join(parts[1:len(parts) - 5])] + parts[-5:]
+    index = parts[0].strip()
+    if not index.isdigit():
+        return None
+    name = parts[1].strip()
+    if names is not None:
+        name = names.setdefault(name, name)
+    return (int(index), name, _float(parts[2]), _float(parts[3]), _int(parts[4]), _int(parts[5]), _float(parts[6]))
+
+
+def parse_gpu_csv(output: str, names: Optional[Dict[str, str]] = None) -> List[GpuRow]:
+    """解析完整输出（每个 GPU 一行，兼容 \\r\\n 换行）。同一 GPU 出现多行时（循环采样的输出片段）保留最后一行。"""
+    rows: Dict[int, GpuRow] = {}
+    for line in output.splitlines():
+        row = parse_gpu_line(line, names)
+        if row is not None:
+            rows[row[0]] = row
+    return list(rows.values())
+
+
+def parse_gpu_batch(outputs: Iterable[Tuple[str, str]]) -> Dict[str, List[GpuRow]]:
+    """一次解析多个节点的输出 [(hostname, output), ...]，返回 {hostname: rows}。
+
+    所有节点共用一个型号字符串表，集群中成千上万个 GPU 的 name 字段只占用少数几个字符串对象。
+    """
+    names: Dict[str, str] = {}
+    return {hostname: parse_gpu_csv(output, names) for hostname, output in outputs}
@@ -1,47 +1,178 @@
 import os
 import time
+import subprocess
 import torch
 import torch.distributed as dist
 from torch.nn.parallel import DistributedDataParallel as DDP
 import argparse
 
+try:
+    import pynvml  # 可选依赖，没有时退回 nvidia-smi
+except ImportError:
+    pynvml = None
+
+MIN_DUTY = 0.02  # 最低占空比，保证节点始终有少量负载
+CONTROL_GAIN = 0.5  # 占空比调节的比例系数
+
+
+class GpuReader:
+    """读取本进程所在 GPU 的利用率、功耗和计算进程，优先使用 NVML，否则调用 nvidia-smi。"""
+
+    def __init__(self, local_rank):
+        visible = os.environ.get("CUDA_VISIBLE_DEVICES")
+        self.index = int(visible.split(",")[local_rank]) if visible else local_rank  # 物理 GPU 序号
+        self.handle = None
+        if pynvml is not None:
+            try:
+                pynvml.nvmlInit()
+                self.handle = pynvml.nvmlDeviceGetHandleByIndex(self.index)
+            except Exception:
+                self.handle = None
+
+    def _smi(self, args):
+        try:
+            result = subprocess.run(["nvidia-smi", "-i", str(self.index)] + args + ["--format=csv,noheader,nounits"],
+                                    stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True, timeout=5)
+        except Exception:
+            return []
+        return [line.strip() for line in result.stdout.splitlines() if line.strip()]
+
+    def read(self):
+        """返回 (利用率%, 功耗W)，读取失败的项为 None。"""
+        if self.handle is not None:
+            try:
+                util = pynvml.nvmlDeviceGetUtilizationRates(self.handle).gpu
+                power = pynvml.nvmlDeviceGetPowerUsage(self.handle) / 1000
+                return float(util), float(power)
+            except Exception:
+                pass
+        lines = self._smi(["--query-gpu=utilization.gpu,power.draw"])
+        try:
+            util, power = lines[0].split(",")
+            return float(util), float(power)
+        except (IndexError, ValueError):
+            return None, None
+
+    def compute_pids(self):
+        """当前 GPU 上的计算进程 PID 集合。"""
+        if self.handle is not None:
+            try:
+                return {p.pid for p in pynvml.nvmlDeviceGetComputeRunningProcesses(self.handle)}
+            except Exception:
+                pass
+        lines = self._smi(["--query-compute-apps=pid"])
+        return {int(line) for line in lines if line.isdigit()}
+
+
+def is_guard_process(pid, name):
+    try:
+        with open(f"/proc/{pid}/cmdline", "rb") as f:
+            return name in f.read().replace(b"\0", b" ").decode(errors="ignore")
+    except OSError:
+        return False
+
+
+def update_duty(duty, args, util, power):
+    """按目标利用率或功耗预算调节占空比；没有读数时保持不变（开环）。"""
+    if args.power_budget and power is not None:
+        duty += CONTROL_GAIN * duty * (args.power_budget - power) / args.power_budget
+    elif args.target_util is not None and util is not None:
+        duty += CONTROL_GAIN * (args.target_util - util) / 100
+    return min(1.0, max(MIN_DUTY, duty))
+
+
+def agree(steps, should_yield):
+    """各 rank 对本周期的步数取最小值（DDP 要求步数一致），任一 rank 需要让出则全部让出。"""
+    if not dist.is_initialized():
+        return steps, should_yield
+    flags = torch.tensor([-steps, int(should_yield)], device=torch.cuda.current_device())
+    dist.all_reduce(flags, op=dist.ReduceOp.MAX)
+    return int(-flags[0].item()), bool(flags[1].item())
+
+
 def train(args):
-    rank = int(os.environ["RANK"])
-    local_rank = int(os.environ["LOCAL_RANK"])
-    world_size = int(os.environ["WORLD_SIZE"])
+    # 由 torchrun 启动时使用 DDP；由 start_task.sh 按 GPU 单独启动时（没有 RANK）为单卡模式
+    distributed = "RANK" in os.environ
+    rank = int(os.environ.get("RANK", 0))
+    local_rank = int(os.environ.get("LOCAL_RANK", 0))
+    world_size = int(os.environ.get("WORLD_SIZE", 1))
 
     device = torch.device(f"cuda:{local_rank}")
     torch.cuda.set_device(device)
 
-    dist.init_process_group(backend="nccl", init_method="env://")
-
     model = torch.nn.Linear(1200, 1200).to(device)
-    ddp_model = DDP(model, device_ids=[local_rank])
+    if distributed:
+        dist.init_process_group(backend="nccl", init_method="env://")
+        ddp_model = DDP(model, device_ids=[local_rank])
+    else:
+        ddp_model = model
 
     inputs = torch.randn(1200, 1200).to(device)
 
+    reader = GpuReader(local_rank)  # 单卡模式下 CUDA_VISIBLE_DEVICES 只有一个序号，即该进程守护的 GPU
+    regulated = args.target_util is not None or args.power_budget
+    duty = args.target_util / 100 if args.target_util is not None else (0.5 if args.power_budget else 1.0)
+    duty = min(1.0, max(MIN_DUTY, duty))
+    step_time = None  # 单步耗时的滑动平均（秒）
+
     if rank == 0:
-        print(f"[RANK 0] Starting task: {args.name} on {world_size} GPUs")
+        print(f"[RANK 0] Starting task: {args.name} on {world_size} GPUs (GPU {reader.index}) "
+              f"(target_util={args.target_util}, power_budget={args.power_budget}, yield={args.yield_on_foreign})")
 
     last_print = time.time()
+    yielded = False
+    outputs = loss = None
     try:
         while True:
-            outputs = ddp_model(inputs)
-            loss = outputs.sum()
-            loss.backward()
+            # 每个控制周期先忙 duty * period，再空闲其余时间
+            busy = duty * args.period
+            steps = max(1, round(busy / step_time)) if step_time else 1
+            should_yield = False
+            if args.yield_on_foreign:
+                should_yield = any(not is_guard_process(pid, args.name) for pid in reader.compute_pids())
+            steps, should_yield = agree(steps, should_yield)
+            if should_yield:
+                yielded = True
+                break
+
+            started = time.time()
+            for _ in range(steps):
+                outputs = ddp_model(inputs)
+                loss = outputs.sum()
+                loss.backward()
+            torch.cuda.synchronize(device)
+            elapsed = time.time() - started
+            current = elapsed / steps
+            step_time = current if step_time is None else 0.8 * step_time + 0.2 * current
+            if duty < 1.0:
+                time.sleep(max(0.0, args.period - elapsed))
+
+            if regulated:
+                util, power = reader.read()
+                duty = update_duty(duty, args, util, power)
 
             now = time.time()
             if rank == 0 and (now - last_print >= 60):
-                print(f"[RANK 0] alive at {time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(now))}")
+                print(f"[RANK 0] alive at {time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(now))}, duty={duty:.2f}")
                 last_print = now
     except KeyboardInterrupt:
         if rank == 0:
             print(f"[RANK 0] Stopped by user.")
     finally:
-        dist.destroy_process_group()
+        # 立即释放显存，让出 GPU
+        ddp_model = model = inputs = outputs = loss = None
+        torch.cuda.empty_cache()
+        if distributed:
+            dist.destroy_process_group()
+        if yielded and rank == 0:
+            print("[RANK 0] Foreign process detected, guard exited to yield GPUs.")
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser()
     parser.add_argument('--name', type=str, default='hold')
+    parser.add_argument('--target-util', type=float, default=None, help='目标 GPU 利用率（%%），按占空比调节负载')
+    parser.add_argument('--power-budget', type=float, default=None, help='单卡功耗预算（W），优先于 --target-util')
+    parser.add_argument('--period', type=float, default=1.0, help='控制周期（秒），也是检测外部进程的最长间隔')
+    parser.add_argument('--yield-on-foreign', action='store_true', help='GPU 上出现其他计算进程时释放显存并退出')
     args = parser.parse_args()
     train(args)
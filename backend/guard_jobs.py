@@ -0,0 +1,119 @@
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Callable, List, Optional, Union
+
+from loguru import logger
+
+from metrics import GUARD_ACTIONS
+
+GUARD_CONFIRM_DELAYS = (0.5, 1, 2, 4)  # 启停后依次等待这些秒数再检查 PID，全部用完仍未到达目标状态则记为 unconfirmed
+MAX_JOBS = 200  # 保留的任务记录数
+
+
+class GuardJobs:
+    """守护进程启停任务。
+
+    submit() 立即返回任务 ID，启停命令和状态确认在后台线程中完成：先并发下发命令（不等待），
+    再按 GUARD_CONFIRM_DELAYS 分批检查尚未确认的节点，确认期间不占用线程池。
+    启动只作用于节点上空闲且未守护的 GPU，全部目标 GPU 的守护进程都在运行才算确认；停止要求节点上不再有守护进程。
+    每个节点的结果依次为 pending -> running/stopped（已确认）、unconfirmed（超时未确认）或 failed。
+    """
+
+    ACTIONS = {'start': 'running', 'stop': 'stopped'}
+
+    def __init__(self, nodes_manager, confirm_delays=GUARD_CONFIRM_DELAYS, max_jobs=MAX_JOBS):
+        self.nodes_manager = nodes_manager
+        self.confirm_delays = confirm_delays
+        self.max_jobs = max_jobs
+        self.listeners: List[Callable[[dict], None]] = []  # 任务完成后以任务信息调用
+
+        self._lock = threading.Lock()
+        self._jobs = OrderedDict()  # job_id -> job
+
+    def add_listener(self, listener: Callable[[dict], None]):
+        self.listeners.append(listener)
+
+    def submit(self, action: str, host_names: Union[List[str], None] = None) -> dict:
+        """在 host_names（为空时为全部已就绪节点）上启动或停止守护进程，返回任务信息。"""
+        if action not in self.ACTIONS:
+            raise ValueError(f"未知操作: {action}")
+        nodes = self.nodes_manager.select(host_names)
+        job = {
+            'id': uuid.uuid4().hex[:12],
+            'action': action,
+            'status': 'running',
+            'created': time.time(),
+            'finished': None,
+            'results': {node.hostname: 'pending' for node in nodes},
+        }
+        with self._lock:
+            self._jobs[job['id']] = job
+            while len(self._jobs) > self.max_jobs:
+                self._jobs.popitem(last=False)
+        threading.Thread(target=self._run, args=(job, nodes), name=f"guard-job-{job['id']}", daemon=True).start()
+        return self._copy(job)
+
+    def get(self, job_id: str) -> Optional[dict]:
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return self._copy(job) if job else None
+
+    @staticmethod
+    def _copy(job: dict) -> dict:
+        return dict(job, results=dict(job['results']))
+
+    def _run(self, job: dict, nodes):
+        action, confirmed_state = job['action'], self.ACTIONS[job['action']]
+        results = job['results']
+        try:
+            launch = (lambda node: node.start_guard()) if action == 'start' else (lambda node: node.stop_guard())
+            launched, _ = self.nodes_manager.run_parallel(launch, nodes, kind='guard')
+            unconfirmed = []
+            for node in nodes:
+                # start 返回目标 GPU 列表（失败为 None），stop 返回是否执行成功
+                outcome = launched.get(node.hostname)
+                if outcome is None or outcome is False:
+                    results[node.hostname] = 'failed'
+                else:
+                    unconfirmed.append(node)
+            if action == 'start':
+                targets = {node.hostname: set(launched[node.hostname]) for node in unconfirmed}
+                confirmed = lambda node, running: targets[node.hostname] <= set(node.guarded_gpus)
+            else:
+                confirmed = lambda node, running: not running
+
+            for delay in self.confirm_delays:
+                if not unconfirmed:
+                    break
+                time.sleep(delay)
+                running, _ = self.nodes_manager.run_parallel(lambda node: node.check_guard(), unconfirmed, kind='guard')
+                remaining = []
+                for node in unconfirmed:
+                    if node.hostname in running and confirmed(node, running[node.hostname]):
+                        results[node.hostname] = confirmed_state
+                    else:
+                        remaining.append(node)
+                unconfirmed = remaining
+            for node in unconfirmed:
+                results[node.hostname] = 'unconfirmed'
+        except Exception as e:
+            logger.error(f"守护任务 {job['id']} 执行失败: {e}")
+            for hostname, result in results.items():
+                if result == 'pending':
+                    results[hostname] = 'failed'
+        finally:
+            job['status'] = 'done'
+            job['finished'] = time.time()
+
+        summary = {}
+        for result in results.values():
+            summary[result] = summary.get(result, 0) + 1
+            GUARD_ACTIONS.inc(action=action, result=result)
+        logger.info(f"守护任务 {job['id']} ({action}) 完成: {summary}")
+        for listener in self.listeners:
+            try:
+                listener(self._copy(job))
+            except Exception as e:
+                logger.error(f"处理守护任务结果失败: {e}")
@@ -0,0 +1,325 @@
+"""离线回放功耗轨迹（power_trace），批量评估守护策略：active_power_threshold × need_guard_interval 的网格。
+
+回放模型与在线逻辑（Node.idle_gpus、gpu_guard.py --yield-on-foreign）一致：
+- 每个 GPU 的功耗按 step 秒对齐到时间网格（取该格内样本的平均值），缺样本时沿用前值，超过 MAX_GAP 秒没有样本视为离线；
+- 守护进程运行期间记录到的是守护负载的功耗，回放时按空闲（0 W）处理；
+- 最近 interval 分钟的平均功耗低于 threshold 时 GPU 空闲，空闲且未守护的 GPU 启动守护；
+- 守护一直运行到功耗达到 threshold（有任务开始运行，守护进程让出显卡）或 GPU 离线。
+自动守护的确认轮数、冷却和限速（AutoGuard）不参与回放。
+
+有 numpy 时按 GPU 向量化计算（见 _simulate_numpy），否则逐个 GPU 回放（结果相同，只是慢得多）。
+
+示例:
+    python guard_sim.py --days 3 --thresholds 50:300:25 --intervals 5,10,15,30,60
+"""
+import argparse
+import json
+import math
+import statistics
+import sys
+import time
+from bisect import bisect_right
+from typing import List, Optional, Sequence
+
+from power_trace import FLAG_GUARDED, load_trace, np
+
+DEFAULT_TRACE_DIR = "../tmp/traces"
+DEFAULT_THRESHOLDS = tuple(range(50, 301, 25))  # 活跃功耗阈值（W）
+DEFAULT_INTERVALS = (5, 10, 15, 20, 30, 45, 60)  # 不活跃判断间隔（分钟）
+DEFAULT_STEP = 60  # 回放时间网格的步长（秒）
+DEFAULT_GUARD_POWER = 100.0  # 轨迹中没有守护期间的样本时，估算能耗使用的守护功耗（W）
+MAX_GAP = 300  # 超过该时间（秒）没有样本的 GPU 视为离线
+MAX_STEPS = 100_000  # 回放时间网格的最大步数
+MAX_GRID_VALUES = 1000  # 单个网格参数的最大取值数
+MAX_CHUNK_CELLS = 5_000_000  # 向量化回放每批处理的 GPU 数 × 时间步数 上限，控制内存占用
+HAS_NUMPY = np is not None
+
+
+def parse_grid(spec: str) -> List[float]:
+    """解析网格参数："50,100,150" 或 "起点:终点:步长"（包含终点），返回去重后升序的取值。"""
+    spec = spec.strip()
+    if ':' in spec:
+        start, stop, step = (float(part) for part in spec.split(':'))
+        if step <= 0:
+            raise ValueError("grid step must be positive")
+        values = [start + i * step for i in range(int(math.floor((stop - start) / step + 1e-9)) + 1)]
+    else:
+        values = [float(part) for part in spec.split(',') if part.strip()]
+    if not values or len(values) > MAX_GRID_VALUES:
+        raise ValueError(f"grid must have between 1 and {MAX_GRID_VALUES} values: {spec}")
+    return sorted(set(round(value, 6) for value in values))
+
+
+def _grid_numpy(records, start: float, step: float, steps: int):
+    """把记录对齐到 [GPU, 时间步] 的功耗矩阵，返回 (GPU 键列表, 矩阵, 守护期间的功耗样本)。"""
+    power = records['power_draw'].astype(np.float64)
+    guarded = (records['flags'] & FLAG_GUARDED) != 0
+    guard_samples = power[guarded & ~np.isnan(power)]
+    power[guarded] = 0.0
+    valid = ~np.isnan(power)
+
+    # GPU 键为 host × 每主机 GPU 数上限 + gpu，按出现的键编号（避免对全部记录排序）
+    width = int(records['gpu'].max()) + 1 if len(records) else 1
+    keys = records['host'].astype(np.int64) * width + records['gpu']
+    present = np.bincount(keys, minlength=1) > 0
+    gpu_keys = np.flatnonzero(present)
+    rows = (np.cumsum(present) - 1)[keys]
+    cells = rows * steps + ((records['ts'] - start) // step).astype(np.int64)
+    size = len(gpu_keys) * steps
+    total = np.bincount(cells[valid], weights=power[valid], minlength=size)
+    count = np.bincount(cells[valid], minlength=size)
+    with np.errstate(invalid='ignore'):
+        grid = (total / count).reshape(len(gpu_keys), steps)  # 没有样本的格为 NaN
+
+    # 缺样本的格沿用前值，间隔超过 MAX_GAP 时视为离线（NaN）
+    positions = np.arange(steps)
+    source = np.where(np.isnan(grid), -1, positions)
+    np.maximum.accumulate(source, axis=1, out=source)
+    filled = np.take_along_axis(grid, np.maximum(source, 0), axis=1)
+    filled[(source < 0) | ((positions - source) * step > MAX_GAP)] = np.nan
+    return [(int(key) // width, int(key) % width) for key in gpu_keys], filled, guard_samples.tolist()
+
+
+def _count_below(values, thresholds) -> list:
+    """thresholds（升序）中每个阈值 T 下，values 里小于 T 的个数（inf/NaN 不计）。"""
+    values = values[values < thresholds[-1]]  # 不低于最大阈值的值不计入任何阈值，先过滤掉再二分查找
+    bins = np.bincount(np.searchsorted(thresholds, values, side='right'), minlength=len(thresholds) + 1)
+    return np.cumsum(bins)[:len(thresholds)]
+
+
+def _simulate_numpy(grid, thresholds: Sequence[float], windows: Sequence[int]):
+    """向量化回放，返回 (守护步数[阈值][间隔], 启动次数[阈值][间隔], 低于阈值的在线步数[阈值])。
+
+    每个间隔只需按时间递推一次与阈值无关的 Q[t] = max(P[t], min(M[t], Q[t-1]))，Q[-1] = +inf，
+    P 为功耗、M 为窗口平均功耗（离线时均为 +inf）。阈值 T 下 t 时刻守护在运行当且仅当 Q[t] < T
+    （存在 s <= t 使 M[s] < T 且 P[s..t] 都低于 T），启动次数为满足 Q[t] < T <= Q[t-1] 的 t 的个数。
+    全部阈值的计数由 Q 在阈值网格中的位置一次统计得到，耗时与阈值个数基本无关。
+    """
+    thresholds = np.asarray(thresholds, dtype=np.float64)
+    gpus, steps = grid.shape
+    on_steps = np.zeros((len(thresholds), len(windows)), dtype=np.int64)
+    starts = np.zeros_like(on_steps)
+    low_steps = np.zeros(len(thresholds), dtype=np.int64)
+    positions = np.arange(steps)
+    chunk = max(1, MAX_CHUNK_CELLS // max(1, steps))
+    for first in range(0, gpus, chunk):
+        power = np.ascontiguousarray(grid[first:first + chunk].T)  # [时间, GPU]，按时间递推时每一步访问连续内存
+        valid = ~np.isnan(power)
+        total = np.zeros((steps + 1, power.shape[1]))
+        np.cumsum(np.where(valid, power, 0.0), axis=0, out=total[1:])
+        count = np.zeros((steps + 1, power.shape[1]), dtype=np.int64)
+        np.cumsum(valid, axis=0, out=count[1:])
+        power = np.where(valid, power, np.inf)
+        low_steps += _count_below(power, thresholds)
+
+        for j, window in enumerate(windows):
+            window_start = np.maximum(positions + 1 - window, 0)
+            window_count = count[1:] - count[window_start]
+            with np.errstate(invalid='ignore', divide='ignore'):
+                mean = (total[1:] - total[window_start]) / window_count
+            mean[window_count == 0] = np.inf
+            q = np.empty_like(power)
+            np.maximum(power[0], mean[0], out=q[0])
+            for t in range(1, steps):
+                np.minimum(mean[t], q[t - 1], out=q[t])
+                np.maximum(power[t], q[t], out=q[t])
+            on_steps[:, j] += _count_below(q, thresholds)
+            before = np.empty_like(q)
+            before[0] = np.inf
+            before[1:] = q[:-1]
+            rising = (q < before) & (q < thresholds[-1]) & (before >= thresholds[0])  # 可能在某个阈值下启动的时刻
+            starts[:, j] += _count_below(q[rising], thresholds) - _count_below(before[rising], thresholds)
+    return on_steps.tolist(), starts.tolist(), low_steps.tolist()
+
+
+def _grid_python(records, start: float, step: float, steps: int):
+    """_grid_numpy 的纯 Python 版本，矩阵为嵌套列表。"""
+    cells = {}  # (host, gpu) -> {时间步: [功耗之和, 样本数]}
+    guard_samples = []
+    for ts, host, gpu, flags, power, _ in records:
+        if flags & FLAG_GUARDED:
+            if not math.isnan(power):
+                guard_samples.append(power)
+            power = 0.0
+        gpu_cells = cells.setdefault((host, gpu), {})
+        if math.isnan(power):
+            continue
+        cell = gpu_cells.setdefault(int((ts - start) // step), [0.0, 0])
+        cell[0] += power
+        cell[1] += 1
+
+    keys = sorted(cells)
+    grid = []
+    for key in keys:
+        gpu_cells, row, value, since = cells[key], [], math.nan, None
+        for col in range(steps):
+            cell = gpu_cells.get(col)
+            if cell is not None:
+                value, since = cell[0] / cell[1], col
+            row.append(value if since is not None and (col - since) * step <= MAX_GAP else math.nan)
+        grid.append(row)
+    return keys, grid, guard_samples
+
+
+def _cumulative(bins: List[int]) -> List[int]:
+    """bins[i] 为阈值网格位置 i 上的个数，返回每个阈值下的累计个数（最后一格为不低于任何阈值）。"""
+    result, running = [], 0
+    for value in bins[:-1]:
+        running += value
+        result.append(running)
+    return result
+
+
+def _simulate_python(grid, thresholds: Sequence[float], windows: Sequence[int]):
+    """_simulate_numpy 的纯 Python 版本：逐个 GPU 按同样的递推计算 Q。"""
+    k, inf = len(thresholds), math.inf
+    on_bins = [[0] * (k + 1) for _ in windows]
+    rise_bins = [[0] * (k + 1) for _ in windows]  # Q[t] 落在的位置（+1）与 Q[t-1] 落在的位置（-1）
+    low_bins = [0] * (k + 1)
+    for row in grid:
+        total, count = [0.0], [0]
+        for value in row:
+            valid = not math.isnan(value)
+            total.append(total[-1] + (value if valid else 0.0))
+            count.append(count[-1] + valid)
+        power = [inf if math.isnan(value) else value for value in row]
+        for value in power:
+            low_bins[bisect_right(thresholds, value)] += 1
+        for j, window in enumerate(windows):
+            previous = inf
+            for t, value in enumerate(power):
+                window_start = max(0, t + 1 - window)
+                n = count[t + 1] - count[window_start]
+                mean = (total[t + 1] - total[window_start]) / n if n else inf
+                q = max(value, min(mean, previous))
+                on_bins[j][bisect_right(thresholds, q)] += 1
+                if q < previous:
+                    rise_bins[j][bisect_right(thresholds, q)] += 1
+                    rise_bins[j][bisect_right(thresholds, previous)] -= 1
+                previous = q
+    on_steps = [_cumulative(bins) for bins in on_bins]
+    starts = [_cumulative(bins) for bins in rise_bins]
+    # 转为 [阈值][间隔]
+    return ([list(row) for row in zip(*on_steps)], [list(row) for row in zip(*starts)], _cumulative(low_bins))
+
+
+def _count_gpus(records) -> int:
+    if np is not None:
+        return len(np.unique(records['host'].astype(np.int64) << 16 | records['gpu']))
+    return len({(record[1], record[2]) for record in records})
+
+
+def simulate(trace_dir: str, start: float, end: float, thresholds: Sequence[float] = DEFAULT_THRESHOLDS,
+             intervals: Sequence[float] = DEFAULT_INTERVALS, step: float = DEFAULT_STEP,
+             guard_power: Optional[float] = None, prefix: Optional[str] = None,
+             max_cells: Optional[int] = None) -> dict:
+    """回放 [start, end) 内的轨迹，评估 thresholds（W）× intervals（分钟）的全部组合。
+
+    guard_power 为守护期间 GPU 的功耗（W），默认取轨迹中守护期间样本的中位数。prefix 只回放主机名以其开头的节点。
+    max_cells 限制 GPU 数 × 时间步数（功耗矩阵的大小），默认不限制。参数不合法或超出限制时抛出 ValueError。
+    """
+    if step <= 0 or end <= start:
+        raise ValueError("step must be positive and end must be after start")
+    steps = int(math.ceil((end - start) / step))
+    if steps > MAX_STEPS:
+        raise ValueError(f"too many time steps ({steps} > {MAX_STEPS}), use a larger step")
+    if not thresholds or not intervals or min(intervals) <= 0:
+        raise ValueError("thresholds and intervals must be non-empty and intervals positive")
+    thresholds, intervals = sorted(thresholds), sorted(intervals)  # 按阈值网格计数要求阈值升序
+
+    started = time.perf_counter()
+    hostnames, records = load_trace(trace_dir, start, end)
+    if prefix:
+        host_ids = [host_id for host_id, hostname in hostnames.items() if hostname.startswith(prefix)]
+        if np is not None:
+            records = records[np.isin(records['host'], host_ids)]
+        else:
+            host_ids = set(host_ids)
+            records = [record for record in records if record[1] in host_ids]
+    if max_cells is not None:
+        gpus = _count_gpus(records)
+        if gpus * steps > max_cells:
+            raise ValueError(f"too many cells ({gpus} GPUs x {steps} steps > {max_cells}), "
+                             "use a larger step, a shorter range or a host prefix")
+    windows = [max(1, int(round(interval * 60 / step))) for interval in intervals]
+    if np is not None:
+        keys, grid, guard_samples = _grid_numpy(records, start, step, steps)
+        on_steps, starts, low_steps = _simulate_numpy(grid, thresholds, windows)
+    else:
+        keys, grid, guard_samples = _grid_python(records, start, step, steps)
+        on_steps, starts, low_steps = _simulate_python(grid, thresholds, windows)
+
+    observed = statistics.median(guard_samples) if guard_samples else None
+    if guard_power is None:
+        guard_power = observed if observed is not None else DEFAULT_GUARD_POWER
+    hours_per_step = step / 3600
+    policies = []
+    for i, threshold in enumerate(thresholds):
+        idle_hours = low_steps[i] * hours_per_step
+        for j, interval in enumerate(intervals):
+            guard_hours = on_steps[i][j] * hours_per_step
+            count = starts[i][j]
+            policies.append({
+                'active_power_threshold': threshold,
+                'guard_interval_minutes': interval,
+                'guard_starts': count,
+                'guard_gpu_hours': round(guard_hours, 3),
+                'mean_guard_minutes': round(guard_hours * 60 / count, 2) if count else None,
+                'energy_kwh': round(guard_hours * guard_power / 1000, 3),
+                'idle_gpu_hours': round(idle_hours, 3),  # 功耗低于阈值的在线时长，coverage 为其中被守护的比例
+                'coverage': round(guard_hours / idle_hours, 4) if idle_hours else None,
+            })
+    return {
+        'start': start,
+        'end': end,
+        'step': step,
+        'hosts': len({host for host, _ in keys}),
+        'gpus': len(keys),
+        'records': len(records),
+        'guard_power': round(guard_power, 2),
+        'guard_power_observed': None if observed is None else round(observed, 2),
+        'backend': 'numpy' if np is not None else 'python',
+        'seconds': round(time.perf_counter() - started, 3),
+        'policies': policies,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--trace-dir', type=str, default=DEFAULT_TRACE_DIR, help='TraceRecorder 写入的轨迹目录')
+    parser.add_argument('--days', type=float, default=1, help='回放最近多少天的轨迹')
+    parser.add_argument('--end', type=float, default=None, help='回放的结束时间（Unix 秒），默认为当前时间')
+    parser.add_argument('--thresholds', type=parse_grid, default=list(DEFAULT_THRESHOLDS),
+                        help='活跃功耗阈值（W）："50,100,150" 或 "50:300:25"')
+    parser.add_argument('--intervals', type=parse_grid, default=list(DEFAULT_INTERVALS),
+                        help='不活跃判断间隔（分钟），格式同 --thresholds')
+    parser.add_argument('--step', type=float, default=DEFAULT_STEP, help='回放时间网格的步长（秒）')
+    parser.add_argument('--guard-power', type=float, default=None, help='守护期间 GPU 的功耗（W），默认从轨迹估计')
+    parser.add_argument('--prefix', type=str, default=None, help='只回放主机名以此开头的节点')
+    parser.add_argument('--json', type=str, default=None, help='把结果写入 JSON 文件')
+    args = parser.parse_args()
+
+    end = args.end if args.end is not None else time.time()
+    try:
+        result = simulate(args.trace_dir, end - args.days * 86400, end, args.thresholds, args.intervals,
+                          step=args.step, guard_power=args.guard_power, prefix=args.prefix)
+    except ValueError as e:
+        parser.error(str(e))
+
+    print(f"轨迹: {result['hosts']} 个节点, {result['gpus']} 个 GPU, {result['records']} 条记录, "
+          f"守护功耗 {result['guard_power']} W, {len(result['policies'])} 组策略, "
+          f"耗时 {result['seconds']:.2f}s ({result['backend']})")
+    print(f"{'阈值(W)':>8} {'间隔(min)':>9} {'启动次数':>8} {'守护(GPU·h)':>11} {'平均(min)':>9} {'能耗(kWh)':>10} {'覆盖率':>7}")
+    for row in result['policies']:
+        mean = '-' if row['mean_guard_minutes'] is None else f"{row['mean_guard_minutes']:.1f}"
+        coverage = '-' if row['coverage'] is None else f"{row['coverage']:.1%}"
+        print(f"{row['active_power_threshold']:>8g} {row['guard_interval_minutes']:>9g} {row['guard_starts']:>8} "
+              f"{row['guard_gpu_hours']:>11.2f} {mean:>9} {row['energy_kwh']:>10.2f} {coverage:>7}")
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(result, f, indent=2)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,230 @@
+import os
+import sqlite3
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Tuple
+
+from loguru import logger
+
+METRICS = ('utilization', 'memory_used', 'power_draw', 'temperature')
+
+# 各存储层级：表名 -> (桶宽度秒数, 默认保留时长秒数)，raw 层的宽度即写入节流间隔
+TIERS = {
+    'raw': (30, 6 * 3600),
+    '1m': (60, 7 * 24 * 3600),
+    '1h': (3600, 180 * 24 * 3600),
+}
+AUTO_VACUUM_INCREMENTAL = 2  # PRAGMA auto_vacuum 的返回值
+MAX_QUERY_POINTS = 12000  # 自动选择层级时单条曲线的点数上限（7 天的 1m 数据约 1 万点）
+
+
+class HistoryStore:
+    """基于 SQLite 的 GPU 指标时序存储。
+
+    采样先在内存中聚合，由写入线程定期批量落盘：raw 层按桶宽度（30 秒）节流保存原始样本，
+    1m/1h 层保存每个时间桶的累加值（样本数、各指标之和、功耗最大值）。
+    各层按保留时长定期清理并回收空间，磁盘占用有上界。
+    """
+
+    def __init__(self, path: str, flush_interval: float = 10, prune_interval: float = 600,
+                 retention: Optional[Dict[str, int]] = None):
+        self.path = path
+        self.flush_interval = flush_interval
+        self.prune_interval = prune_interval
+        self.retention = {tier: seconds for tier, (_, seconds) in TIERS.items()}
+        self.retention.update(retention or {})
+
+        self._lock = threading.Lock()
+        self._raw_rows: List[tuple] = []
+        self._last_raw: Dict[Tuple[str, int], float] = {}  # (hostname, gpu) -> 上次写入 raw 的时间
+        # (tier, hostname, gpu, bucket) -> [n, sum(utilization), sum(memory_used), sum(power_draw), sum(temperature), max(power_draw)]
+        self._buckets: Dict[tuple, list] = {}
+        self._host_ids: Dict[str, int] = {}
+
+        self._stopped = threading.Event()
+        self._thread = None
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._init_db()
+
+    @contextmanager
+    def _connect(self):
+        """打开一个短连接，退出时提交并关闭（查询和写入线程各自使用独立连接）。"""
+        conn = sqlite3.connect(self.path, timeout=30)
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def _init_db(self):
+        # auto_vacuum 只能在启用 WAL、建表之前设置才生效；之前未开启的已有数据库执行一次 VACUUM 转换
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        try:
+            conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+            if conn.execute("PRAGMA auto_vacuum").fetchone()[0] != AUTO_VACUUM_INCREMENTAL:
+                logger.info(f"转换历史数据库为增量回收模式（VACUUM）: {self.path}")
+                conn.execute("VACUUM")
+        finally:
+            conn.close()
+        with self._connect() as conn:
+            conn.execute("CREATE TABLE IF NOT EXISTS hosts (id INTEGER PRIMARY KEY, hostname TEXT UNIQUE NOT NULL)")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS samples_raw ("
+                "host_id INTEGER, gpu INTEGER, ts INTEGER, "
+                "utilization REAL, memory_used REAL, power_draw REAL, temperature REAL, "
+                "PRIMARY KEY (host_id, gpu, ts)) WITHOUT ROWID"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_samples_raw_ts ON samples_raw (ts)")
+            for tier in ('1m', '1h'):
+                conn.execute(
+                    f"CREATE TABLE IF NOT EXISTS samples_{tier} ("
+                    "host_id INTEGER, gpu INTEGER, ts INTEGER, n INTEGER, "
+                    "utilization REAL, memory_used REAL, power_draw REAL, temperature REAL, power_max REAL, "
+                    "PRIMARY KEY (host_id, gpu, ts)) WITHOUT ROWID"
+                )
+                conn.execute(f"CREATE INDEX IF NOT EXISTS idx_samples_{tier}_ts ON samples_{tier} (ts)")
+            self._host_ids = {hostname: host_id for host_id, hostname in conn.execute("SELECT id, hostname FROM hosts")}
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._stopped.clear()
+        self._thread = threading.Thread(target=self._run, name="history-store", daemon=True)
+        self._thread.start()
+        logger.info(f"GPU 指标历史存储已启动: {self.path}")
+
+    def stop(self):
+        self._stopped.set()
+        if self._thread:
+            self._thread.join(timeout=self.flush_interval)
+        self.flush()
+
+    def on_sample(self, hostname: str, gpu, ts: float):
+        """节点采样回调（Node.sample_listeners），只做内存聚合，不访问磁盘。"""
+        values = (gpu.utilization, gpu.memory_used, gpu.power_draw, gpu.temperature)
+        key = (hostname, gpu.index)
+        with self._lock:
+            if ts - self._last_raw.get(key, 0) >= TIERS['raw'][0]:
+                self._last_raw[key] = ts
+                self._raw_rows.append((hostname, gpu.index, int(ts)) + values)
+            for tier in ('1m', '1h'):
+                width = TIERS[tier][0]
+                bucket_key = (tier, hostname, gpu.index, int(ts) // width * width)
+                acc = self._buckets.get(bucket_key)
+                if acc is None:
+                    self._buckets[bucket_key] = [1, *values, gpu.power_draw]
+                else:
+                    # 不可用的字段（None）使该时间桶对应指标的累加值为 None，查询时跳过
+                    acc[0] += 1
+                    for i, value in enumerate(values, start=1):
+                        acc[i] = None if value is None or acc[i] is None else acc[i] + value
+                    if gpu.power_draw is not None:
+                        acc[5] = gpu.power_draw if acc[5] is None else max(acc[5], gpu.power_draw)
+
+    def _run(self):
+        last_prune = 0.0
+        while not self._stopped.wait(self.flush_interval):
+            try:
+                self.flush()
+                if time.time() - last_prune >= self.prune_interval:
+                    self.prune()
+                    last_prune = time.time()
+            except Exception as e:
+                logger.error(f"写入 GPU 指标历史失败: {e}")
+
+    def _host_id(self, conn: sqlite3.Connection, hostname: str) -> int:
+        host_id = self._host_ids.get(hostname)
+        if host_id is None:
+            conn.execute("INSERT OR IGNORE INTO hosts (hostname) VALUES (?)", (hostname,))
+            host_id = conn.execute("SELECT id FROM hosts WHERE hostname = ?", (hostname,)).fetchone()[0]
+            self._host_ids[hostname] = host_id
+        return host_id
+
+    def flush(self):
+        with self._lock:
+            raw_rows, self._raw_rows = self._raw_rows, []
+            buckets, self._buckets = self._buckets, {}
+        if not raw_rows and not buckets:
+            return
+        with self._connect() as conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO samples_raw VALUES (?, ?, ?, ?, ?, ?, ?)",
+                [(self._host_id(conn, row[0]),) + row[1:] for row in raw_rows]
+            )
+            rows_by_tier = defaultdict(list)
+            for (tier, hostname, gpu, bucket), acc in buckets.items():
+                rows_by_tier[tier].append((self._host_id(conn, hostname), gpu, bucket, *acc))
+            for tier, rows in rows_by_tier.items():
+                # 同一时间桶可能跨多次落盘，累加到已有记录上
+                conn.executemany(
+                    f"INSERT INTO samples_{tier} VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?) "
+                    "ON CONFLICT (host_id, gpu, ts) DO UPDATE SET "
+                    "n = n + excluded.n, utilization = utilization + excluded.utilization, "
+                    "memory_used = memory_used + excluded.memory_used, power_draw = power_draw + excluded.power_draw, "
+                    "temperature = temperature + excluded.temperature, power_max = MAX(power_max, excluded.power_max)",
+                    rows
+                )
+
+    def prune(self):
+        now = int(time.time())
+        with self._connect() as conn:
+            for tier, seconds in self.retention.items():
+                conn.execute(f"DELETE FROM samples_{tier} WHERE ts < ?", (now - seconds,))
+        with self._connect() as conn:
+            conn.execute("PRAGMA incremental_vacuum")
+        with self._lock:
+            cutoff = now - TIERS['raw'][0]
+            self._last_raw = {key: ts for key, ts in self._last_raw.items() if ts >= cutoff}
+
+    def choose_tier(self, start: float, end: float, now: Optional[float] = None) -> str:
+        """选择保留时长仍覆盖 start、且单条曲线不超过 MAX_QUERY_POINTS 个点的最细层级，都不满足时用最粗的层级。"""
+        now = time.time() if now is None else now
+        for tier, (width, _) in TIERS.items():  # 从细到粗
+            if now - start <= self.retention[tier] and (end - start) / width <= MAX_QUERY_POINTS:
+                return tier
+        return list(TIERS)[-1]
+
+    def query(self, metric: str, start: float, end: float, hostname: Optional[str] = None,
+              gpu: Optional[int] = None, tier: Optional[str] = None) -> dict:
+        """返回 {'tier', 'metric', 'series': [{'hostname', 'gpu', 'points': [[ts, value], ...]}]}。"""
+        if metric not in METRICS and metric != 'power_max':
+            raise ValueError(f"Unknown metric: {metric}")
+        tier = tier or self.choose_tier(start, end)
+        if tier not in TIERS:
+            raise ValueError(f"Unknown tier: {tier}")
+        if tier == 'raw':
+            if metric == 'power_max':
+                metric = 'power_draw'
+            value_expr = f"s.{metric}"
+        else:
+            value_expr = "s.power_max" if metric == 'power_max' else f"s.{metric} / s.n"
+
+        width = TIERS[tier][0]
+        start = int(start) // width * width  # 包含起点所在的时间桶
+
+        sql = (f"SELECT h.hostname, s.gpu, s.ts, {value_expr} FROM samples_{tier} s "
+               "JOIN hosts h ON h.id = s.host_id WHERE s.ts >= ? AND s.ts <= ?")
+        params = [int(start), int(end)]
+        if hostname is not None:
+            sql += " AND h.hostname = ?"
+            params.append(hostname)
+        if gpu is not None:
+            sql += " AND s.gpu = ?"
+            params.append(gpu)
+        sql += " ORDER BY s.host_id, s.gpu, s.ts"
+
+        self.flush()  # 让查询包含尚未落盘的最新数据
+        series, current = [], None
+        with self._connect() as conn:
+            for row_hostname, row_gpu, ts, value in conn.execute(sql, params):
+                if value is None:  # GPU 不支持该指标（nvidia-smi 输出 [N/A]）
+                    continue
+                if current is None or current['hostname'] != row_hostname or current['gpu'] != row_gpu:
+                    current = {'hostname': row_hostname, 'gpu': row_gpu, 'points': []}
+                    series.append(current)
+                current['points'].append([ts, round(value, 2)])
+        return {'tier': tier, 'metric': metric, 'series': series}
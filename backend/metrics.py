@@ -0,0 +1,208 @@
+import bisect
+import threading
+from typing import Callable, Dict, List, Sequence, Tuple
+
+# 命令/请求耗时的默认分桶（秒）
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+
+def _escape(value) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(names: Sequence[str], values: Sequence, extra: str = '') -> str:
+    parts = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return '{' + ','.join(parts) + '}' if parts else ''
+
+
+def _format_value(value: float) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Metric:
+    """Prometheus 文本格式的指标基类，按标签值分组保存样本，线程安全。"""
+
+    type = 'untyped'
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values: Dict[Tuple, object] = {}
+
+    def _key(self, labels: dict) -> Tuple:
+        return tuple(labels.get(name, '') for name in self.labelnames)
+
+    def clear(self):
+        """清空所有样本，用于按当前状态整体重建的指标（避免已移除节点的旧值一直导出）。"""
+        with self._lock:
+            self._values.clear()
+
+    def remove(self, **labels):
+        """删除标签值与 labels 一致的全部样本（如已移除节点的 hostname）。"""
+        match = [(self.labelnames.index(name), value) for name, value in labels.items()]
+        with self._lock:
+            for key in [key for key in self._values if all(key[i] == value for i, value in match)]:
+                del self._values[key]
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type}"]
+        with self._lock:
+            items = list(self._values.items())
+        for key, value in items:
+            lines.extend(self._render_sample(key, value))
+        return lines
+
+    def _render_sample(self, key: Tuple, value) -> List[str]:
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"]
+
+
+class Counter(Metric):
+    type = 'counter'
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def set_total(self, value: float, **labels):
+        """直接设置累计值，用于导出其他对象中已有的计数（如 SSH 重连次数）。"""
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+
+class Gauge(Metric):
+    type = 'gauge'
+
+    def set(self, value: float, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+
+class Histogram(Metric):
+    type = 'histogram'
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]  # 各桶计数、总和、总数
+            state[0][bisect.bisect_left(self.buckets, value)] += 1
+            state[1] += value
+            state[2] += 1
+
+    def _render_sample(self, key: Tuple, value) -> List[str]:
+        counts, total, count = value
+        lines = []
+        cumulative = 0
+        for bound, bucket_count in zip(self.buckets + (float('inf'),), counts):
+            cumulative += bucket_count
+            le = f'le="{_format_value(bound)}"'
+            lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}")
+        labels = _format_labels(self.labelnames, key)
+        lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+        lines.append(f"{self.name}_count{labels} {count}")
+        return lines
+
+
+class Registry:
+    """指标注册表。collectors 在每次抓取时调用，用于把当前状态（快照、连接等）写入 Gauge/Counter。"""
+
+    def __init__(self):
+        self.metrics: List[Metric] = []
+        self.collectors: List[Callable[[], None]] = []
+
+    def register(self, metric: Metric) -> Metric:
+        self.metrics.append(metric)
+        return metric
+
+    def add_collector(self, collector: Callable[[], None]):
+        self.collectors.append(collector)
+
+    def render(self) -> str:
+        for collector in self.collectors:
+            collector()
+        lines: List[str] = []
+        for metric in self.metrics:
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = Registry()
+
+# 热路径上直接记录的指标
+COMMAND_SECONDS = REGISTRY.register(Histogram(
+    'gpu_monitor_command_seconds', 'Latency of commands run on nodes.', ['hostname', 'command']))
+COMMAND_FAILURES = REGISTRY.register(Counter(
+    'gpu_monitor_command_failures_total', 'Commands that failed or could not be sent.', ['hostname', 'command']))
+SWEEP_SECONDS = REGISTRY.register(Histogram(
+    'gpu_monitor_sweep_seconds', 'Duration of a full collector sweep.'))
+GUARD_ACTIONS = REGISTRY.register(Counter(
+    'gpu_monitor_guard_actions_total', 'Guard start/stop results per node.', ['action', 'result']))
+HTTP_REQUEST_SECONDS = REGISTRY.register(Histogram(
+    'gpu_monitor_http_request_seconds', 'Latency of HTTP handlers.', ['endpoint', 'method', 'status']))
+
+# 抓取时由 collector 回调刷新的指标
+SNAPSHOT_AGE = REGISTRY.register(Gauge(
+    'gpu_monitor_snapshot_age_seconds', 'Age of the snapshot served by the API.'))
+SSH_RECONNECTS = REGISTRY.register(Counter(
+    'gpu_monitor_ssh_reconnects_total', 'SSH reconnects after the first connection.', ['hostname']))
+SSH_FAILURES = REGISTRY.register(Gauge(
+    'gpu_monitor_ssh_consecutive_failures', 'Consecutive SSH connect failures (circuit breaker).', ['hostname']))
+NODE_UP = REGISTRY.register(Gauge(
+    'gpu_monitor_node_up', 'Whether the node is online (1) or not (0).', ['hostname']))
+NODE_GUARD_RUNNING = REGISTRY.register(Gauge(
+    'gpu_monitor_node_guard_running', 'Whether a guard process runs on the node.', ['hostname']))
+GPU_GAUGES = {
+    field: REGISTRY.register(Gauge(f'gpu_monitor_gpu_{name}', documentation, ['hostname', 'gpu']))
+    for field, name, documentation in (
+        ('power_draw', 'power_watts', 'GPU power draw in watts.'),
+        ('utilization', 'utilization_percent', 'GPU utilization in percent.'),
+        ('memory_used', 'memory_used_mib', 'GPU memory used in MiB.'),
+        ('memory_total', 'memory_total_mib', 'GPU memory total in MiB.'),
+        ('temperature', 'temperature_celsius', 'GPU temperature in Celsius.'),
+    )
+}
+GPU_GUARDED = REGISTRY.register(Gauge(
+    'gpu_monitor_gpu_guarded', 'Whether a guard process runs on the GPU.', ['hostname', 'gpu']))
+
+
+def forget_host(hostname: str):
+    """节点从集群中移除时删除其命令耗时和失败次数（其余按节点的指标在每次抓取时整体重建）。"""
+    for metric in (COMMAND_SECONDS, COMMAND_FAILURES):
+        metric.remove(hostname=hostname)
+
+
+def export_cluster_state(nodes_manager, collector):
+    """抓取时调用：把连接状态和最新快照中的节点/GPU 数值写入对应指标（整体重建，已移除的节点不会残留）。"""
+    age = collector.age()
+    if age is not None:
+        SNAPSHOT_AGE.set(age)
+    per_node = [SSH_RECONNECTS, SSH_FAILURES, NODE_UP, NODE_GUARD_RUNNING, GPU_GUARDED] + list(GPU_GAUGES.values())
+    for metric in per_node:
+        metric.clear()
+    for node in nodes_manager.nodes:
+        if node.link is not None:
+            SSH_RECONNECTS.set_total(node.link.reconnects, hostname=node.hostname)
+            SSH_FAILURES.set(node.link.failures, hostname=node.hostname)
+    snapshot, _ = collector.snapshot()
+    for node in snapshot:
+        hostname = node['hostname']
+        NODE_UP.set(int(bool(node['is_online'])), hostname=hostname)
+        NODE_GUARD_RUNNING.set(int(bool(node['guard_running'])), hostname=hostname)
+        guarded = set(node.get('guarded_gpus') or [])
+        for gpu in node['gpus']:
+            for field, gauge in GPU_GAUGES.items():
+                if gpu.get(field) is not None:
+                    gauge.set(gpu[field], hostname=hostname, gpu=gpu['index'])
+            GPU_GUARDED.set(int(gpu['index'] in guarded), hostname=hostname, gpu=gpu['index'])
@@ -0,0 +1,68 @@
+from typing import List, Optional, Tuple
+
+# 状态筛选，取值与前端 ControlPanel 的选项一致
+FILTERS = {
+    'all': lambda node: True,
+    'online': lambda node: node.get('is_online'),
+    'offline': lambda node: not node.get('is_online'),
+    'guarding': lambda node: node.get('guard_running'),
+    'not_guarding': lambda node: not node.get('guard_running'),
+    'needs_guard': lambda node: node.get('need_guard'),
+}
+
+
+def _avg_power(node: dict) -> float:
+    values = [gpu['power_draw'] for gpu in node['gpus'] if gpu.get('power_draw') is not None]
+    return sum(values) / len(values) if values else -1.0
+
+
+# 排序键及其默认方向（True 为降序）；同值时按主机名排序
+SORT_KEYS = {
+    'hostname': (lambda node: node['hostname'], False),
+    'gpus': (lambda node: len(node['gpus']), True),
+    'guard_running': (lambda node: bool(node.get('guard_running')), True),
+    'need_guard': (lambda node: bool(node.get('need_guard')), True),
+    'idle_gpus': (lambda node: len(node.get('idle_gpus') or []), True),
+    'power': (_avg_power, True),
+}
+MAX_LIMIT = 500  # 单页最多返回的节点数
+
+
+def query_nodes(nodes: List[dict], status: str = 'all', prefix: Optional[str] = None, search: Optional[str] = None,
+                sort: str = 'hostname', order: Optional[str] = None, page: int = 1,
+                limit: Optional[int] = None) -> Tuple[int, List[dict]]:
+    """在快照上筛选、排序和分页，返回 (筛选后的总数, 当前页节点)。
+
+    prefix 为主机名前缀，search 为主机名子串（不区分大小写）；limit 为空时返回全部（不分页）。
+    参数不合法时抛出 ValueError。
+    """
+    if status not in FILTERS:
+        raise ValueError(f"Unknown status filter: {status}")
+    if sort not in SORT_KEYS:
+        raise ValueError(f"Unknown sort key: {sort}")
+    if order not in (None, 'asc', 'desc'):
+        raise ValueError(f"Unknown sort order: {order}")
+    if page < 1 or (limit is not None and not 1 <= limit <= MAX_LIMIT):
+        raise ValueError(f"page must be >= 1 and limit between 1 and {MAX_LIMIT}")
+
+    matches = FILTERS[status]
+    search = search.lower() if search else None
+    selected = [
+        node for node in nodes
+        if matches(node)
+        and (not prefix or node['hostname'].startswith(prefix))
+        and (not search or search in node['hostname'].lower())
+    ]
+    key, descending = SORT_KEYS[sort]
+    if order is not None:
+        descending = order == 'desc'
+    selected.sort(key=lambda node: node['hostname'])  # 稳定排序：同值时保持主机名顺序
+    if sort != 'hostname':
+        selected.sort(key=key, reverse=descending)
+    elif descending:
+        selected.reverse()
+
+    if limit is None:
+        return len(selected), selected
+    start = (page - 1) * limit
+    return len(selected), selected[start:start + limit]
@@ -1,37 +1,69 @@
+import math
 import os
 import time
 import socket
 import subprocess
-from collections import defaultdict, deque
-from datetime import datetime, timedelta
-from typing import List, Union
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Set, Tuple, Union
 from loguru import logger
 
 from dataclasses import dataclass
 import json
-from fabric import Connection, Config
 from paramiko.ssh_exception import SSHException, NoValidConnectionsError
 
+from connection import SSHLink, CircuitOpenError
+from gpu_csv import FIELD_COUNT, GPU_QUERY_CMD, GpuRow, parse_gpu_csv, parse_gpu_line
+from metrics import COMMAND_FAILURES, COMMAND_SECONDS, forget_host
+from power_history import PowerHistory
+from sampler import GpuStreamSampler
+
 script_dir = os.path.dirname(os.path.abspath(__file__))
+probe_script = os.path.join(script_dir, 'probe.py')
+
+DEFAULT_CMD_TIMEOUT = 20  # 单条远程命令的超时时间（秒）
+DEFAULT_CMD_RETRIES = 1  # 连接中断时重连并重试命令的次数
+DEFAULT_MAX_WORKERS = 32  # 并发操作节点的最大线程数
+DEFAULT_NODE_TIMEOUT = 30  # 单个节点一次操作的截止时间（秒），从该节点任务开始执行时计时
+DEFAULT_SAMPLE_INTERVAL = 5  # 未开启常驻采样时的功耗采样间隔（秒），与采集周期一致
+HISTORY_RETENTION = 30 * 60  # 功耗历史保留时长（秒）
+MAX_HISTORY_CAPACITY = 7200  # 每个 GPU 功耗环形缓冲区的最大样本数
+DEFAULT_GUARD_INTERVAL = 10  # 默认的不活跃判断间隔（分钟）
+DEFAULT_ACTIVE_POWER_THRESHOLD = 100  # 默认的活跃功耗阈值（W）
+GUARD_PIDFILE = 'gpu_guard.pid'  # start_task.sh 写入的守护进程 PID 文件（位于节点 tmp 目录）
+DEFAULT_GUARD_ARGS = ''  # 传给 gpu_guard.py 的额外参数，如 "--target-util 50 --yield-on-foreign"
+PUSH_TIMEOUT = 60  # 推送节点超过该时间（秒）没有上报即视为离线
+SOURCES = ('pull', 'push')  # host 文件中 source=<...> 的取值：pull 由后端通过 SSH 采集，push 由节点上的 agent.py 推送
+
+_gpu_names: Dict[str, str] = {}  # 所有节点共用的 GPU 型号字符串表，见 gpu_csv.parse_gpu_line
 
 @dataclass
 class GPU:
+    """单个 GPU 的最新指标。采集时按 index 原地更新（见 Node._apply_gpu_rows），不可用的字段为 None。"""
+
+    __slots__ = ('index', 'name', 'temperature', 'utilization', 'memory_used', 'memory_total', 'power_draw')
     index: int
     name: str
-    temperature: float
-    utilization: float
-    memory_used: int
-    memory_total: int
-    power_draw: float
+    temperature: Optional[float]
+    utilization: Optional[float]
+    memory_used: Optional[int]
+    memory_total: Optional[int]
+    power_draw: Optional[float]
 
     def to_dict(self):
-        return self.__dict__
+        # 返回新字典：快照需要与之后的原地更新隔离
+        return {field: getattr(self, field) for field in self.__slots__}
 
     def update(self, **kwargs):
         for key, value in kwargs.items():
             if hasattr(self, key):
                 setattr(self, key, value)
 
+    def set_row(self, row: GpuRow):
+        """用 gpu_csv 解析出的一行更新除 index 外的全部字段。"""
+        _, self.name, self.temperature, self.utilization, self.memory_used, self.memory_total, self.power_draw = row
+
     def __str__(self):
         return (
             f"[GPU {self.index}] {self.name} | 温度: {self.temperature}°C | "
@@ -41,25 +73,69 @@ class GPU:
 
 
 class Node:
-    def __init__(self, hostname: str, need_guard_interval=10, active_power_threshold=100):
+    source = 'pull'
+
+    def __init__(self, hostname: str, need_guard_interval=DEFAULT_GUARD_INTERVAL,
+                 active_power_threshold=DEFAULT_ACTIVE_POWER_THRESHOLD,
+                 cmd_timeout=DEFAULT_CMD_TIMEOUT, stream_interval_ms=None, sample_listeners=None,
+                 guard_args=DEFAULT_GUARD_ARGS):
         self.hostname = hostname
-        self.gpus = []
+        self.state = 'initializing'  # initializing -> ready，见 initialize()
+        self.init_seconds = None
+        self.gpus: List[GPU] = []  # 按 index 排序；GPU 集合不变时列表和其中的对象都原地复用
         self.is_guard_running = False
+        self.guarded_gpus = []  # 守护进程正在运行的 GPU 序号
+        self.is_stale = False  # 最近一次采集是否超时/失败（数据为旧值）
+        self.cpu = None  # {'percent', 'load1', 'cores'}
+        self.memory = None  # {'used', 'total', 'percent'}，单位 MiB
+        self.cmd_timeout = cmd_timeout
         self.need_guard_interval = need_guard_interval
         self.active_power_threshold = active_power_threshold
 
-        self.power_history = defaultdict(lambda: deque())
-        self.is_local = self._check_is_local()
+        # 按固定间隔降采样写入，容量由保留时长决定：采样更快或混有其他来源的样本时也能覆盖 HISTORY_RETENTION
+        sample_interval = stream_interval_ms / 1000 if stream_interval_ms else DEFAULT_SAMPLE_INTERVAL
+        resolution = max(sample_interval, HISTORY_RETENTION / MAX_HISTORY_CAPACITY)
+        self.power_history = PowerHistory(int(math.ceil(HISTORY_RETENTION / resolution)) + 1, resolution)
+        # 每个 GPU 样本的回调 fn(hostname, gpu, ts)，用于持久化等（由 Nodes 统一传入）
+        self.sample_listeners = sample_listeners if sample_listeners is not None else []
         self.tmp_folder = f"../tmp/{self.hostname}"
         os.makedirs(self.tmp_folder, exist_ok=True)
         self.guard_name = f"gpu_guard_{self.hostname}"
-        self.last_update_time = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-
-        self.conn = None
-        self.is_online = self._init_connection_if_remote()
-
-        self.update_gpu_info()
-        self.update_guard_status()
+        self.guard_args = guard_args
+        # start_task.sh 在 script_dir 下执行，PID 文件使用绝对路径，探针和 kill 命令在任意目录下都能找到
+        self.guard_pidfile = os.path.normpath(os.path.join(script_dir, self.tmp_folder, GUARD_PIDFILE))
+        self.last_update_ts = time.time()
+
+        # 连接相关状态在 initialize() 中确定，构造函数不做任何网络操作
+        self.is_local = False
+        self.link = None  # SSH 长连接（本地节点为 None）
+        self.is_online = False
+
+        # 常驻采样线程和采集线程都会更新 self.gpus，由该锁串行化
+        self._gpu_lock = threading.Lock()
+        # 常驻 nvidia-smi 采样（stream_interval_ms 为 None 时关闭，GPU 信息随每次 update 获取）
+        self.sampler = GpuStreamSampler(self, stream_interval_ms) if stream_interval_ms else None
+
+    def initialize(self):
+        """解析主机、建立连接并完成第一次采集，由 Nodes 在后台线程池中并发调用。"""
+        started = time.monotonic()
+        try:
+            self.is_local = self._check_is_local()
+            self.link = None if self.is_local else SSHLink(self.hostname)
+            self.is_online = self._init_connection_if_remote()
+            self.update()
+            if self.sampler and self.state != 'removed':
+                self.sampler.start()
+        finally:
+            self.init_seconds = time.monotonic() - started
+            self._finish_initialize()
+
+    def _finish_initialize(self):
+        # 初始化期间节点已从 host 文件移除时保持 removed，并再次释放初始化过程中建立的连接和采样
+        if self.state == 'removed':
+            self.close()
+        else:
+            self.state = 'ready'
 
     def _check_is_local(self) -> bool:
         local_hostnames = {socket.gethostname(), socket.getfqdn(), "localhost", "127.0.0.1"}
@@ -72,171 +148,413 @@ class Node:
         except Exception:
             return False
 
+    def close(self):
+        """节点从集群中移除时释放常驻采样和 SSH 连接。"""
+        self.state = 'removed'
+        if self.sampler:
+            self.sampler.stop()
+        if self.link:
+            self.link.close()
+
+    @property
+    def conn(self):
+        return self.link.conn if self.link else None
+
     def _init_connection_if_remote(self) -> bool:
         if self.is_local:
             return True
         try:
-            config = Config(overrides={'connect_timeout': 5})
-            self.conn = Connection(self.hostname, config=config)
-            self.conn.open()
+            self.link.get()
             return True
         except Exception as e:
             logger.warning(f"[{self.hostname}] SSH连接失败: {e}")
-            self.conn = None
             return False
 
-    def run_cmd(self, cmd: str, timeout=300) -> str:
-        if not self.is_online:
-            logger.warning(f"[{self.hostname}] 离线状态，跳过命令: {cmd}")
-            return False, ""
-        try:
-            if self.is_local:
+    def run_cmd(self, cmd: str, timeout=None, retries=DEFAULT_CMD_RETRIES, name='other') -> Tuple[bool, str]:
+        """执行命令并返回 (是否成功, 输出)，按 name（probe、nvidia-smi、guard_check 等）记录耗时和失败次数。"""
+        started = time.monotonic()
+        status, output = self._execute(cmd, timeout, retries)
+        COMMAND_SECONDS.observe(time.monotonic() - started, hostname=self.hostname, command=name)
+        if not status:
+            COMMAND_FAILURES.inc(hostname=self.hostname, command=name)
+        return status, output
+
+    def _execute(self, cmd: str, timeout=None, retries=DEFAULT_CMD_RETRIES) -> Tuple[bool, str]:
+        if timeout is None:
+            timeout = self.cmd_timeout
+        if self.is_local:
+            try:
                 result = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, timeout=timeout, shell=True)
-                if result.returncode in (0, 1):
-                    return True, result.stdout.strip()
-                if result.returncode == -15 and 'pkill' in cmd:
-                    return True, ""
-                logger.error(f"[{self.hostname}] 本地命令失败: {result.stderr.strip()}")
+            except Exception as e:
+                logger.warning(f"[{self.hostname}] 命令执行异常: {e}")
                 return False, ""
-            else:
-                if self.conn is None:
-                    self.is_online = self._init_connection_if_remote()
-                    if not self.is_online:
-                        return False, ""
-                result = self.conn.run(cmd, hide=True, timeout=timeout, warn=True)
+            if result.returncode in (0, 1):
                 return True, result.stdout.strip()
-        except (SSHException, NoValidConnectionsError) as e:
-            logger.warning(f"[{self.hostname}] SSH连接中断: {e}，尝试重连")
-            self.conn = None
-            self.is_online = self._init_connection_if_remote()
-            return self.run_cmd(cmd, timeout)
-        except Exception as e:
-            logger.warning(f"[{self.hostname}] 命令执行异常: {e}")
+            if result.returncode == -15 and 'pkill' in cmd:
+                return True, ""
+            logger.error(f"[{self.hostname}] 本地命令失败: {result.stderr.strip()}")
             return False, ""
 
+        for attempt in range(retries + 1):
+            try:
+                conn = self.link.get()
+            except CircuitOpenError:
+                # 熔断期间直接跳过，不产生任何网络开销
+                self.is_online = False
+                return False, ""
+            except Exception as e:
+                logger.warning(f"[{self.hostname}] SSH连接失败: {e}")
+                self.is_online = False
+                return False, ""
+            self.is_online = True
+            try:
+                result = conn.run(cmd, hide=True, timeout=timeout, warn=True)
+                return True, result.stdout.strip()
+            except (SSHException, NoValidConnectionsError, EOFError) as e:
+                logger.warning(f"[{self.hostname}] SSH连接中断: {e}，尝试重连 ({attempt + 1}/{retries + 1})")
+                self.link.mark_broken()
+            except Exception as e:
+                logger.warning(f"[{self.hostname}] 命令执行异常: {e}")
+                return False, ""
+        return False, ""
+
     def update_time(self):
-        self.last_update_time = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        self.last_update_ts = time.time()  # 只记录时间戳，to_dict 时再格式化
+
+    @property
+    def last_update_time(self) -> str:
+        return datetime.fromtimestamp(self.last_update_ts).strftime('%Y-%m-%d %H:%M:%S')
 
     def update_gpu_info(self) -> List:
-        query = (
-            "nvidia-smi --query-gpu=index,name,temperature.gpu,utilization.gpu," 
-            "memory.used,memory.total,power.draw --format=csv,noheader,nounits"
-        )
-        status, output = self.run_cmd(query)
+        status, output = self.run_cmd(GPU_QUERY_CMD, name='nvidia-smi')
         if not status:
             return []
+        self._apply_gpu_csv(output)
+
+    def _apply_gpu_csv(self, output: str):
+        rows = parse_gpu_csv(output, _gpu_names)
+        if not rows and output.strip():
+            logger.info(f"[{self.hostname}] 解析 GPU 信息失败: {output.strip()[:200]}")
+        self._apply_gpu_rows(rows)
+
+    def _apply_gpu_rows(self, rows: List[GpuRow], ts: Optional[float] = None):
+        """用一次完整输出更新全部 GPU：已有的 GPU 对象原地更新，GPU 集合变化时才重建列表。
+
+        ts 为样本的采集时间（time.time），默认为当前时间。
+        """
+        if ts is None:
+            ts = time.time()
+        indices = [row[0] for row in rows]
+        with self._gpu_lock:
+            if indices != [gpu.index for gpu in self.gpus]:
+                current = {gpu.index: gpu for gpu in self.gpus}
+                self.gpus = [current.get(index) or GPU(*row) for index, row in zip(indices, rows)]
+            for gpu, row in zip(self.gpus, rows):
+                gpu.set_row(row)
+                self._record_sample(gpu, ts)
+        if rows:
+            self.update_time()
+
+    def apply_gpu_line(self, line: str) -> bool:
+        """常驻采样：解析一行 nvidia-smi 输出，原地更新对应的 GPU 并记录功耗。"""
+        row = parse_gpu_line(line, _gpu_names)
+        if row is None:
+            return False
+        with self._gpu_lock:
+            gpu = next((g for g in self.gpus if g.index == row[0]), None)
+            if gpu is None:
+                gpu = GPU(*row)
+                self.gpus = sorted(self.gpus + [gpu], key=lambda g: g.index)
+            else:
+                gpu.set_row(row)
+            self._record_sample(gpu, time.time())
+        self.update_time()
+        return True
 
-        self.gpus = []
-        for line in output.splitlines():
-            parts = [p.strip() for p in line.split(',')]
-            if len(parts) != 7:
-                continue
+    def _record_sample(self, gpu: GPU, ts: float):
+        if gpu.power_draw is not None:  # 功耗不可用的 GPU 没有功耗历史，不会被判定为空闲
+            self.record_power(gpu.index, gpu.power_draw, time.monotonic() - (time.time() - ts))
+        for listener in self.sample_listeners:
             try:
-                gpu = GPU(
-                    index=int(parts[0]),
-                    name=parts[1],
-                    temperature=float(parts[2]),
-                    utilization=float(parts[3]),
-                    memory_used=int(parts[4]),
-                    memory_total=int(parts[5]),
-                    power_draw=float(parts[6])
-                )
-                self.gpus.append(gpu)
-                self.record_power(gpu.index, gpu.power_draw)
-                self.update_time()
+                listener(self.hostname, gpu, ts)
             except Exception as e:
-                logger.info(f"[{self.hostname}] 解析 GPU 信息失败: {e}")
-
-    def record_power(self, gpu_index: int, power_draw: float):
-        now = datetime.now()
-        history = self.power_history[gpu_index]
-        history.append((now, power_draw))
+                logger.warning(f"[{self.hostname}] 处理 GPU 样本失败: {e}")
 
-        cutoff = now - timedelta(minutes=30)
-        while history and history[0][0] < cutoff:
-            history.popleft()
+    def record_power(self, gpu_index: int, power_draw: float, ts: Optional[float] = None):
+        self.power_history.record(gpu_index, power_draw, ts)
 
     def update_guard_status(self):
-        cmd = f"ps aux | grep '{self.guard_name}' | grep -v grep"
-        status, result = self.run_cmd(cmd)
+        self.check_guard()
+
+    @property
+    def _guard_pattern(self) -> str:
+        # 只匹配 gpu_guard.py 的参数（与 probe.is_guard_argv 一致），start_task.sh、探针和执行命令的 shell
+        # 命令行中虽然也包含 guard_name，但不会被匹配；[g]pu_guard 的写法使 pgrep/pkill 不会匹配到 shell 自身
+        name = self.guard_name.replace('.', '\\.')
+        return f"'[g]pu_guard\\.py( .*)? --name {name}( |$)'"
+
+    def _gpu_pidfile(self, index: int) -> str:
+        # 与 start_task.sh 中的命名一致：<PID 文件去掉 .pid>_gpu<序号>.pid
+        return f"{self.guard_pidfile[:-len('.pid')]}_gpu{index}.pid"
+
+    def _set_guard_state(self, running: bool, guarded_gpus: List[int]):
+        # 只能按名称检测到的旧版整机守护进程（没有每 GPU 的 PID 文件）视为守护全部 GPU
+        if running and not guarded_gpus:
+            guarded_gpus = [gpu.index for gpu in self.gpus]
+        self.is_guard_running = running
+        self.guarded_gpus = sorted(guarded_gpus)
+
+    def check_guard(self) -> bool:
+        """检查守护进程是否在运行：逐个检查每 GPU 的 PID 文件，再按名称匹配（兼容没有 PID 文件的旧守护进程）。"""
+        prefix = self.guard_pidfile[:-len('.pid')]
+        cmd = (f"for f in {prefix}_gpu*.pid; do [ -f \"$f\" ] && kill -0 $(cat \"$f\") 2>/dev/null && "
+               f"echo \"${{f##*_gpu}}\"; done; "
+               f"if kill -0 $(cat {self.guard_pidfile} 2>/dev/null) 2>/dev/null || "
+               f"pgrep -f {self._guard_pattern} >/dev/null; then echo running; fi")
+        status, output = self.run_cmd(cmd, name='guard_check')
         self.update_time()
-        self.is_guard_running = bool(status and result)
+        if status:
+            lines = output.split()
+            guarded = [int(line[:-len('.pid')]) for line in lines if line.endswith('.pid') and line[:-len('.pid')].isdigit()]
+            self._set_guard_state('running' in lines or bool(guarded), guarded)
+        return self.is_guard_running
 
     def update_guard_policy(self, need_guard_interval, active_power_threshold):
         self.active_power_threshold = active_power_threshold
         self.need_guard_interval = need_guard_interval
 
-    def update(self):
-        self.update_gpu_info()
-        self.update_guard_status()
-
-    def start_guard(self):
-        self.update_guard_status()
-        if self.is_guard_running:
-            logger.info(f"[{self.hostname}] 守护进程已运行")
-            return
+    def probe(self, skip_gpu=False) -> bool:
+        """通过 probe.py 一次性获取 GPU、守护进程、CPU 和内存信息，失败时返回 False。"""
+        cmd = f"python3 {probe_script} {self.guard_name} --pidfile {self.guard_pidfile}"
+        if skip_gpu:
+            cmd += " --skip-gpu"
+        status, output = self.run_cmd(cmd, name='probe')
+        if not status or not output:
+            return False
+        try:
+            data = json.loads(output)
+        except ValueError as e:
+            logger.warning(f"[{self.hostname}] 解析探针输出失败: {e}")
+            return False
+        if data.get('gpu_csv') is not None:
+            self._apply_gpu_csv(data['gpu_csv'])
+        self._set_guard_state(bool(data.get('guard_running')), data.get('guarded_gpus') or [])
+        self.cpu = data.get('cpu')
+        self.memory = data.get('memory')
+        self.update_time()
+        return True
 
-        cmd = f"cd {script_dir} && bash start_task.sh {self.guard_name} {os.path.join(self.tmp_folder, 'gpu_guard.log')}"
-        status, output = self.run_cmd(cmd)
+    def update(self):
+        # 常驻采样正常时 GPU 信息已实时更新，探针只需采集其余信息
+        streaming = self.sampler is not None and self.sampler.is_healthy()
+        if not self.probe(skip_gpu=streaming):
+            # 探针不可用（例如远端缺少 python3）时退回逐条执行命令
+            if not streaming:
+                self.update_gpu_info()
+            self.update_guard_status()
+        self.is_stale = False
+
+    def start_guard(self, gpus: Union[List[int], None] = None) -> Union[List[int], None]:
+        """在 gpus（默认为空闲且未守护的 GPU）上各启动一个单卡守护进程并立即返回，运行状态由 check_guard() 异步确认。
+
+        返回本次要守护的 GPU 序号（可能为空列表），命令执行失败时返回 None。
+        已在运行的 GPU 由 start_task.sh 依据 PID 文件跳过，因此无需事先检查状态。
+        """
+        if gpus is None:
+            gpus = self.unguarded_idle_gpus()
+        if not gpus:
+            logger.info(f"[{self.hostname}] 没有需要守护的空闲 GPU")
+            return []
+        log_path = os.path.join(self.tmp_folder, 'gpu_guard.log')
+        cmd = (f"cd {script_dir} && GUARD_GPUS={','.join(map(str, gpus))} "
+               f"bash start_task.sh {self.guard_name} {log_path} {self.guard_pidfile} {self.guard_args}")
+        status, output = self.run_cmd(cmd, name='guard_start')
         if not status:
             logger.warning(f"[{self.hostname}] 启动守护进程失败")
-        else:
-            time.sleep(1)
-            self.update_guard_status()
-            if self.is_guard_running:
-                logger.info(f"[{self.hostname}] 启动守护脚本成功")
-            else:
-                logger.warning(f"[{self.hostname}] 启动守护脚本失败")
+            return None
+        logger.info(f"[{self.hostname}] 已在 GPU {gpus} 上启动守护进程")
+        return list(gpus)
 
-    def stop_guard(self):
-        self.update_guard_status()
-        if not self.is_guard_running:
-            logger.info(f"[{self.hostname}] 守护进程未运行")
-            return
+    def stop_guard(self, gpus: Union[List[int], None] = None) -> bool:
+        """按 PID 文件终止 gpus（默认全部）上的守护进程并删除 PID 文件，立即返回。
 
-        cmd = f"pkill -f {self.guard_name}"
-        status, output = self.run_cmd(cmd)
+        终止全部时还会按名称清理没有 PID 文件的残留进程（如旧版整机守护进程）。
+        """
+        if gpus is None:
+            pidfiles = f"{self.guard_pidfile[:-len('.pid')]}_gpu*.pid {self.guard_pidfile}"
+        else:
+            pidfiles = ' '.join(self._gpu_pidfile(index) for index in gpus)
+        cmd = f"for f in {pidfiles}; do [ -f \"$f\" ] && kill $(cat \"$f\") 2>/dev/null; rm -f \"$f\"; done"
+        if gpus is None:
+            cmd += f"; pkill -f {self._guard_pattern}"
+        status, output = self.run_cmd(cmd, name='guard_stop')
         if not status:
             logger.error(f"[{self.hostname}] 终止守护进程失败")
-        else:
-            time.sleep(1)
-            self.update_guard_status()
-            if not self.is_guard_running:
-                logger.info(f"[{self.hostname}] 守护进程已终止")
-            else:
-                logger.warning(f"[{self.hostname}] 守护进程终止失败")
+        return status
+
+    def idle_gpus(self) -> List[int]:
+        """最近 need_guard_interval 分钟平均功耗低于阈值（或还没有功耗数据）的 GPU 序号。"""
+        averages = self.power_history.averages(self.need_guard_interval * 60)
+        return sorted(index for index, avg_power in averages.items()
+                      if avg_power is None or avg_power < self.active_power_threshold)
+
+    def unguarded_idle_gpus(self) -> List[int]:
+        guarded = set(self.guarded_gpus)
+        return [index for index in self.idle_gpus() if index not in guarded]
 
     def need_guard(self) -> bool:
-        now = datetime.now()
-        for index, records in self.power_history.items():
-            recent = [p for t, p in records if t >= now - timedelta(minutes=self.need_guard_interval)]
-            if not recent:
-                return True
-            avg_power = sum(recent) / len(recent)
-            if avg_power < self.active_power_threshold:
-                return True
-        return False
+        return bool(self.unguarded_idle_gpus())
 
     def to_dict(self) -> dict:
-        self.update_gpu_info()
-        self.update_guard_status()
+        idle_gpus = self.idle_gpus()
+        guarded = set(self.guarded_gpus)
         return {
             'hostname': self.hostname,
+            'source': self.source,
+            'state': self.state,
             'gpus': [gpu.to_dict() for gpu in self.gpus],
             'guard_running': self.is_guard_running,
+            'guarded_gpus': self.guarded_gpus,
             'last_updated': self.last_update_time,
-            'need_guard': self.need_guard(),
-            'is_online': self.is_online
+            'idle_gpus': idle_gpus,
+            'need_guard': any(index not in guarded for index in idle_gpus),
+            'is_online': self.is_online,
+            'stale': self.is_stale,
+            'cpu': self.cpu,
+            'memory': self.memory,
+            'history_bytes': self.power_history.nbytes,
+            'connection': self.link.to_dict() if self.link else {'state': 'local'}
         }
 
 
+def _is_number(value) -> bool:
+    """有限的 int/float（不含 bool、NaN 和 Infinity）。"""
+    return type(value) in (int, float) and math.isfinite(value)
+
+
+class PushNode(Node):
+    """由节点上的 agent.py 主动推送数据的节点（host 文件中标记 source=push）。
+
+    采集不经过 SSH：ingest() 应用 agent 上报的一批样本，update() 只根据最后一次上报的时间判断是否离线。
+    启停守护进程等低频操作仍按需建立 SSH 连接执行，与拉取节点相同。
+    """
+    source = 'push'
+
+    def __init__(self, hostname: str, push_timeout=PUSH_TIMEOUT, **kwargs):
+        kwargs['stream_interval_ms'] = None  # 样本由 agent 推送，不启动常驻采样
+        super().__init__(hostname, **kwargs)
+        self.push_timeout = push_timeout
+        self.last_push = None  # 最后一次收到上报的时间（time.monotonic）
+        self._ingest_lock = threading.Lock()
+
+    def initialize(self):
+        """只创建 SSH 连接对象（第一次执行命令时才建连），不做探测。"""
+        started = time.monotonic()
+        self.is_local = self._check_is_local()
+        self.link = None if self.is_local else SSHLink(self.hostname)
+        self.init_seconds = time.monotonic() - started
+        self._finish_initialize()
+
+    @property
+    def is_online(self) -> bool:
+        """是否在线只取决于 agent 是否按时上报，SSH 命令的成败不影响。"""
+        return self.last_push is not None and time.monotonic() - self.last_push <= self.push_timeout
+
+    @is_online.setter
+    def is_online(self, value):
+        pass  # Node 在建连和执行命令时会设置 is_online，推送节点忽略
+
+    def ingest(self, reports: List[dict]):
+        """按时间顺序应用 agent 上报的样本 [{'ts', 'gpus', 'guard_running', 'guarded_gpus', 'cpu', 'memory'}, ...]。
+
+        样本时间按本批最后一个样本对齐到收到上报的时间，节点与后端的时钟偏差不影响功耗历史。
+        """
+        samples = [self._parse_report(report) for report in reports]  # 先校验全部样本，格式错误时不应用任何数据
+        if not samples:
+            return
+        with self._ingest_lock:
+            offset = time.time() - samples[-1][0]
+            for ts, rows in samples:
+                if rows is not None:
+                    self._apply_gpu_rows(rows, ts + offset)
+            last = reports[-1]
+            self._set_guard_state(bool(last.get('guard_running')), last.get('guarded_gpus') or [])
+            self.cpu = last.get('cpu')
+            self.memory = last.get('memory')
+            self.last_push = time.monotonic()
+            self.is_stale = False
+            self.update_time()
+
+    @staticmethod
+    def _parse_report(report: dict) -> Tuple[float, Optional[List[GpuRow]]]:
+        """校验一个样本，返回 (ts, GPU 行)；格式不正确时抛出 ValueError。"""
+        if not isinstance(report, dict):
+            raise ValueError("report must be an object")
+        ts = report.get('ts')
+        if not _is_number(ts):
+            raise ValueError(f"invalid report ts: {ts!r}")
+        guarded = report.get('guarded_gpus') or []
+        if not isinstance(guarded, list) or not all(type(index) is int for index in guarded):
+            raise ValueError(f"invalid guarded_gpus: {guarded!r}")
+        for key in ('cpu', 'memory'):
+            stats = report.get(key)
+            if stats is not None and (not isinstance(stats, dict) or not all(map(_is_number, stats.values()))):
+                raise ValueError(f"invalid {key}: {stats!r}")
+        gpus = report.get('gpus')
+        if gpus is None:
+            return float(ts), None
+        if not isinstance(gpus, list):
+            raise ValueError("gpus must be a list")
+        for row in gpus:
+            # json.loads 接受 NaN/Infinity：一个 NaN 功耗会使功耗历史的前缀和永久变为 NaN，也无法序列化为标准 JSON
+            if (not isinstance(row, list) or len(row) != FIELD_COUNT or type(row[0]) is not int
+                    or not isinstance(row[1], str)
+                    or not all(value is None or _is_number(value) for value in row[2:])):
+                raise ValueError(f"invalid gpu row: {row!r}")
+        return float(ts), [tuple(row) for row in gpus]
+
+    def update(self):
+        # 曾经上报过但已超时：保留旧数据并标记为过期
+        self.is_stale = self.last_push is not None and not self.is_online
+
+
 class Nodes:
-    def __init__(self, host_file_path: str):
+    def __init__(self, host_file_path: str, max_workers=DEFAULT_MAX_WORKERS, node_timeout=DEFAULT_NODE_TIMEOUT,
+                 stream_interval_ms=None, watch_interval=None, guard_args=DEFAULT_GUARD_ARGS,
+                 node_factory: Union[Callable[..., Node], None] = None):
         self.host_file_path = host_file_path
+        self.node_factory = node_factory or Node  # 创建节点的工厂，基准测试用 fake_nodes.SimulatedNode 替换
+        self.node_timeout = node_timeout
+        self.stream_interval_ms = stream_interval_ms
+        self.guard_args = guard_args
+        self.sample_listeners = []  # 所有节点共享，见 add_sample_listener
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="node")
+        self._pending = {}  # (kind, hostname) -> 该节点上仍在执行的任务（Future）
+        self._pending_lock = threading.Lock()
+
+        # 启动耗时：从读取 host 文件到所有节点完成初始化
+        self._load_started = time.monotonic()
+        self.startup_seconds = None
+        self._initialized = threading.Event()
+        self._reload_lock = threading.Lock()
+        # 当前生效的守护策略，热加载新增的节点也使用它（见 update_guard_policy）
+        self.guard_policy = {'need_guard_interval': DEFAULT_GUARD_INTERVAL,
+                             'active_power_threshold': DEFAULT_ACTIVE_POWER_THRESHOLD}
+        self._host_file_stamp = self._stat_host_file()
         self.nodes = self._load_nodes()
+        self.push_nodes = self._index_push_nodes(self.nodes)
+        self._initialize_in_background(self.nodes, on_done=self._record_startup)
 
-    def _load_nodes(self) -> List[Node]:
-        nodes = []
+        # 定期检查 host 文件变化（watch_interval 为 None 时不监视）
+        if watch_interval:
+            threading.Thread(target=self._watch, args=(watch_interval,), name="hostfile-watch", daemon=True).start()
+
+    def _read_host_file(self) -> Optional[Dict[str, str]]:
+        """返回 {hostname: source}（去重并保持顺序），读取失败时返回 None。
+
+        每行为 "主机名 slots=8 [source=push]"，未指定 source 时为 pull。
+        """
+        hosts = {}
         try:
             with open(self.host_file_path, 'r') as f:
                 for line in f:
@@ -244,44 +562,209 @@ class Nodes:
                     if not line or line.startswith("#"):
                         continue
                     parts = line.split()
-                    hostname = parts[0]
-                    node = Node(hostname)
-                    nodes.append(node)
-                    logger.info(f"加载节点: {node.hostname} 完成")
+                    source = next((part[len('source='):] for part in parts[1:] if part.startswith('source=')), 'pull')
+                    if source not in SOURCES:
+                        logger.warning(f"[{parts[0]}] 未知的数据来源 source={source}，按 pull 处理")
+                        source = 'pull'
+                    hosts.setdefault(parts[0], source)
         except Exception as e:
-            logger.info(f"读取host文件失败: {e}")
-        return nodes
+            logger.warning(f"读取host文件失败: {e}")
+            return None
+        return hosts
+
+    def _stat_host_file(self):
+        try:
+            stat = os.stat(self.host_file_path)
+            return stat.st_mtime_ns, stat.st_size
+        except OSError:
+            return None
+
+    def _watch(self, interval: float):
+        while True:
+            time.sleep(interval)
+            try:
+                self.reload_if_changed()
+            except Exception as e:
+                logger.error(f"重新加载host文件失败: {e}")
+
+    def reload_if_changed(self) -> bool:
+        """host 文件发生变化时增量更新节点列表：新增节点后台初始化，移除的节点释放连接，
+        未变化的节点保留连接和功耗历史。返回是否有变化。"""
+        with self._reload_lock:
+            stamp = self._stat_host_file()
+            if stamp is None or stamp == self._host_file_stamp:
+                return False
+            hosts = self._read_host_file()
+            if hosts is None:
+                return False  # 保留现有节点，不更新 stamp，下次检查时重试
+            self._host_file_stamp = stamp
+            # 数据来源（pull/push）变化的节点视为先移除再新增
+            current = {node.hostname: node for node in self.nodes
+                       if hosts.get(node.hostname) == node.source}
+            added = [self._create_node(hostname, source) for hostname, source in hosts.items()
+                     if hostname not in current]
+            new_nodes = {node.hostname: node for node in added}
+            removed = [node for node in self.nodes if node.hostname not in current]
+            if not added and not removed:
+                return False
+
+            # 按 host 文件中的顺序重建列表，整体替换，其他线程遍历的旧列表不受影响
+            self.nodes = [current.get(hostname) or new_nodes[hostname] for hostname in hosts]
+            self.push_nodes = self._index_push_nodes(self.nodes)
+            for node in removed:
+                node.close()
+                if node.hostname not in new_nodes:  # 仅数据来源变化的节点保留指标
+                    forget_host(node.hostname)
+            logger.info(f"host文件已变化：新增 {[n.hostname for n in added]}，移除 {[n.hostname for n in removed]}")
+            if added:
+                self._initialize_in_background(added)
+            return True
+
+    def _create_node(self, hostname: str, source: str = 'pull') -> Node:
+        if source == 'push':
+            return PushNode(hostname, sample_listeners=self.sample_listeners, guard_args=self.guard_args,
+                            **self.guard_policy)
+        return self.node_factory(hostname, stream_interval_ms=self.stream_interval_ms,
+                                 sample_listeners=self.sample_listeners, guard_args=self.guard_args,
+                                 **self.guard_policy)
+
+    def _load_nodes(self) -> List[Node]:
+        """只解析 host 文件并注册节点（initializing 状态），连接和探测在后台进行。"""
+        hosts = self._read_host_file()
+        if hosts is None:
+            self._host_file_stamp = None  # 读取失败，由 reload_if_changed 重试
+            return []
+        return [self._create_node(hostname, source) for hostname, source in hosts.items()]
+
+    @staticmethod
+    def _index_push_nodes(nodes: List[Node]) -> Dict[str, PushNode]:
+        return {node.hostname: node for node in nodes if node.source == 'push'}
+
+    def ingest(self, hostname: str, reports: List[dict]) -> bool:
+        """应用 agent 推送的样本；hostname 不是 host 文件中的推送节点时返回 False。"""
+        node = self.push_nodes.get(hostname)
+        if node is None:
+            return False
+        node.ingest(reports)
+        return True
+
+    def _initialize_in_background(self, nodes: List[Node], on_done: Union[Callable, None] = None):
+        def run():
+            # 初始化包含建连和第一次探测，截止时间放宽为普通操作的两倍
+            _, failed = self.run_parallel(lambda node: node.initialize(), nodes, timeout=2 * self.node_timeout,
+                                          kind='init')
+            for node in nodes:
+                if node.hostname not in failed:
+                    logger.info(f"加载节点: {node.hostname} 完成，耗时 {node.init_seconds:.2f}s")
+            if on_done:
+                on_done()
+
+        threading.Thread(target=run, name="nodes-init", daemon=True).start()
+
+    def _record_startup(self):
+        self.startup_seconds = time.monotonic() - self._load_started
+        logger.info(f"全部 {len(self.nodes)} 个节点初始化完成，耗时 {self.startup_seconds:.2f}s")
+        self._initialized.set()
+
+    def wait_initialized(self, timeout: Union[float, None] = None) -> bool:
+        return self._initialized.wait(timeout)
+
+    def ready_nodes(self) -> List[Node]:
+        return [node for node in self.nodes if node.state == 'ready']
+
+    def status(self) -> dict:
+        return {
+            'nodes_total': len(self.nodes),
+            'nodes_initializing': sum(1 for node in self.nodes if node.state == 'initializing'),
+            'nodes_push': len(self.push_nodes),
+            'startup_seconds': self.startup_seconds,
+        }
 
     def to_dict(self) -> List[dict]:
         return [node.to_dict() for node in self.nodes]
 
-    def update(self):
-        for node in self.nodes:
-            node.update()
-
-    def start_guard(self, host_names: Union[List[str], None] = None):
+    def add_sample_listener(self, listener: Callable):
+        """注册 GPU 样本回调 listener(hostname, gpu, ts)，对所有节点生效。"""
+        self.sample_listeners.append(listener)
+
+    def run_parallel(self, func: Callable[[Node], object], nodes: List[Node],
+                     timeout: Union[float, None] = None, kind: str = 'update') -> Tuple[Dict[str, object], Set[str]]:
+        """在线程池中并发执行 func(node)。
+
+        每个节点的截止时间从其任务真正开始执行时计算，超时或异常的节点放入 failed 集合，
+        已完成节点的结果照常返回。同一类（kind）上一次任务仍未结束的节点不会重复提交，直接视为失败，
+        避免挂起的主机占满线程池；不同类的操作（如采集与启停守护）互不阻塞。返回 (results, failed)。
+        """
+        if timeout is None:
+            timeout = self.node_timeout
+        started = {}
+
+        def task(node):
+            started[node.hostname] = time.monotonic()
+            return func(node)
+
+        results, failed = {}, set()
+        futures = {}
+        with self._pending_lock:
+            for node in nodes:
+                previous = self._pending.get((kind, node.hostname))
+                if previous is not None and not previous.done():
+                    logger.warning(f"[{node.hostname}] 上一次操作尚未结束，跳过本次")
+                    failed.add(node.hostname)
+                    continue
+                future = self.executor.submit(task, node)
+                self._pending[(kind, node.hostname)] = future
+                futures[future] = node.hostname
+
+        remaining = set(futures)
+        while remaining:
+            done, remaining = wait(remaining, timeout=0.5, return_when=FIRST_COMPLETED)
+            for future in done:
+                hostname = futures[future]
+                try:
+                    results[hostname] = future.result()
+                except Exception as e:
+                    logger.error(f"[{hostname}] 执行失败: {e}")
+                    failed.add(hostname)
+            now = time.monotonic()
+            for future in list(remaining):
+                hostname = futures[future]
+                if hostname in started and now - started[hostname] > timeout:
+                    logger.warning(f"[{hostname}] 操作超过 {timeout}s 未完成，本轮放弃等待")
+                    failed.add(hostname)
+                    remaining.discard(future)
+        return results, failed
+
+    def select(self, host_names: Union[List[str], None]) -> List[Node]:
+        """已就绪节点中属于 host_names 的部分，host_names 为空时返回全部已就绪节点。"""
+        nodes = self.ready_nodes()
         if not host_names:
-            host_names = [node.hostname for node in self.nodes]
-        for node in self.nodes:
-            if node.hostname in host_names:
-                node.start_guard()
-        return {node.hostname: node.is_guard_running for node in self.nodes}
+            return nodes
+        host_names = set(host_names)
+        return [node for node in nodes if node.hostname in host_names]
 
-    def stop_guard(self, host_names: Union[List[str], None] = None):
-        if not host_names:
-            host_names = [node.hostname for node in self.nodes]
-        for node in self.nodes:
-            if node.hostname in host_names:
-                node.stop_guard()
-        return {node.hostname: not node.is_guard_running for node in self.nodes}
+    def update(self):
+        nodes = self.ready_nodes()  # 仍在初始化的节点由初始化任务负责第一次采集
+        _, failed = self.run_parallel(lambda node: node.update(), nodes)
+        for node in nodes:
+            if node.hostname in failed:
+                node.is_stale = True
 
     def update_guard_policy(self, need_guard_interval, active_power_threshold):
-        for node in self.nodes:
-            node.update_guard_policy(need_guard_interval, active_power_threshold)
+        if need_guard_interval * 60 > HISTORY_RETENTION:
+            logger.warning(f"不活跃判断间隔 {need_guard_interval} 分钟超过功耗历史保留时长 {HISTORY_RETENTION // 60} 分钟，"
+                           f"实际只按最近 {HISTORY_RETENTION // 60} 分钟的平均功耗判断")
+        # 与 reload_if_changed 互斥，避免正在新增的节点错过本次修改
+        with self._reload_lock:
+            self.guard_policy = {'need_guard_interval': need_guard_interval,
+                                 'active_power_threshold': active_power_threshold}
+            for node in self.nodes:
+                node.update_guard_policy(need_guard_interval, active_power_threshold)
 
 
 if __name__ == "__main__":
     nodes = Nodes("/etc/volcano/all.host")
+    nodes.wait_initialized()
     for node in nodes.nodes:
         print(node.to_dict())
-    # nodes.stop_guard()
+    # GuardJobs(nodes).submit('stop')
@@ -0,0 +1,110 @@
+import threading
+import time
+from array import array
+from typing import Dict, Optional
+
+
+class PowerRing:
+    """单个 GPU 的定长功耗环形缓冲区。
+
+    时间戳（time.monotonic）、功耗和前缀和分别保存在三个 array('d') 中，写入 O(1)。
+    每个窗口长度维护一个单调前进的起始游标，窗口平均值由前缀和相减得到，均摊 O(1)。
+    距当前槽位第一个样本不足 resolution 秒的样本合并到该槽位（取平均），每个槽位至少覆盖 resolution 秒，
+    缓冲区覆盖的时长不低于 capacity × resolution，与采样频率和不同来源的样本混合无关。
+    """
+
+    __slots__ = ('capacity', 'resolution', '_ts', '_values', '_cumsum', '_count', '_cursors',
+                 '_slot_start', '_slot_samples')
+
+    def __init__(self, capacity: int, resolution: float = 0.0):
+        self.capacity = capacity
+        self.resolution = resolution
+        self._ts = array('d', bytes(8 * capacity))
+        self._values = array('d', bytes(8 * capacity))
+        self._cumsum = array('d', bytes(8 * capacity))
+        self._count = 0  # 累计写入的样本数，同时作为下一个样本的绝对序号
+        self._cursors: Dict[float, int] = {}  # 窗口长度 -> 窗口内第一个样本的绝对序号
+        self._slot_start = 0.0  # 最新槽位第一个样本的时间
+        self._slot_samples = 0  # 最新槽位合并的样本数
+
+    def __len__(self):
+        return min(self._count, self.capacity)
+
+    @property
+    def nbytes(self) -> int:
+        return 3 * 8 * self.capacity
+
+    def append(self, ts: float, value: float):
+        if self._count and ts - self._slot_start < self.resolution:
+            # 合并到最新槽位：更新平均值和前缀和，时间戳取最新样本的时间
+            slot = (self._count - 1) % self.capacity
+            self._slot_samples += 1
+            mean = self._values[slot] + (value - self._values[slot]) / self._slot_samples
+            self._cumsum[slot] += mean - self._values[slot]
+            self._values[slot] = mean
+            self._ts[slot] = ts
+            return
+        self._slot_start = ts
+        self._slot_samples = 1
+        slot = self._count % self.capacity
+        previous = self._cumsum[(self._count - 1) % self.capacity] if self._count else 0.0
+        self._ts[slot] = ts
+        self._values[slot] = value
+        self._cumsum[slot] = previous + value
+        self._count += 1
+
+    def window_average(self, window: float, now: float) -> Optional[float]:
+        """最近 window 秒内的平均功耗，窗口内没有样本时返回 None。"""
+        if not self._count:
+            return None
+        cap = self.capacity
+        cutoff = now - window
+        oldest = max(0, self._count - cap)
+        start = max(self._cursors.get(window, oldest), oldest)
+        while start < self._count and self._ts[start % cap] < cutoff:
+            start += 1
+        if len(self._cursors) > 8:  # 策略频繁调整时避免游标无限增长
+            self._cursors.clear()
+        self._cursors[window] = start
+
+        n = self._count - start
+        if n == 0:
+            return None
+        first = start % cap
+        total = self._cumsum[(self._count - 1) % cap] - self._cumsum[first] + self._values[first]
+        return total / n
+
+
+class PowerHistory:
+    """节点上所有 GPU 的功耗历史，线程安全（常驻采样线程和采集线程会同时访问）。"""
+
+    def __init__(self, capacity: int, resolution: float = 0.0):
+        self.capacity = capacity
+        self.resolution = resolution
+        self._rings: Dict[int, PowerRing] = {}
+        self._lock = threading.Lock()
+
+    def record(self, gpu_index: int, power_draw: float, ts: Optional[float] = None):
+        if ts is None:
+            ts = time.monotonic()
+        with self._lock:
+            ring = self._rings.get(gpu_index)
+            if ring is None:
+                ring = self._rings[gpu_index] = PowerRing(self.capacity, self.resolution)
+            ring.append(ts, power_draw)
+
+    def averages(self, window: float, now: Optional[float] = None) -> Dict[int, Optional[float]]:
+        """每个 GPU 最近 window 秒内的平均功耗。"""
+        if now is None:
+            now = time.monotonic()
+        with self._lock:
+            return {index: ring.window_average(window, now) for index, ring in self._rings.items()}
+
+    def __len__(self):
+        return len(self._rings)
+
+    @property
+    def nbytes(self) -> int:
+        """功耗历史占用内存的上限（字节）。"""
+        with self._lock:
+            return sum(ring.nbytes for ring in self._rings.values())
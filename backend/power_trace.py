@@ -0,0 +1,181 @@
+"""GPU 功耗轨迹的记录与读取，供 guard_sim 离线回放守护策略。
+
+轨迹目录下每天（UTC）一个二进制文件 YYYYMMDD.trace，由定长记录（RECORD，24 字节，小端）组成：
+ts(float64) host(uint32) gpu(uint16) flags(uint16) power_draw(float32) utilization(float32)。
+不可用的数值记为 NaN；flags 的 FLAG_GUARDED 位表示采样时该 GPU 上有守护进程在运行。
+主机名表保存在同目录的 hosts 文件中（每行 "<id>\\t<hostname>"），只追加。
+"""
+import math
+import os
+import struct
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+from loguru import logger
+
+try:
+    import numpy as np  # 可选依赖，有时整块读取轨迹文件并向量化回放
+except ImportError:
+    np = None
+
+RECORD = struct.Struct('<dIHHff')
+RECORD_FIELDS = ('ts', 'host', 'gpu', 'flags', 'power_draw', 'utilization')
+RECORD_DTYPE = None if np is None else np.dtype(
+    [('ts', '<f8'), ('host', '<u4'), ('gpu', '<u2'), ('flags', '<u2'), ('power_draw', '<f4'), ('utilization', '<f4')])
+FLAG_GUARDED = 1
+HOSTS_FILE = 'hosts'
+TRACE_SUFFIX = '.trace'
+
+
+def _nan(value: Optional[float]) -> float:
+    return math.nan if value is None else value
+
+
+def _day(ts: float) -> str:
+    return time.strftime('%Y%m%d', time.gmtime(ts))
+
+
+def read_hosts(directory: str) -> Dict[str, int]:
+    """读取主机名表 {hostname: id}，不存在时返回空表。"""
+    hosts = {}
+    try:
+        with open(os.path.join(directory, HOSTS_FILE)) as f:
+            for line in f:
+                host_id, _, hostname = line.rstrip('\n').partition('\t')
+                if hostname:
+                    hosts[hostname] = int(host_id)
+    except FileNotFoundError:
+        pass
+    return hosts
+
+
+class TraceRecorder:
+    """把 GPU 样本（Node.sample_listeners）按 sample_interval 节流后追加写入轨迹文件。
+
+    守护状态取自采集器快照（on_snapshot 注册为 Collector 的 listener）。样本先缓存在内存中，
+    由写入线程每 flush_interval 秒批量追加；早于 retention_days 天的文件定期删除。
+    """
+
+    def __init__(self, directory: str, sample_interval: float = 15, retention_days: int = 14,
+                 flush_interval: float = 10, prune_interval: float = 3600):
+        self.directory = directory
+        self.sample_interval = sample_interval
+        self.retention_days = retention_days
+        self.flush_interval = flush_interval
+        self.prune_interval = prune_interval
+
+        self._lock = threading.Lock()
+        self._pending: Dict[str, bytearray] = {}  # 日期 -> 待追加的记录
+        self._new_hosts: List[Tuple[int, str]] = []  # 待追加到 hosts 文件的主机
+        self._last: Dict[Tuple[str, int], float] = {}  # (hostname, gpu) -> 上次记录的时间
+        self._guarded: Dict[str, frozenset] = {}  # hostname -> 正在守护的 GPU 序号
+
+        self._stopped = threading.Event()
+        self._thread = None
+        os.makedirs(directory, exist_ok=True)
+        self._host_ids = read_hosts(directory)
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._stopped.clear()
+        self._thread = threading.Thread(target=self._run, name="trace-recorder", daemon=True)
+        self._thread.start()
+        logger.info(f"GPU 功耗轨迹记录已启动: {self.directory}，采样间隔 {self.sample_interval}s")
+
+    def stop(self):
+        self._stopped.set()
+        if self._thread:
+            self._thread.join(timeout=self.flush_interval)
+        self.flush()
+
+    def on_snapshot(self, snapshot: List[dict]):
+        """采集器回调：记录每个节点当前守护的 GPU（整体替换，on_sample 读取时无需加锁）。"""
+        self._guarded = {node['hostname']: frozenset(node.get('guarded_gpus') or ()) for node in snapshot}
+
+    def on_sample(self, hostname: str, gpu, ts: float):
+        """节点采样回调，只把记录追加到内存缓冲区。"""
+        key = (hostname, gpu.index)
+        guarded = gpu.index in self._guarded.get(hostname, ())
+        with self._lock:
+            if ts - self._last.get(key, 0) < self.sample_interval:
+                return
+            self._last[key] = ts
+            host_id = self._host_ids.get(hostname)
+            if host_id is None:
+                host_id = self._host_ids[hostname] = len(self._host_ids)
+                self._new_hosts.append((host_id, hostname))
+            record = RECORD.pack(ts, host_id, gpu.index, FLAG_GUARDED if guarded else 0,
+                                 _nan(gpu.power_draw), _nan(gpu.utilization))
+            self._pending.setdefault(_day(ts), bytearray()).extend(record)
+
+    def _run(self):
+        last_prune = 0.0
+        while not self._stopped.wait(self.flush_interval):
+            try:
+                self.flush()
+                if time.time() - last_prune >= self.prune_interval:
+                    self.prune()
+                    last_prune = time.time()
+            except Exception as e:
+                logger.error(f"写入 GPU 功耗轨迹失败: {e}")
+
+    def flush(self):
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            new_hosts, self._new_hosts = self._new_hosts, []
+        # 先写主机名表，保证轨迹中引用的主机 ID 都能解析
+        if new_hosts:
+            with open(os.path.join(self.directory, HOSTS_FILE), 'a') as f:
+                f.writelines(f"{host_id}\t{hostname}\n" for host_id, hostname in new_hosts)
+        for day, data in pending.items():
+            with open(os.path.join(self.directory, day + TRACE_SUFFIX), 'ab') as f:
+                partial = f.tell() % RECORD.size  # 上次写入中断留下的不完整记录，截掉后再追加以保持对齐
+                if partial:
+                    f.truncate(f.tell() - partial)
+                f.write(data)
+
+    def prune(self):
+        cutoff = _day(time.time() - self.retention_days * 86400)
+        for name in os.listdir(self.directory):
+            if name.endswith(TRACE_SUFFIX) and name[:-len(TRACE_SUFFIX)] < cutoff:
+                os.remove(os.path.join(self.directory, name))
+                logger.info(f"删除过期的功耗轨迹: {name}")
+        with self._lock:
+            now = time.time()
+            self._last = {key: ts for key, ts in self._last.items() if now - ts < 86400}
+
+
+def trace_files(directory: str, start: float, end: float) -> List[str]:
+    """时间范围 [start, end] 涉及的轨迹文件（按日期排序）。"""
+    first, last = _day(start), _day(end)
+    try:
+        names = sorted(os.listdir(directory))
+    except FileNotFoundError:
+        return []
+    return [os.path.join(directory, name) for name in names
+            if name.endswith(TRACE_SUFFIX) and first <= name[:-len(TRACE_SUFFIX)] <= last]
+
+
+def load_trace(directory: str, start: float, end: float):
+    """读取 [start, end) 内的记录，返回 ({id: hostname}, records)。
+
+    有 numpy 时 records 为结构化数组（字段见 RECORD_FIELDS），否则为元组列表。
+    写入中断留下的不完整记录会被忽略。
+    """
+    hostnames = {host_id: hostname for hostname, host_id in read_hosts(directory).items()}
+    chunks = []
+    for path in trace_files(directory, start, end):
+        with open(path, 'rb') as f:
+            data = f.read()
+        data = data[:len(data) - len(data) % RECORD.size]
+        if np is not None:
+            chunks.append(np.frombuffer(data, dtype=RECORD_DTYPE))
+        else:
+            chunks.extend(record for record in RECORD.iter_unpack(data) if start <= record[0] < end)
+    if np is None:
+        return hostnames, chunks
+    records = np.concatenate(chunks) if chunks else np.empty(0, dtype=RECORD_DTYPE)
+    return hostnames, records[(records['ts'] >= start) & (records['ts'] < end)]
+
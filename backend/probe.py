@@ -0,0 +1,143 @@
+"""节点探针：一次采集 GPU 指标、守护进程状态、CPU 负载和内存，并以 JSON 输出。
+
+后端通过一次 SSH 调用执行 `python3 probe.py <guard_name>`，取代分别执行
+nvidia-smi 和 ps/grep。脚本只依赖标准库，和 start_task.sh 一样从共享的 backend 目录运行。
+"""
+import argparse
+import glob
+import json
+import os
+import subprocess
+import time
+
+from gpu_csv import GPU_QUERY  # 同目录下的纯标准库模块
+
+
+def query_gpus():
+    """返回 nvidia-smi 的原始 CSV 输出，由后端统一解析；执行失败时返回 None。"""
+    try:
+        result = subprocess.run(
+            ["nvidia-smi", f"--query-gpu={GPU_QUERY}", "--format=csv,noheader,nounits"],
+            stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, timeout=15
+        )
+    except Exception:
+        return None
+    if result.returncode != 0:
+        return None
+    return result.stdout.strip()
+
+
+def _read_argv(pid) -> list:
+    with open(f"/proc/{pid}/cmdline", "rb") as f:
+        return f.read().decode(errors="ignore").split("\0")
+
+
+def is_guard_argv(argv: list, name: str) -> bool:
+    """argv 是否为名为 name 的守护进程：某个参数为 gpu_guard.py，其后出现 --name <name>。
+
+    与 Node._guard_pattern（pgrep/pkill）匹配相同的进程，包括 python3 -u gpu_guard.py、torchrun 启动器及其 worker。
+    只匹配 gpu_guard.py 的参数，探针、start_task.sh 以及 SSH 会话的 shell 命令行中虽然也包含 name，但不会被误判。
+    """
+    script = next((i for i, arg in enumerate(argv) if os.path.basename(arg) == "gpu_guard.py"), None)
+    if script is None:
+        return False
+    rest = argv[script + 1:]
+    return any(arg == "--name" and value == name for arg, value in zip(rest, rest[1:]))
+
+
+def is_process_running(name: str) -> bool:
+    """扫描 /proc/*/cmdline，判断是否存在名为 name 的守护进程。"""
+    for pid in os.listdir("/proc"):
+        if not pid.isdigit():
+            continue
+        try:
+            argv = _read_argv(pid)
+        except OSError:
+            continue
+        if is_guard_argv(argv, name):
+            return True
+    return False
+
+
+def is_pid_running(pidfile: str, name: str) -> bool:
+    """PID 文件中的进程是否存活，且是名为 name 的守护进程（防止 PID 被复用）。"""
+    try:
+        with open(pidfile) as f:
+            pid = int(f.read().strip())
+        argv = _read_argv(pid)
+    except (OSError, ValueError):
+        return False
+    return is_guard_argv(argv, name)
+
+
+def guarded_gpus(pidfile: str, name: str) -> list:
+    """按 start_task.sh 写入的每 GPU PID 文件（<pidfile 去掉 .pid>_gpu<序号>.pid）返回守护进程存活的 GPU 序号。"""
+    prefix = pidfile[:-len('.pid')] if pidfile.endswith('.pid') else pidfile
+    indices = []
+    for path in glob.glob(f"{prefix}_gpu*.pid"):
+        index = path[len(prefix) + len('_gpu'):-len('.pid')]
+        if index.isdigit() and is_pid_running(path, name):
+            indices.append(int(index))
+    return sorted(indices)
+
+
+def _read_cpu_times():
+    with open("/proc/stat") as f:
+        values = [int(v) for v in f.readline().split()[1:]]
+    idle = values[3] + (values[4] if len(values) > 4 else 0)  # idle + iowait
+    return idle, sum(values)
+
+
+def query_cpu(sample_interval=0.2) -> dict:
+    idle1, total1 = _read_cpu_times()
+    time.sleep(sample_interval)
+    idle2, total2 = _read_cpu_times()
+    total_delta = total2 - total1
+    percent = 100.0 * (1 - (idle2 - idle1) / total_delta) if total_delta > 0 else 0.0
+    return {
+        'percent': round(percent, 1),
+        'load1': round(os.getloadavg()[0], 2),
+        'cores': os.cpu_count(),
+    }
+
+
+def query_memory() -> dict:
+    info = {}
+    with open("/proc/meminfo") as f:
+        for line in f:
+            key, value = line.split(":", 1)
+            info[key] = int(value.split()[0])  # kB
+    total = info.get("MemTotal", 0)
+    available = info.get("MemAvailable", info.get("MemFree", 0))
+    used = total - available
+    return {
+        'used': used // 1024,  # MiB
+        'total': total // 1024,
+        'percent': round(100.0 * used / total, 1) if total else 0.0,
+    }
+
+
+def collect(guard_name: str, skip_gpu: bool = False, pidfile: str = None) -> dict:
+    # 优先检查 PID 文件，找不到时再扫描进程（兼容没有 PID 文件的旧守护进程）
+    gpus = guarded_gpus(pidfile, guard_name) if pidfile else []
+    guard_running = bool(gpus) or (bool(pidfile) and is_pid_running(pidfile, guard_name))
+    data = {
+        'gpu_csv': None if skip_gpu else query_gpus(),
+        'guard_running': guard_running or is_process_running(guard_name),
+        'guarded_gpus': gpus,
+    }
+    for key, func in (('cpu', query_cpu), ('memory', query_memory)):
+        try:
+            data[key] = func()
+        except Exception:
+            data[key] = None
+    return data
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('guard_name', type=str)
+    parser.add_argument('--skip-gpu', action='store_true', help='GPU 信息由常驻 nvidia-smi 采样提供时跳过')
+    parser.add_argument('--pidfile', type=str, default=None, help='start_task.sh 写入的守护进程 PID 文件（每个 GPU 的 PID 文件以 _gpu<序号> 结尾）')
+    args = parser.parse_args()
+    print(json.dumps(collect(args.guard_name, args.skip_gpu, args.pidfile)))
@@ -0,0 +1,103 @@
+import shlex
+import subprocess
+import threading
+import time
+from typing import Optional
+
+from loguru import logger
+
+from gpu_csv import GPU_QUERY_CMD
+
+PROCESS_WAIT_TIMEOUT = 5  # 终止本地 nvidia-smi 后等待其退出的时间（秒）
+
+
+class GpuStreamSampler:
+    """常驻 nvidia-smi 采样器。
+
+    在节点上保持一个 `nvidia-smi --query-gpu ... -lms N` 进程（远程节点走持久 SSH 通道，
+    本地节点走子进程），逐行解析输出并写入 Node.gpus 和功耗历史。通道断开后按指数退避自动重启。
+    """
+
+    def __init__(self, node, interval_ms: int = 500, restart_delay: float = 2, max_restart_delay: float = 60):
+        self.node = node
+        self.interval_ms = interval_ms
+        self.restart_delay = restart_delay
+        self.max_restart_delay = max_restart_delay
+
+        self.last_sample_time: Optional[float] = None  # time.monotonic()
+        self._stopped = threading.Event()
+        self._close = None  # 关闭当前 nvidia-smi 进程/通道的回调
+        self._thread = None
+
+    @property
+    def command(self) -> str:
+        return f"{GPU_QUERY_CMD} -lms {self.interval_ms}"
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._stopped.clear()
+        self._thread = threading.Thread(target=self._run, name=f"sampler-{self.node.hostname}", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+        if self._close:
+            try:
+                self._close()
+            except Exception:
+                pass
+
+    def is_healthy(self, max_age: float = 5) -> bool:
+        """最近 max_age 秒内收到过采样数据。"""
+        return self.last_sample_time is not None and time.monotonic() - self.last_sample_time < max_age
+
+    def _run(self):
+        delay = self.restart_delay
+        while not self._stopped.is_set():
+            started = time.monotonic()
+            try:
+                self._stream()
+            except Exception as e:
+                logger.warning(f"[{self.node.hostname}] nvidia-smi 采样通道中断: {e}")
+            finally:
+                self._close = None
+            if self._stopped.is_set():
+                break
+            # 稳定运行过一段时间后再断开的，重置退避时间
+            if time.monotonic() - started > self.max_restart_delay:
+                delay = self.restart_delay
+            logger.info(f"[{self.node.hostname}] {delay:.0f}s 后重启 nvidia-smi 采样")
+            self._stopped.wait(delay)
+            delay = min(delay * 2, self.max_restart_delay)
+
+    def _open_stream(self):
+        """启动 nvidia-smi 循环模式，返回 (逐行迭代器, 关闭回调)。"""
+        if self.node.is_local:
+            # 不经过 shell，kill 直接作用于 nvidia-smi 本身
+            proc = subprocess.Popen(shlex.split(self.command), stdout=subprocess.PIPE,
+                                    stderr=subprocess.DEVNULL, text=True)
+            return proc.stdout, lambda: self._kill(proc)
+        conn = self.node.link.get()  # 与命令复用同一条 SSH transport；熔断期间抛出异常，按退避重试
+        # 使用 pty，使通道关闭时远端 nvidia-smi 随 SIGHUP 退出
+        _, stdout, _ = conn.client.exec_command(self.command, get_pty=True)
+        return stdout, stdout.channel.close
+
+    def _kill(self, proc: subprocess.Popen):
+        """终止本地 nvidia-smi 并等待其退出（回收进程，不留僵尸进程）。"""
+        proc.kill()
+        try:
+            proc.wait(timeout=PROCESS_WAIT_TIMEOUT)
+        except subprocess.TimeoutExpired:
+            logger.warning(f"[{self.node.hostname}] nvidia-smi (pid {proc.pid}) 在 {PROCESS_WAIT_TIMEOUT}s 内未退出")
+        proc.stdout.close()
+
+    def _stream(self):
+        lines, self._close = self._open_stream()
+        for line in lines:
+            if self._stopped.is_set():
+                break
+            if self.node.apply_gpu_line(line):
+                self.last_sample_time = time.monotonic()
+        if not self._stopped.is_set():
+            raise ConnectionError("nvidia-smi 输出结束")
@@ -0,0 +1,120 @@
+import json
+import os
+import threading
+from typing import List, Optional
+
+from loguru import logger
+
+from collector import Collector
+
+SNAPSHOT_POLL_INTERVAL = 0.2  # Web worker 检查快照文件是否更新的间隔（秒）
+
+
+class SnapshotPublisher:
+    """采集进程一侧：每次采集完成后把快照和版本信息写入文件，供多个 Web worker 进程读取。
+
+    先写临时文件再 os.replace，读取方任何时候都只会看到完整的旧文件或新文件。
+    """
+
+    def __init__(self, path: str, collector: Collector, nodes_manager):
+        self.path = path
+        self.collector = collector
+        self.nodes_manager = nodes_manager
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+
+    def publish(self, snapshot: List[dict] = None):
+        """作为采集器的 listener 调用（参数未使用，导出时重新加锁读取一致的状态）。"""
+        state = self.collector.export_state()
+        state['nodes_status'] = self.nodes_manager.status()
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(state, f, separators=(',', ':'))
+        os.replace(tmp_path, self.path)
+
+
+class SnapshotReader(Collector):
+    """Web worker 一侧：读取 SnapshotPublisher 发布的文件，对外提供与 Collector 相同的只读接口。
+
+    delta/full/snapshot/wait_for_change 等直接复用 Collector 的实现；
+    后台线程按 SNAPSHOT_POLL_INTERVAL 检查文件修改时间，变化时重新加载。不会连接任何节点。
+    """
+
+    def __init__(self, path: str, poll_interval: float = SNAPSHOT_POLL_INTERVAL):
+        super().__init__(nodes_manager=None, interval=poll_interval)
+        self.path = path
+        self.nodes_status = {}  # 采集进程中 Nodes.status() 的结果
+        self.collect_interval = None  # 采集进程的采集周期
+        self._mtime = None  # 已加载的快照文件的修改时间
+        self._failed_mtime = None  # 最近一次加载失败的文件修改时间，避免重复记录同一个错误
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._stopped.clear()
+        self.collect()
+        self._thread = threading.Thread(target=self._run, name="snapshot-reader", daemon=True)
+        self._thread.start()
+        logger.info(f"从 {self.path} 读取采集进程发布的快照，检查间隔: {self.interval}s")
+
+    def collect(self):
+        """文件有变化时重新加载。读取或解析失败时保留上一份完整的快照，下次检查时重试（同一文件只记录一次错误）。"""
+        mtime = None
+        try:
+            mtime = os.stat(self.path).st_mtime_ns
+            if mtime == self._mtime:
+                return
+            with open(self.path) as f:
+                state = json.load(f)
+            self._load(state)
+        except FileNotFoundError:
+            return
+        except Exception as e:
+            if mtime != self._failed_mtime:
+                logger.error(f"加载快照文件失败，继续使用上一份快照: {e!r}")
+                self._failed_mtime = mtime
+            return
+        self._mtime = mtime
+
+    def _load(self, state: dict):
+        node_versions = {}
+        for node in state['nodes']:
+            exported = state['node_versions'][node['hostname']]
+            gpus = {gpu['index']: gpu for gpu in node['gpus']}
+            node_versions[node['hostname']] = {
+                'version': exported['version'],
+                'layout_version': exported['layout_version'],
+                # JSON 的键都是字符串，还原为 GPU 序号
+                'gpus': {int(index): (version, gpus[int(index)]) for index, version in exported['gpus'].items()},
+            }
+        # 先取出全部字段，缺字段时抛出异常而不是只更新一部分状态
+        fields = {name: state[name] for name in ('epoch', 'version', 'min_version', 'snapshot_time', 'removed',
+                                                  'summary', 'last_sweep_seconds', 'interval')}
+        with self._lock:
+            previous = (self.epoch, self.version)
+            self.epoch = fields['epoch']
+            self.version = fields['version']
+            self._min_version = fields['min_version']
+            self._snapshot = state['nodes']
+            self._snapshot_time = fields['snapshot_time']
+            self._node_versions = node_versions
+            self._removed = fields['removed']
+            self._summary = fields['summary']
+            self.last_sweep_seconds = fields['last_sweep_seconds']
+            self.nodes_status = state.get('nodes_status', {})
+            self.collect_interval = fields['interval']
+        self._ready.set()
+        if (self.epoch, self.version) != previous:
+            with self._changed:
+                self._changed.notify_all()
+
+    def wait_for_change(self, version: int, timeout: Optional[float] = None) -> bool:
+        """epoch 变化（采集进程重启）也视为变化，推送连接会改发全量。"""
+        epoch = self.epoch
+        with self._changed:
+            return self._changed.wait_for(lambda: self.version != version or self.epoch != epoch, timeout)
+
+    def status(self) -> dict:
+        status = dict(self.nodes_status)
+        status.update(super().status())
+        status['interval'] = self.collect_interval
+        return status
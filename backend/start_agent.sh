@@ -0,0 +1,23 @@
+#!/bin/bash
+
+# 在本节点后台启动 agent.py，把采样数据推送到后端（host 文件中该节点需标记 source=push）
+# 参数：后端地址（如 http://monitor:5000），其余参数原样传给 agent.py（如 --push-interval 15）
+# 与 start_task.sh 一样从共享的 backend 目录运行；日志和 PID 文件位于 ../tmp/<主机名>/
+SERVER=${1:?usage: start_agent.sh <server-url> [agent args...]}
+shift
+
+DIR="$(cd "$(dirname "$0")" && pwd)"
+TMP_DIR="$DIR/../tmp/$(hostname)"
+PID_FILE="$TMP_DIR/agent.pid"
+LOG_PATH="$TMP_DIR/agent.log"
+mkdir -p "$TMP_DIR"
+
+# agent 已在运行时跳过
+if [ -f "$PID_FILE" ] && kill -0 "$(cat "$PID_FILE")" 2>/dev/null; then
+  echo "already running: agent ($(cat "$PID_FILE"))"
+  exit 0
+fi
+
+nohup python3 "$DIR/agent.py" "$SERVER" "$@" > "$LOG_PATH" 2>&1 &
+echo $! > "$PID_FILE"
+echo "agent started: pid $!, log $LOG_PATH"
@@ -0,0 +1,31 @@
+#!/bin/bash
+# 生产模式启动：一个采集进程 + 多个无状态 gunicorn Web worker
+#   采集进程 (GPU_MONITOR_ROLE=collector)：唯一连接各节点的进程，持有守护状态，
+#     每次采集后把快照原子写入 $GPU_MONITOR_SNAPSHOT，并在 127.0.0.1:$GPU_MONITOR_CONTROL_PORT 处理写操作
+#   Web worker (GPU_MONITOR_ROLE=web)：读取快照文件提供查询接口，写操作转发给采集进程
+# 用法: bash start_prod.sh [worker 数，默认 CPU 核数] [监听地址，默认 0.0.0.0:5000]
+set -e
+cd "$(dirname "$0")"
+
+WORKERS=${1:-$(nproc)}
+BIND=${2:-0.0.0.0:5000}
+export GPU_MONITOR_SNAPSHOT=${GPU_MONITOR_SNAPSHOT:-../tmp/snapshot.json}
+export GPU_MONITOR_CONTROL_PORT=${GPU_MONITOR_CONTROL_PORT:-5001}
+mkdir -p ../tmp
+
+GPU_MONITOR_ROLE=collector nohup python3 app.py > ../tmp/collector.log 2>&1 &
+COLLECTOR_PID=$!
+echo "采集进程已启动，PID: $COLLECTOR_PID，日志: tmp/collector.log"
+trap 'kill $COLLECTOR_PID 2>/dev/null' EXIT
+
+# 等待第一份快照发布，避免 worker 启动后长时间返回空数据
+for _ in $(seq 1 60); do
+  [ -f "$GPU_MONITOR_SNAPSHOT" ] && break
+  kill -0 $COLLECTOR_PID 2>/dev/null || { echo "采集进程启动失败，请查看 tmp/collector.log"; exit 1; }
+  sleep 1
+done
+
+# gthread：每个 worker 多线程处理请求，SSE 长连接各占一个线程
+echo "启动 $WORKERS 个 Web worker，监听 $BIND"
+GPU_MONITOR_ROLE=web gunicorn --workers "$WORKERS" --worker-class gthread --threads 32 \
+  --bind "$BIND" --timeout 0 --access-logfile ../tmp/access.log app:app
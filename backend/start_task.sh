@@ -1,22 +1,44 @@
 #!/bin/bash
 
-# 参数：任务名 和 日志文件路径
+# 参数：任务名、日志文件路径、PID 文件路径，其余参数原样传给 gpu_guard.py（如 --target-util 50 --yield-on-foreign）
+# 环境变量 GUARD_GPUS：要守护的 GPU 序号（逗号分隔），未设置时守护全部 GPU
+# 每个 GPU 启动一个独立的单卡守护进程（CUDA_VISIBLE_DEVICES），日志和 PID 文件名后加 _gpu<序号>
 TASK_NAME=${1:-hold}
 LOG_PATH=${2:-"./logs/${TASK_NAME}_$(date +%Y%m%d_%H%M%S).log"}
+PID_FILE=${3:-"$(dirname "$LOG_PATH")/${TASK_NAME}.pid"}
+shift $(( $# < 3 ? $# : 3 ))
 
-# 自动查找空闲端口
-FREE_PORT=$(python3 -c "import socket; s=socket.socket(); s.bind(('', 0)); print(s.getsockname()[1]); s.close()")
+if [ -n "$GUARD_GPUS" ]; then
+  GPU_IDS=${GUARD_GPUS//,/ }
+else
+  GPU_IDS=$(nvidia-smi --query-gpu=index --format=csv,noheader)
+fi
 
-echo "Launching torchrun..."
+echo "Launching per-GPU guards..."
 echo "  task: $TASK_NAME"
-echo "  port: $FREE_PORT"
-echo "  log : $LOG_PATH"
+echo "  gpus: $GPU_IDS"
+echo "  args: $*"
 
 # 创建日志目录（如果必要）
-mkdir -p "$(dirname "$LOG_PATH")"
+mkdir -p "$(dirname "$LOG_PATH")" "$(dirname "$PID_FILE")"
 
-# 启动 torchrun，输出重定向到指定日志路径
-nohup \
-  torchrun --nproc-per-node=$(nvidia-smi -L | wc -l) --master_port=$FREE_PORT \
-  gpu_guard.py --name "$TASK_NAME" \
-  > "$LOG_PATH" 2>&1 &
+for GPU_ID in $GPU_IDS; do
+  GPU_PID_FILE="${PID_FILE%.pid}_gpu${GPU_ID}.pid"
+  GPU_LOG_PATH="${LOG_PATH%.log}_gpu${GPU_ID}.log"
+
+  # 该 GPU 的守护进程已在运行时跳过
+  if [ -f "$GPU_PID_FILE" ] && kill -0 "$(cat "$GPU_PID_FILE")" 2>/dev/null; then
+    echo "already running: gpu $GPU_ID ($(cat "$GPU_PID_FILE"))"
+    continue
+  fi
+
+  # 启动单卡守护进程，输出重定向到该 GPU 的日志
+  # CUDA 默认按算力排序设备，按 PCI 总线排序才与 nvidia-smi/NVML 的序号一致
+  CUDA_DEVICE_ORDER=PCI_BUS_ID CUDA_VISIBLE_DEVICES=$GPU_ID nohup \
+    python3 gpu_guard.py --name "$TASK_NAME" "$@" \
+    > "$GPU_LOG_PATH" 2>&1 &
+
+  # 记录守护进程的 PID，后端据此判断每个 GPU 的守护状态
+  echo $! > "$GPU_PID_FILE"
+  echo "  gpu $GPU_ID: pid $!, log $GPU_LOG_PATH"
+done
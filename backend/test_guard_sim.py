@@ -0,0 +1,90 @@
+"""guard_sim 的回放结果与逐步模拟的守护状态机对比（随机功耗矩阵和轨迹）。
+
+运行: python -m pytest test_guard_sim.py（没有 numpy 时只检查纯 Python 版本）
+"""
+import math
+import random
+import unittest
+
+from guard_sim import _grid_numpy, _grid_python, _simulate_numpy, _simulate_python
+from power_trace import FLAG_GUARDED, RECORD_DTYPE, np
+
+
+def brute_force(grid, thresholds, windows):
+    """逐个 GPU、逐个策略按在线逻辑推进守护状态机，返回值的格式同 _simulate_python。"""
+    on_steps = [[0] * len(windows) for _ in thresholds]
+    starts = [[0] * len(windows) for _ in thresholds]
+    low_steps = [0] * len(thresholds)
+    for row in grid:
+        for i, threshold in enumerate(thresholds):
+            low_steps[i] += sum(1 for value in row if not math.isnan(value) and value < threshold)
+            for j, window in enumerate(windows):
+                running = False
+                for t, value in enumerate(row):
+                    recent = [v for v in row[max(0, t + 1 - window):t + 1] if not math.isnan(v)]
+                    idle = bool(recent) and sum(recent) / len(recent) < threshold
+                    # 守护一直运行到功耗达到阈值或 GPU 离线；空闲且未守护时启动
+                    active = math.isnan(value) or value >= threshold
+                    if not running and idle and not active:
+                        starts[i][j] += 1
+                        running = True
+                    elif running and active:
+                        running = False
+                    on_steps[i][j] += running
+    return on_steps, starts, low_steps
+
+
+def random_grid(rng, gpus, steps):
+    grid = []
+    for _ in range(gpus):
+        row, value = [], rng.uniform(0, 300)
+        for _ in range(steps):
+            if rng.random() < 0.1:
+                value = rng.choice([rng.uniform(0, 60), rng.uniform(150, 300)])  # 任务开始或结束
+            row.append(math.nan if rng.random() < 0.05 else value + rng.uniform(-10, 10))
+        grid.append(row)
+    return grid
+
+
+def random_records(rng, start, count):
+    records = []
+    for _ in range(count):
+        power = math.nan if rng.random() < 0.05 else rng.uniform(0, 300)
+        flags = FLAG_GUARDED if rng.random() < 0.2 else 0
+        records.append((start + rng.uniform(0, 3600), rng.randrange(3), rng.randrange(4), flags, power, 0.0))
+    return records
+
+
+class SimulateTest(unittest.TestCase):
+    thresholds = [25.0, 50.0, 100.0, 150.0, 200.0, 250.0]
+    windows = [1, 3, 10, 30]
+
+    def setUp(self):
+        self.rng = random.Random(0)
+
+    def test_python_matches_brute_force(self):
+        for _ in range(5):
+            grid = random_grid(self.rng, gpus=4, steps=120)
+            self.assertEqual(_simulate_python(grid, self.thresholds, self.windows),
+                             brute_force(grid, self.thresholds, self.windows))
+
+    @unittest.skipIf(np is None, "numpy is not installed")
+    def test_numpy_matches_brute_force(self):
+        for _ in range(5):
+            grid = random_grid(self.rng, gpus=4, steps=120)
+            self.assertEqual(_simulate_numpy(np.array(grid), self.thresholds, self.windows),
+                             brute_force(grid, self.thresholds, self.windows))
+
+    @unittest.skipIf(np is None, "numpy is not installed")
+    def test_grid_numpy_matches_python(self):
+        start, step, steps = 1_700_000_000.0, 60, 60
+        records = random_records(self.rng, start, 2000)
+        keys, grid, guard_samples = _grid_python(records, start, step, steps)
+        np_keys, np_grid, np_guard_samples = _grid_numpy(np.array(records, dtype=RECORD_DTYPE), start, step, steps)
+        self.assertEqual(np_keys, keys)
+        np.testing.assert_allclose(np_grid, np.array(grid), rtol=1e-5)  # 轨迹中功耗为 float32
+        self.assertEqual(sorted(np_guard_samples), sorted(np.float32(guard_samples).tolist()))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,45 @@
+"""HistoryStore 的数据库设置：需开启增量回收（auto_vacuum=INCREMENTAL），prune 删除过期数据后文件才会缩小。"""
+import os
+import shutil
+import sqlite3
+import tempfile
+import unittest
+
+from history_store import AUTO_VACUUM_INCREMENTAL, HistoryStore
+
+
+class AutoVacuumTest(unittest.TestCase):
+    def setUp(self):
+        self.workdir = tempfile.mkdtemp()
+        self.path = os.path.join(self.workdir, 'history.db')
+
+    def tearDown(self):
+        shutil.rmtree(self.workdir, ignore_errors=True)
+
+    def auto_vacuum(self) -> int:
+        conn = sqlite3.connect(self.path)
+        try:
+            return conn.execute("PRAGMA auto_vacuum").fetchone()[0]
+        finally:
+            conn.close()
+
+    def test_new_database(self):
+        HistoryStore(self.path)
+        self.assertEqual(self.auto_vacuum(), AUTO_VACUUM_INCREMENTAL)
+
+    def test_existing_database_is_converted(self):
+        conn = sqlite3.connect(self.path)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("CREATE TABLE hosts (id INTEGER PRIMARY KEY, hostname TEXT UNIQUE NOT NULL)")
+        conn.execute("INSERT INTO hosts (hostname) VALUES ('node-1')")
+        conn.commit()
+        conn.close()
+        self.assertEqual(self.auto_vacuum(), 0)
+
+        store = HistoryStore(self.path)
+        self.assertEqual(self.auto_vacuum(), AUTO_VACUUM_INCREMENTAL)
+        self.assertEqual(store._host_ids, {'node-1': 1})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,74 @@
+"""/api/ingest 的样本校验：格式不正确的一批样本返回 400，且不应用其中任何数据。
+
+app 在导入时按环境变量创建节点管理器，测试在临时目录中运行（../tmp 下的数据库和轨迹写到临时目录）。
+"""
+import json
+import math
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+backend_dir = os.path.dirname(os.path.abspath(__file__))
+TOKEN = 'test-token'
+HOSTNAME = 'push-node-for-test'
+
+
+def setUpModule():
+    global app, workdir, previous_cwd
+    workdir = tempfile.mkdtemp()
+    os.makedirs(os.path.join(workdir, 'backend'))
+    host_file = os.path.join(workdir, 'hosts')
+    with open(host_file, 'w') as f:
+        f.write(f"{HOSTNAME} slots=8 source=push\n")
+    previous_cwd = os.getcwd()
+    os.chdir(os.path.join(workdir, 'backend'))
+    os.environ.update(GPU_MONITOR_HOST_FILE=host_file, GPU_MONITOR_INGEST_TOKEN=TOKEN, GPU_MONITOR_ROLE='all')
+    sys.path.insert(0, backend_dir)
+    import app
+
+
+def tearDownModule():
+    os.chdir(previous_cwd)
+    shutil.rmtree(workdir, ignore_errors=True)
+
+
+def report(name='NVIDIA A100', power=60.0):
+    return {'ts': 1_700_000_000.0, 'gpus': [[0, name, 40.0, 0.0, 100, 81920, power]],
+            'guard_running': False, 'guarded_gpus': [], 'cpu': None, 'memory': None}
+
+
+class IngestTest(unittest.TestCase):
+    def setUp(self):
+        self.client = app.app.test_client()
+        self.node = app.nodes_manager.push_nodes[HOSTNAME]
+
+    def post(self, reports):
+        # json.dumps 会把 NaN/Infinity 写成非标准的 NaN/Infinity，与有问题的 agent 发送的一致
+        body = json.dumps({'hostname': HOSTNAME, 'reports': reports})
+        return self.client.post('/api/ingest', data=body, content_type='application/json',
+                                headers={'X-Ingest-Token': TOKEN})
+
+    def test_valid_report_is_applied(self):
+        self.assertEqual(self.post([report()]).status_code, 200)
+        self.assertEqual([gpu.index for gpu in self.node.gpus], [0])
+
+    def test_non_finite_values_are_rejected(self):
+        for power in (math.nan, math.inf, -math.inf):
+            self.assertEqual(self.post([report(power=power)]).status_code, 400)
+        averages = self.node.power_history.averages(600)
+        self.assertFalse(any(value is not None and math.isnan(value) for value in averages.values()))
+
+    def test_non_string_name_is_rejected(self):
+        self.assertEqual(self.post([report(name=['A100'])]).status_code, 400)
+        self.assertEqual(self.client.get('/api/nodes_data?format=compact').status_code, 200)
+
+    def test_bad_report_rejects_whole_batch(self):
+        self.post([report(power=10.0)])
+        self.assertEqual(self.post([report(power=300.0), report(power=math.nan)]).status_code, 400)
+        self.assertEqual(self.node.gpus[0].power_draw, 10.0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,56 @@
+"""Nodes 热加载 host 文件的回归测试（节点用 fake_nodes.SimulatedNode 模拟，不需要 SSH）。
+
+节点在 ../tmp/<主机名> 下创建目录，测试在临时目录中运行。
+"""
+import os
+import shutil
+import tempfile
+import time
+import unittest
+
+from fake_nodes import SimulatedNode
+from nodes import Nodes
+
+
+class ReloadTest(unittest.TestCase):
+    def setUp(self):
+        self.workdir = tempfile.mkdtemp()
+        os.makedirs(os.path.join(self.workdir, 'backend'))
+        self.previous_cwd = os.getcwd()
+        os.chdir(os.path.join(self.workdir, 'backend'))
+        self.host_file = os.path.join(self.workdir, 'hosts')
+        self.write_hosts('sim-a', 'sim-b')
+        self.nodes = Nodes(self.host_file, node_factory=SimulatedNode)
+        self.assertTrue(self.nodes.wait_initialized(10))
+
+    def tearDown(self):
+        for node in self.nodes.nodes:
+            node.close()
+        os.chdir(self.previous_cwd)
+        shutil.rmtree(self.workdir, ignore_errors=True)
+
+    def write_hosts(self, *hostnames):
+        with open(self.host_file, 'w') as f:
+            f.writelines(f"{hostname} slots=8\n" for hostname in hostnames)
+        stamp = time.time() + len(hostnames)  # 保证 mtime 变化，不依赖文件系统的时间精度
+        os.utime(self.host_file, (stamp, stamp))
+
+    def test_added_node_uses_current_guard_policy(self):
+        self.nodes.update_guard_policy(20, 250)
+        self.write_hosts('sim-a', 'sim-b', 'sim-c')
+        self.assertTrue(self.nodes.reload_if_changed())
+        policies = {node.hostname: (node.need_guard_interval, node.active_power_threshold) for node in self.nodes.nodes}
+        self.assertEqual(policies, {'sim-a': (20, 250), 'sim-b': (20, 250), 'sim-c': (20, 250)})
+
+    def test_read_error_keeps_nodes(self):
+        self.write_hosts('sim-a')
+        read_host_file, self.nodes._read_host_file = self.nodes._read_host_file, lambda: None
+        self.assertFalse(self.nodes.reload_if_changed())
+        self.assertEqual([node.hostname for node in self.nodes.nodes], ['sim-a', 'sim-b'])
+        self.nodes._read_host_file = read_host_file
+        self.assertTrue(self.nodes.reload_if_changed())  # stamp 未更新，下次检查时重试
+        self.assertEqual([node.hostname for node in self.nodes.nodes], ['sim-a'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,53 @@
+"""按命令行识别守护进程：probe.is_guard_argv 与 Node._guard_pattern（pgrep -f）匹配相同的进程。"""
+import re
+import unittest
+
+from nodes import Node
+from probe import is_guard_argv
+
+NAME = 'gpu_guard_node-1.example'
+
+GUARDS = {
+    'start_task.sh': ['python3', 'gpu_guard.py', '--name', NAME, '--target-util', '30'],
+    'unbuffered': ['/usr/bin/python3', '-u', 'gpu_guard.py', '--name', NAME],
+    'absolute path': ['python3', '/shared/backend/gpu_guard.py', '--name', NAME],
+    'torchrun launcher': ['/usr/bin/python3', '/usr/local/bin/torchrun', '--nproc_per_node=8',
+                          'gpu_guard.py', '--name', NAME, '--yield-on-foreign'],
+    'torchrun worker': ['/usr/bin/python3', '-u', 'gpu_guard.py', '--name', NAME, '--yield-on-foreign'],
+    'name after other args': ['python3', 'gpu_guard.py', '--target-util', '30', '--name', NAME],
+}
+
+NOT_GUARDS = {
+    'probe': ['python3', '/shared/backend/probe.py', NAME, '--pidfile', '/tmp/gpu_guard.pid'],
+    'start_task.sh': ['bash', 'start_task.sh', NAME, 'guard.log', 'gpu_guard.pid'],
+    'ssh shell': ['bash', '-c', f"cd /shared/backend && bash start_task.sh {NAME} guard.log"],
+    'other name': ['python3', 'gpu_guard.py', '--name', NAME + '2'],
+    'name before script': ['python3', '--name', NAME, 'gpu_guard.py'],
+    'other script': ['python3', 'train.py', '--name', NAME],
+}
+
+
+def pgrep_matches(argv) -> bool:
+    """按 pgrep -f 的方式（命令行参数以空格连接）匹配 Node._guard_pattern。"""
+    node = Node.__new__(Node)  # 只需要 guard_name，不创建目录和连接
+    node.guard_name = NAME
+    pattern = Node._guard_pattern.fget(node).strip("'")
+    return re.search(pattern, ' '.join(argv)) is not None
+
+
+class GuardArgvTest(unittest.TestCase):
+    def test_guard_processes(self):
+        for case, argv in GUARDS.items():
+            with self.subTest(case):
+                self.assertTrue(is_guard_argv(argv, NAME))
+                self.assertTrue(pgrep_matches(argv))
+
+    def test_other_processes(self):
+        for case, argv in NOT_GUARDS.items():
+            with self.subTest(case):
+                self.assertFalse(is_guard_argv(argv, NAME))
+                self.assertFalse(pgrep_matches(argv))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,103 @@
+import gzip
+import json
+import threading
+from collections import OrderedDict
+from typing import Callable, Hashable, List, Optional
+
+try:
+    import brotli  # 可选依赖，没有时只提供 gzip
+except ImportError:
+    brotli = None
+
+# 紧凑格式中 GPU 列的顺序；name 列存放 gpu_names 中的下标
+GPU_FIELDS = ('index', 'name', 'temperature', 'utilization', 'memory_used', 'memory_total', 'power_draw')
+# 各列保留的小数位数（0 表示取整），不在表中的列原样输出
+GPU_PRECISION = {'temperature': 0, 'utilization': 0, 'power_draw': 1}
+MIN_COMPRESS_BYTES = 1024  # 小于该大小的响应不压缩
+CACHE_ENTRIES = 64  # 缓存的已序列化响应数（按快照版本、格式、编码区分）
+
+ENCODINGS = ['br', 'gzip'] if brotli is not None else ['gzip']
+
+
+def _round(value, digits):
+    if value is None:
+        return None
+    return int(round(value)) if digits == 0 else round(value, digits)
+
+
+def compact_gpus(gpus: List[dict], names: dict) -> dict:
+    """把 GPU 列表转成按列存放的数组，GPU 型号用 names 中的下标代替。"""
+    columns = {field: [] for field in GPU_FIELDS}
+    for gpu in gpus:
+        for field in GPU_FIELDS:
+            value = gpu.get(field)
+            if field == 'name':
+                value = names.setdefault(value, len(names))
+            elif field in GPU_PRECISION:
+                value = _round(value, GPU_PRECISION[field])
+            columns[field].append(value)
+    return columns
+
+
+def to_compact(payload: dict) -> dict:
+    """把 {"epoch", "version", "full", "nodes", "removed"} 形式的快照/增量转为紧凑格式。
+
+    每个节点的 gpus 变为 {列名: [值, ...]}，gpu_names 为本次响应中出现的 GPU 型号表，其余字段不变。
+    """
+    names = {}
+    nodes = []
+    for node in payload['nodes']:
+        compact = dict(node)
+        compact['gpus'] = compact_gpus(node['gpus'], names)
+        nodes.append(compact)
+    result = dict(payload, nodes=nodes)
+    result['format'] = 'compact'
+    result['gpu_fields'] = list(GPU_FIELDS)
+    result['gpu_names'] = list(names)
+    return result
+
+
+def dumps(data) -> bytes:
+    return json.dumps(data, separators=(',', ':')).encode('utf-8')
+
+
+def compress(body: bytes, encoding: Optional[str]) -> bytes:
+    if encoding == 'br':
+        return brotli.compress(body, quality=5)
+    if encoding == 'gzip':
+        return gzip.compress(body, compresslevel=6)
+    return body
+
+
+class EncodedCache:
+    """按键缓存序列化（和压缩）后的响应体。键包含快照版本，版本变化后旧条目自然被淘汰（LRU）。"""
+
+    def __init__(self, max_entries: int = CACHE_ENTRIES):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable, build: Callable[[], bytes]) -> bytes:
+        with self._lock:
+            body = self._entries.get(key)
+            if body is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return body
+            self.misses += 1
+        body = build()  # 在锁外序列化，并发的相同请求最多重复构建一次
+        with self._lock:
+            self._entries[key] = body
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return body
+
+    def encoded(self, key: Hashable, build: Callable[[], bytes], encoding: Optional[str]):
+        """返回 (响应体, 实际使用的编码)。未压缩的 JSON 和各压缩版本分别缓存。"""
+        body = self.get(key + (None,), build)
+        if encoding is None or len(body) < MIN_COMPRESS_BYTES:
+            return body, None
+        return self.get(key + (encoding,), lambda: compress(body, encoding)), encoding
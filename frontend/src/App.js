@@ -3,7 +3,7 @@ import {
     Container, Text, Spinner, useDisclosure,
     AlertDialog, AlertDialogBody, AlertDialogFooter, AlertDialogHeader, AlertDialogContent, AlertDialogOverlay,
     Button, SimpleGrid,
-    Box
+    Box, Flex
 } from '@chakra-ui/react';
 
 // 引入自定义 Hook
@@ -16,7 +16,28 @@ import OverviewStats from './components/OverviewStats';
 import ControlPanel from './components/ControlPanel';
 import GlobalActions from './components/GlobalActions';
 
+const PAGE_SIZE = 50; // 每页显示的节点数，筛选、排序和分页都在后端完成
+
 function App() {
+    // States for sorting, filtering and paging
+    const [sortBy, setSortBy] = React.useState('hostname');
+    const [filterText, setFilterText] = React.useState('');
+    const [filterStatus, setFilterStatus] = React.useState('all');
+    const [page, setPage] = React.useState(1);
+
+    // 条件变化后回到第一页
+    React.useEffect(() => {
+        setPage(1);
+    }, [sortBy, filterText, filterStatus]);
+
+    const query = useMemo(() => ({
+        status: filterStatus,
+        q: filterText || undefined,
+        sort: sortBy,
+        page,
+        limit: PAGE_SIZE,
+    }), [filterStatus, filterText, sortBy, page]);
+
     const {
         nodes, initialLoading, error, events, onClearEvents, addEvent,
         activePowerThreshold, setActivePowerThreshold, guardIntervalMinutes, setGuardIntervalMinutes,
@@ -25,9 +46,10 @@ function App() {
         totalNodes, guardedNodes, needGuardNodes, totalGpus, averageTotalGpuPowerDraw, averageGpuUtilization,
         loadNodes,
         handleStartAllGuards, handleStopAllGuards,
-        onlineNodesCount,
+        onlineNodesCount, matchedNodes,
         isStartingAllGuards, isStoppingAllGuards,
-    } = useNodeMonitoring();
+    } = useNodeMonitoring(query);
+    const pageCount = Math.max(1, Math.ceil(matchedNodes / PAGE_SIZE));
 
     // Modal disclosure for SettingsModal
     const { isOpen: isSettingsModalOpen, onOpen: onSettingsModalOpen, onClose: onSettingsModalClose } = useDisclosure();
@@ -40,56 +62,6 @@ function App() {
     const { isOpen: isStopConfirmOpen, onOpen: onStopConfirmOpen, onClose: onStopConfirmClose } = useDisclosure();
     const cancelStopRef = useRef();
 
-    // States for sorting and filtering
-    const [sortBy, setSortBy] = React.useState('hostname');
-    const [filterText, setFilterText] = React.useState('');
-    const [filterStatus, setFilterStatus] = React.useState('all');
-
-    // Memoized filtered and sorted nodes
-    const filteredAndSortedNodes = useMemo(() => {
-        let currentNodes = [...nodes];
-
-        // --- 统一的筛选逻辑 ---
-        // 按照状态进行筛选
-        if (filterStatus === 'online') {
-            currentNodes = currentNodes.filter(node => node.isOnline); // 假设 node 对象有 'isOnline' 属性
-        } else if (filterStatus === 'offline') {
-            currentNodes = currentNodes.filter(node => !node.isOnline); // 假设 node 对象有 'isOnline' 属性
-        } else if (filterStatus === 'guarding') {
-            currentNodes = currentNodes.filter(node => node.guard_running);
-        } else if (filterStatus === 'not_guarding') {
-            currentNodes = currentNodes.filter(node => !node.guard_running);
-        } else if (filterStatus === 'needs_guard') {
-            currentNodes = currentNodes.filter(node => node.need_guard);
-        }
-        // --- 结束状态筛选 ---
-
-        // 主机名搜索筛选
-        if (filterText) {
-            const lowerCaseFilterText = filterText.toLowerCase();
-            currentNodes = currentNodes.filter(node =>
-                node.hostname.toLowerCase().includes(lowerCaseFilterText)
-            );
-        }
-
-        // 排序逻辑
-        currentNodes.sort((a, b) => {
-            if (sortBy === 'hostname') {
-                return a.hostname.localeCompare(b.hostname);
-            } else if (sortBy === 'totalGpus') {
-                return b.gpus.length - a.gpus.length;
-            } else if (sortBy === 'guardedNodes') {
-                // 守护状态排序 (true 优先)
-                return (b.guard_running ? 1 : 0) - (a.guard_running ? 1 : 0);
-            } else if (sortBy === 'needGuard') {
-                // 需要守护状态排序 (true 优先)
-                return (a.need_guard ? 1 : 0) - (b.need_guard ? 1 : 0);
-            }
-            return 0;
-        });
-        return currentNodes;
-    }, [nodes, filterText, sortBy, filterStatus]); // 确保 filterStatus 作为依赖项
-
     if (initialLoading) {
         return (
             <Container centerContent py={10} bg="white" minHeight="100vh">
@@ -143,18 +115,32 @@ function App() {
             </Box>
 
 
-            {filteredAndSortedNodes.length === 0 && !initialLoading && !error ? (
+            {nodes.length === 0 && !initialLoading && !error ? (
                 <Text textAlign="center" mt={6} color="gray.500">
                     没有找到符合条件的节点。
                 </Text>
             ) : (
                 <SimpleGrid columns={1} spacing={6} mt={6}>
-                    {filteredAndSortedNodes.map(node => (
+                    {nodes.map(node => (
                         <NodeCard key={node.hostname} node={node} addEvent={addEvent} />
                     ))}
                 </SimpleGrid>
             )}
 
+            {pageCount > 1 && (
+                <Flex mt={6} align="center" justify="center">
+                    <Button size="sm" onClick={() => setPage(page - 1)} isDisabled={page <= 1} title="上一页">
+                        上一页
+                    </Button>
+                    <Text mx={4} color="gray.600">
+                        第 {page} / {pageCount} 页，共 {matchedNodes} 个节点
+                    </Text>
+                    <Button size="sm" onClick={() => setPage(page + 1)} isDisabled={page >= pageCount} title="下一页">
+                        下一页
+                    </Button>
+                </Flex>
+            )}
+
             <SettingsModal
                 isOpen={isSettingsModalOpen}
                 onClose={onSettingsModalClose}
@@ -11,9 +11,10 @@ function ControlPanel({ sortBy, setSortBy, filterStatus, setFilterStatus, filter
                 addEvent(`排序：排序方式已更改为 "${e.target.options[e.target.selectedIndex].text}"。`, 'info');
             }} width={{ base: "full", sm: "200px" }} mr={{ base: 0, sm: 6 }} mb={{ base: 4, sm: 0 }} title="选择节点列表的排序方式">
                 <option value="hostname">主机名</option>
-                <option value="totalGpus">总GPU数量</option>
-                <option value="guardedNodes">守护状态</option>
-                <option value="needGuard">需要守护</option>
+                <option value="gpus">总GPU数量</option>
+                <option value="guard_running">守护状态</option>
+                <option value="need_guard">需要守护</option>
+                <option value="power">平均功耗</option>
             </Select>
 
             <Text mr={3} fontWeight="bold" minW="80px">筛选状态:</Text>
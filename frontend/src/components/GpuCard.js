@@ -17,9 +17,12 @@ import { FaMemory, FaBolt, FaThermometerHalf, FaTachometerAlt } from 'react-icon
 
 import AnimatedProgressBar from './AnimatedProgressBar';
 
+// 后端对 nvidia-smi 中 [N/A]/[Not Supported] 的字段返回 null
+const formatValue = (value, digits) => (typeof value === 'number' ? value.toFixed(digits) : 'N/A');
+
 const GpuCard = ({ gpu }) => {
     const tempColor = gpu.temperature > 75 ? "red.500" : "green.500";
-    const memoryUsagePercentage = (gpu.memory_used / gpu.memory_total) * 100;
+    const memoryUsagePercentage = gpu.memory_total ? (gpu.memory_used / gpu.memory_total) * 100 : null;
 
     return (
         <Card
@@ -50,7 +53,7 @@ const GpuCard = ({ gpu }) => {
                             <Icon as={FaThermometerHalf} mr={1} color={tempColor} />
                             <StatLabel fontSize="xs">温度</StatLabel>
                         </Flex>
-                        <StatNumber fontSize="md" color={tempColor}>{gpu.temperature.toFixed(0)}°C</StatNumber>
+                        <StatNumber fontSize="md" color={tempColor}>{formatValue(gpu.temperature, 0)}°C</StatNumber>
                     </Stat>
                     {/* Power */}
                     <Stat>
@@ -58,7 +61,7 @@ const GpuCard = ({ gpu }) => {
                             <Icon as={FaBolt} mr={1} color="yellow.600" />
                             <StatLabel fontSize="xs">功耗</StatLabel>
                         </Flex>
-                        <StatNumber fontSize="md">{gpu.power_draw.toFixed(2)}W</StatNumber>
+                        <StatNumber fontSize="md">{formatValue(gpu.power_draw, 2)}W</StatNumber>
                     </Stat>
 
                     {/* Memory Usage (integrated) */}
@@ -69,9 +72,9 @@ const GpuCard = ({ gpu }) => {
                                 <Icon as={FaMemory} mr={1} color="blue.500" />
                                 <Text fontSize="xs" fontWeight="medium">显存</Text>
                             </Flex>
-                            <Text fontSize="xs" fontWeight="bold">{memoryUsagePercentage.toFixed(2)}%</Text>
+                            <Text fontSize="xs" fontWeight="bold">{formatValue(memoryUsagePercentage, 2)}%</Text>
                         </Flex>
-                        <AnimatedProgressBar value={memoryUsagePercentage} h="4px" />
+                        <AnimatedProgressBar value={memoryUsagePercentage || 0} h="4px" />
                     </Box>
 
                     {/* Utilization (integrated) */}
@@ -82,9 +85,9 @@ const GpuCard = ({ gpu }) => {
                                 <Icon as={FaTachometerAlt} mr={1} color="purple.500" />
                                 <Text fontSize="xs" fontWeight="medium">利用率</Text>
                             </Flex>
-                            <Text fontSize="xs" fontWeight="bold">{gpu.utilization.toFixed(2)}%</Text>
+                            <Text fontSize="xs" fontWeight="bold">{formatValue(gpu.utilization, 2)}%</Text>
                         </Flex>
-                        <AnimatedProgressBar value={gpu.utilization} h="4px" />
+                        <AnimatedProgressBar value={gpu.utilization || 0} h="4px" />
                     </Box>
                 </SimpleGrid>
             </CardBody>
@@ -1,10 +1,10 @@
 import React from 'react';
 import {
-    Box, Heading, Text, SimpleGrid, Stat, StatLabel, StatNumber, Icon,
+    Box, Heading, Text, SimpleGrid, Stat, StatLabel, StatNumber, StatHelpText, Icon,
     Divider, Flex, Badge, Accordion, AccordionItem, AccordionButton, AccordionPanel, AccordionIcon
 } from '@chakra-ui/react';
 // Updated icons to include FaPlug and FaPowerOff for online/offline status
-import { FaLaptop, FaMicrochip, FaExclamationTriangle, FaCheckCircle, FaTimesCircle, FaPlug, FaPowerOff } from 'react-icons/fa'; 
+import { FaLaptop, FaMicrochip, FaExclamationTriangle, FaCheckCircle, FaTimesCircle, FaPlug, FaPowerOff, FaServer, FaMemory } from 'react-icons/fa'; 
 
 import GpuCard from './GpuCard';
 
@@ -17,13 +17,16 @@ function NodeCard({ node }) {
     const onlineStatusText = isOnline ? "在线" : "离线";
     const onlineStatusIcon = isOnline ? FaPlug : FaPowerOff; // Use FaPlug for online, FaPowerOff for offline
 
-    // Determine guarded status properties
+    // Determine guarded status properties (守护进程按 GPU 启动)
+    const guardedGpus = node.guarded_gpus || [];
+    const idleGpus = node.idle_gpus || [];
     const guardedStatusColor = node.guard_running ? "green" : "red";
-    const guardedStatusText = node.guard_running ? "守护中" : "未守护";
+    const guardedStatusText = node.guard_running ? `守护中 ${guardedGpus.length}/${totalGpus}` : "未守护";
 
     // Determine needs guard status properties
     const needsGuardColor = node.need_guard ? "orange" : "gray";
     const needsGuardText = node.need_guard ? "需要守护" : "状态正常";
+    const unguardedIdleGpus = idleGpus.filter(index => !guardedGpus.includes(index));
 
     return (
         <Box p={6} shadow="lg" borderWidth="1px" borderRadius="lg" bg="white">
@@ -38,7 +41,11 @@ function NodeCard({ node }) {
                         colorScheme={onlineStatusColor}
                         mr={3} p={1} px={3}
                         borderRadius="full"
-                        title={isOnline ? "节点当前在线并可访问" : "节点当前离线或不可访问"}
+                        title={isOnline ? "节点当前在线并可访问" : (
+                            node.connection && node.connection.state === 'open'
+                                ? `节点当前离线，已连续连接失败 ${node.connection.failures} 次，${Math.max(0, Math.round(node.connection.next_attempt - Date.now() / 1000))} 秒后重试`
+                                : "节点当前离线或不可访问"
+                        )}
                     >
                         <Icon as={onlineStatusIcon} mr={1} />
                         {onlineStatusText}
@@ -48,7 +55,7 @@ function NodeCard({ node }) {
                         colorScheme={guardedStatusColor}
                         mr={3} p={1} px={3}
                         borderRadius="full"
-                        title={node.guard_running ? "该节点GPU守护进程正在运行" : "该节点GPU守护进程未运行"}
+                        title={node.guard_running ? `GPU ${guardedGpus.join(', ')} 的守护进程正在运行` : "该节点GPU守护进程未运行"}
                     >
                         <Icon as={node.guard_running ? FaCheckCircle : FaTimesCircle} mr={1} />
                         {guardedStatusText}
@@ -57,7 +64,7 @@ function NodeCard({ node }) {
                         colorScheme={needsGuardColor}
                         p={1} px={3}
                         borderRadius="full"
-                        title={node.need_guard ? "该节点GPU功耗低，可能需要启动守护进程" : "该节点GPU功耗正常，无需守护"}
+                        title={node.need_guard ? `GPU ${unguardedIdleGpus.join(', ')} 功耗低且未守护，可能需要启动守护进程` : "该节点GPU功耗正常或已守护，无需守护"}
                     >
                         <Icon as={FaExclamationTriangle} mr={1} />
                         {needsGuardText}
@@ -68,10 +75,38 @@ function NodeCard({ node }) {
             <Divider my={4} />
 
             {/* Display "Node Offline" message if the node is not online */}
-            {!isOnline ? (
+            {node.state === 'initializing' ? (
+                <Text color="gray.500" mb={4} fontWeight="semibold">节点初始化中，正在建立连接并获取GPU数据...</Text>
+            ) : !isOnline ? (
                 <Text color="red.600" mb={4} fontWeight="semibold">节点离线，无法获取GPU数据和管理守护进程。</Text>
             ) : (
                 <>
+                    {/* 节点 CPU 和内存使用情况（由后端探针采集） */}
+                    {(node.cpu || node.memory) && (
+                        <SimpleGrid columns={{ base: 1, sm: 2 }} spacing={4} mb={4}>
+                            {node.cpu && (
+                                <Stat p={3} borderWidth="1px" borderRadius="lg" bg="blue.50" title={`1分钟负载: ${node.cpu.load1} / ${node.cpu.cores} 核`}>
+                                    <StatLabel display="flex" alignItems="center">
+                                        <Icon as={FaServer} mr={2} color="blue.600" />
+                                        CPU 使用率
+                                    </StatLabel>
+                                    <StatNumber fontSize="xl">{node.cpu.percent.toFixed(1)} %</StatNumber>
+                                </Stat>
+                            )}
+                            {node.memory && (
+                                <Stat p={3} borderWidth="1px" borderRadius="lg" bg="blue.50" title={`${node.memory.used} / ${node.memory.total} MiB`}>
+                                    <StatLabel display="flex" alignItems="center">
+                                        <Icon as={FaMemory} mr={2} color="blue.600" />
+                                        内存使用
+                                    </StatLabel>
+                                    <StatNumber fontSize="xl">
+                                        {(node.memory.used / 1024).toFixed(1)} / {(node.memory.total / 1024).toFixed(1)} GiB
+                                    </StatNumber>
+                                </Stat>
+                            )}
+                        </SimpleGrid>
+                    )}
+
                     {totalGpus > 0 ? (
                         <SimpleGrid columns={{ base: 1, sm: 2, md: 3, lg: Math.min(totalGpus, 6), xl: Math.min(totalGpus, 8) }} spacing={4} mb={4}>
                             {node.gpus.map(gpu => (
@@ -83,6 +118,9 @@ function NodeCard({ node }) {
                                     <StatNumber fontSize="xl">
                                         {typeof gpu.power_draw === 'number' ? gpu.power_draw.toFixed(2) : 'N/A'} W
                                     </StatNumber>
+                                    <StatHelpText mb={0}>
+                                        {guardedGpus.includes(gpu.index) ? "守护中" : (idleGpus.includes(gpu.index) ? "空闲" : "使用中")}
+                                    </StatHelpText>
                                 </Stat>
                             ))}
                         </SimpleGrid>
@@ -124,4 +162,5 @@ function NodeCard({ node }) {
     );
 }
 
-export default NodeCard;
+// 节点数据未变化时（增量同步保持对象引用）跳过重新渲染
+export default React.memo(NodeCard);
@@ -1,11 +1,23 @@
 // src/hooks/useNodeMonitoring.js
 
-import { useState, useEffect, useCallback, useMemo } from 'react';
+import { useState, useEffect, useCallback, useRef } from 'react';
 import { useToast } from '@chakra-ui/react';
-import { fetchNodes, startGuard, stopGuard, updateGuardPolicy } from '../services/api';
+import { fetchNodesPage, subscribeSummary, startGuard, stopGuard, waitForGuardJob, updateGuardPolicy, fetchAutoGuard } from '../services/api';
 
-const useNodeMonitoring = () => {
+// 统计守护任务中各结果的节点数，例如 "running 10 个，failed 1 个"
+const summarizeGuardJob = (job) => {
+    const counts = {};
+    Object.values(job.results).forEach(result => {
+        counts[result] = (counts[result] || 0) + 1;
+    });
+    return Object.entries(counts).map(([result, count]) => `${result} ${count} 个`).join('，') || '没有可操作的节点';
+};
+
+// query: 服务端筛选/排序/分页参数 { status, q, sort, page, limit }，nodes 只包含当前页
+const useNodeMonitoring = (query) => {
     const [nodes, setNodes] = useState([]);
+    const [matchedNodes, setMatchedNodes] = useState(0); // 符合筛选条件的节点总数（用于分页）
+    const [summary, setSummary] = useState(null); // 后端维护的集群汇总
     const [initialLoading, setInitialLoading] = useState(true);
 
     // --- 新增的独立的加载状态 ---
@@ -39,7 +51,28 @@ const useNodeMonitoring = () => {
     const [isAutoGuardEnabled, setIsAutoGuardEnabled] = useState(true);
     const [isSavingPolicy, setIsSavingPolicy] = useState(false);
 
+    // 应用一页新的节点数据（来自轮询或推送触发的请求）。自动守护由后端按采集周期执行，前端只负责展示
+    const applyNodes = useCallback(async (fetchedData) => {
+        // 在这里保留 isOnline 的反转逻辑，因为你之前指出前端筛选是反的
+        setNodes(fetchedData.map(node => ({ ...node, isOnline: !node.isOnline })));
+        addEvent("节点数据已刷新。", "info");
+    }, [addEvent]);
 
+    const reportLoadError = useCallback((err) => {
+        const errorMessage = `无法加载节点数据：${err.message || err}`;
+        setError(errorMessage);
+        console.error("加载节点失败:", err);
+        toast({
+            title: "加载失败",
+            description: errorMessage,
+            status: "error",
+            duration: 5000,
+            isClosable: true,
+        });
+        addEvent(errorMessage, "error");
+    }, [toast, addEvent]);
+
+    const queryRef = useRef(query); // 当前的筛选/排序/分页参数
     const loadNodes = useCallback(async () => {
         if (initialLoading) {
             setInitialLoading(true); // 第一次加载时保持此状态为true
@@ -50,82 +83,84 @@ const useNodeMonitoring = () => {
         setError(null);
 
         try {
-            const fetchedData = await fetchNodes();
-            // 在这里保留 isOnline 的反转逻辑，因为你之前指出前端筛选是反的
-            const nodesWithCorrectedOnlineStatus = fetchedData.map(node => ({
-                ...node,
-                isOnline: !node.isOnline,
-            }));
-            setNodes(nodesWithCorrectedOnlineStatus);
-            addEvent("节点数据已刷新。", "info");
-
-            // 自动守护逻辑 (保持不变)
-            if (isAutoGuardEnabled) {
-                const nodesToAutoGuard = nodesWithCorrectedOnlineStatus.filter(node => node.need_guard && !node.guard_running && node.isOnline)
-                                                              .map(node => node.hostname);
-                if (nodesToAutoGuard.length > 0) {
-                    const message = `自动守护：检测到 ${nodesToAutoGuard.join(', ')} 需要守护。正在启动...`;
-                    toast({
-                        title: "自动守护：启动中",
-                        description: message,
-                        status: "info",
-                        duration: 3000,
-                        isClosable: true,
-                    });
-                    addEvent(message, "info");
-                    await startGuard(nodesToAutoGuard);
-                    const updatedDataAfterGuard = await fetchNodes();
-                    const updatedNodesWithCorrectedOnlineStatus = updatedDataAfterGuard.map(node => ({
-                        ...node,
-                        isOnline: !node.isOnline,
-                    }));
-                    setNodes(updatedNodesWithCorrectedOnlineStatus);
-                    const successMessage = `自动守护：节点 ${nodesToAutoGuard.join(', ')} 已开始守护。`;
-                    toast({
-                        title: "自动守护：已启动",
-                        description: successMessage,
-                        status: "success",
-                        duration: 3000,
-                        isClosable: true,
-                    });
-                    addEvent(successMessage, "success");
-                } else {
-                    addEvent("自动守护：未检测到需要守护的节点。", "info");
-                }
-            }
-
+            const page = await fetchNodesPage(queryRef.current);
+            setMatchedNodes(page.total);
+            setSummary(page.summary);
+            await applyNodes(page.nodes);
         } catch (err) {
-            const errorMessage = `无法加载节点数据或执行自动守护：${err.message || err}`;
-            setError(errorMessage);
-            console.error("加载节点失败:", err);
-            toast({
-                title: "加载失败",
-                description: errorMessage,
-                status: "error",
-                duration: 5000,
-                isClosable: true,
-            });
-            addEvent(errorMessage, "error");
+            reportLoadError(err);
         } finally {
             setInitialLoading(false); // 确保初始加载结束后设置为 false
             setIsRefreshingNodes(false); // 无论如何都结束刷新状态
         }
-    }, [initialLoading, toast, isAutoGuardEnabled, addEvent]);
+    }, [initialLoading, addEvent, applyNodes, reportLoadError]);
 
+    // 推送/轮询回调通过 ref 调用最新的函数，避免依赖变化导致反复重建推送连接
+    const loadNodesRef = useRef(loadNodes);
+    useEffect(() => {
+        loadNodesRef.current = loadNodes;
+    }, [loadNodes]);
 
+    // 筛选/排序/分页变化时重新请求当前页（输入搜索词时稍作延迟，避免每个字符都发请求）
+    const queryKey = JSON.stringify(query);
     useEffect(() => {
-        loadNodes();
-        const intervalId = setInterval(loadNodes, refreshInterval);
-        return () => clearInterval(intervalId);
-    }, [loadNodes, refreshInterval]);
+        queryRef.current = JSON.parse(queryKey);
+        const timer = setTimeout(() => loadNodesRef.current(), 300);
+        return () => clearTimeout(timer);
+    }, [queryKey]);
+
+    // 自动守护开关以后端状态为准
+    useEffect(() => {
+        fetchAutoGuard()
+            .then(state => {
+                setIsAutoGuardEnabled(state.enabled);
+                addEvent(`自动守护（后端）当前${state.enabled ? '已开启' : '已关闭'}。`, "info");
+            })
+            .catch(() => addEvent("无法获取后端自动守护状态。", "warning"));
+    }, [addEvent]);
+
+    useEffect(() => {
+        // 优先订阅后端推送；浏览器不支持或连接被关闭时退回定时轮询
+        let intervalId = null;
+        const startPolling = () => {
+            if (intervalId === null) {
+                loadNodesRef.current();
+                intervalId = setInterval(() => loadNodesRef.current(), refreshInterval);
+            }
+        };
+        // 推送只携带集群汇总，快照变化时再按当前筛选条件请求一页节点
+        const unsubscribe = subscribeSummary(
+            (event) => {
+                setSummary(event.summary);
+                loadNodesRef.current();
+            },
+            () => {
+                addEvent("实时推送连接已断开，改为定时刷新。", "warning");
+                startPolling();
+            }
+        );
+        if (!unsubscribe) {
+            startPolling();
+        }
+        return () => {
+            if (unsubscribe) {
+                unsubscribe();
+            }
+            if (intervalId !== null) {
+                clearInterval(intervalId);
+            }
+        };
+    }, [refreshInterval, addEvent]);
 
 
     const handleStartAllGuards = useCallback(async () => {
         setIsStartingAllGuards(true); // 专门用于此操作的加载状态
         try {
-            const allHostnames = nodes.map(node => node.hostname);
-            await startGuard(allHostnames);
-            const message = "手动操作：所有守护进程已启动。";
+            // 空列表表示全部节点（列表只包含当前页，不能用来枚举节点）
+            const { job_id: jobId } = await startGuard([]);
+            addEvent(`手动操作：已提交启动任务 ${jobId}，等待确认...`, "info");
+            const job = await waitForGuardJob(jobId);
+            const message = `手动操作：启动守护进程完成（${summarizeGuardJob(job)}）。`;
             toast({
                 title: "操作成功",
                 description: message,
@@ -148,15 +183,17 @@ const useNodeMonitoring = () => {
         } finally {
             setIsStartingAllGuards(false); // 结束加载状态
         }
-    }, [nodes, toast, loadNodes, addEvent]);
+    }, [toast, loadNodes, addEvent]);
 
 
     const handleStopAllGuards = useCallback(async () => {
         setIsStoppingAllGuards(true); // 专门用于此操作的加载状态
         try {
-            const allHostnames = nodes.map(node => node.hostname);
-            await stopGuard(allHostnames);
-            const message = "手动操作：所有守护进程已停止。";
+            // 空列表表示全部节点（列表只包含当前页，不能用来枚举节点）
+            const { job_id: jobId } = await stopGuard([]);
+            addEvent(`手动操作：已提交停止任务 ${jobId}，等待确认...`, "info");
+            const job = await waitForGuardJob(jobId);
+            const message = `手动操作：停止守护进程完成（${summarizeGuardJob(job)}）。`;
             toast({
                 title: "操作成功",
                 description: message,
@@ -179,7 +216,7 @@ const useNodeMonitoring = () => {
         } finally {
             setIsStoppingAllGuards(false); // 结束加载状态
         }
-    }, [nodes, toast, loadNodes, addEvent]);
+    }, [toast, loadNodes, addEvent]);
 
 
     const handleSavePolicy = useCallback(async () => {
@@ -202,8 +239,7 @@ const useNodeMonitoring = () => {
             addEvent(message, "success");
 
             if (isAutoGuardEnabled) {
-                addEvent("自动守护策略已启用。", "info");
-                loadNodes();
+                addEvent("自动守护策略已启用，由后端按采集周期自动执行。", "info");
             } else {
                 addEvent("自动守护策略已禁用。", "warning");
             }
@@ -220,34 +256,16 @@ const useNodeMonitoring = () => {
         } finally {
             setIsSavingPolicy(false);
         }
-    }, [activePowerThreshold, guardIntervalMinutes, toast, isAutoGuardEnabled, loadNodes, addEvent]);
-
-    // 计算总览数据 (保持不变)
-    const totalNodes = nodes.length;
-    const guardedNodes = nodes.filter(node => node.guard_running).length;
-    const needGuardNodes = nodes.filter(node => node.need_guard).length;
-    const onlineNodesCount = useMemo(() => {
-        return nodes.filter(node => node.isOnline).length;
-    }, [nodes]);
-
-    let totalGpus = 0;
-    let totalGpuPowerDraw = 0;
-    let totalGpuUtilization = 0;
-    let activeGpusCount = 0;
-
-    nodes.forEach(node => {
-        totalGpus += node.gpus.length;
-        node.gpus.forEach(gpu => {
-            totalGpuPowerDraw += gpu.power_draw;
-            if (gpu.utilization > 0) {
-                totalGpuUtilization += gpu.utilization;
-                activeGpusCount++;
-            }
-        });
-    });
-    const averageGpuUtilization = activeGpusCount > 0 ? (totalGpuUtilization / activeGpusCount) : 0;
-    const averageTotalGpuPowerDraw = totalGpus > 0 ? (totalGpuPowerDraw / totalGpus) : 0;
+    }, [activePowerThreshold, guardIntervalMinutes, toast, isAutoGuardEnabled, addEvent]);
 
+    // 总览数据来自后端增量维护的集群汇总，与当前页无关
+    const totalNodes = summary ? summary.nodes : 0;
+    const guardedNodes = summary ? summary.nodes_guarding : 0;
+    const needGuardNodes = summary ? summary.nodes_need_guard : 0;
+    const onlineNodesCount = summary ? summary.nodes_online : 0;
+    const totalGpus = summary ? summary.gpus : 0;
+    const averageTotalGpuPowerDraw = summary ? summary.power_draw_avg : null;
+    const averageGpuUtilization = summary ? summary.utilization_avg : 0;
 
     return {
         nodes, initialLoading, error, events, onClearEvents, addEvent,
@@ -260,7 +278,7 @@ const useNodeMonitoring = () => {
         isSavingPolicy,
         // --- 结束新的加载状态 ---
         totalNodes, guardedNodes, needGuardNodes, totalGpus, averageTotalGpuPowerDraw, averageGpuUtilization,
-        onlineNodesCount,
+        onlineNodesCount, matchedNodes, summary,
         loadNodes, handleStartAllGuards, handleStopAllGuards, handleSavePolicy
     };
 };
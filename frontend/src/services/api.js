@@ -2,17 +2,62 @@ import axios from 'axios';
 
 // Flask 后端 API 的基本 URL
 const API_BASE_URL = 'http://' + window.location.hostname + ':5000/api';
-export const fetchNodes = async () => {
+
+// 请求紧凑格式：GPU 数据按列存放、型号名去重、数值取整，体积和后端序列化开销都小得多
+const WIRE_FORMAT = 'compact';
+
+// 把紧凑格式（format=compact）还原为普通格式：每个节点的 gpus 由 {列名: [值...]} 转回对象数组
+export const decodeCompactPayload = (payload) => {
+    if (payload.format !== 'compact') {
+        return payload;
+    }
+    const { gpu_fields: fields, gpu_names: names } = payload;
+    const nodes = payload.nodes.map(node => {
+        const columns = node.gpus;
+        const gpus = columns.index.map((_, i) => {
+            const gpu = {};
+            fields.forEach(field => {
+                gpu[field] = field === 'name' ? names[columns.name[i]] : columns[field][i];
+            });
+            return gpu;
+        });
+        return { ...node, gpus };
+    });
+    return { epoch: payload.epoch, version: payload.version, full: payload.full, nodes, removed: payload.removed };
+};
+
+// 服务端筛选、排序和分页：query 为 { status, q, sort, order, page, limit }，
+// 返回 { total, page, limit, nodes, summary }，只包含当前页的节点
+export const fetchNodesPage = async (query) => {
     try {
-        // 请求所有节点数据
-        const response = await axios.get(`${API_BASE_URL}/nodes_data`);
-        return response.data;
+        const params = { ...query, format: WIRE_FORMAT };
+        const response = await axios.get(`${API_BASE_URL}/nodes_data`, { params });
+        const payload = decodeCompactPayload(response.data);
+        const { total, page, limit, summary } = response.data;
+        return { total, page, limit, summary, nodes: payload.nodes };
     } catch (error) {
         console.error("获取节点数据失败:", error);
         throw error;
     }
 };
 
+// 订阅集群汇总推送：快照每次变化时回调 onSummary({ epoch, version, summary })。
+// 浏览器不支持 EventSource 时返回 null；连接被关闭（无法自动重连）时回调 onError。返回取消订阅函数。
+export const subscribeSummary = (onSummary, onError) => {
+    if (typeof window.EventSource === 'undefined') {
+        return null;
+    }
+    const source = new EventSource(`${API_BASE_URL}/stream?view=summary`);
+    source.addEventListener('summary', (event) => onSummary(JSON.parse(event.data)));
+    source.onerror = (error) => {
+        if (source.readyState === EventSource.CLOSED) {
+            console.error("实时推送连接已关闭:", error);
+            onError(error);
+        }
+    };
+    return () => source.close();
+};
+
 export const startGuard = async (hostnames = []) => {
     try {
         // 向后端发送启动守护进程的请求
@@ -35,6 +80,28 @@ export const stopGuard = async (hostnames = []) => {
     }
 };
 
+export const fetchGuardJob = async (jobId) => {
+    try {
+        // 查询守护进程启停任务的状态和每个节点的结果
+        const response = await axios.get(`${API_BASE_URL}/guard_jobs/${jobId}`);
+        return response.data;
+    } catch (error) {
+        console.error("获取守护任务状态失败:", error);
+        throw error;
+    }
+};
+
+// 轮询守护任务直到完成（后端确认时间有上限），返回最终的任务信息
+export const waitForGuardJob = async (jobId, interval = 1000) => {
+    for (;;) {
+        const job = await fetchGuardJob(jobId);
+        if (job.status === 'done') {
+            return job;
+        }
+        await new Promise(resolve => setTimeout(resolve, interval));
+    }
+};
+
 export const updateGuardPolicy = async (policy) => {
     // In a real application, you would send this policy to your backend.
     // Example:
@@ -48,3 +115,13 @@ export const updateGuardPolicy = async (policy) => {
     }
 };
 
+export const fetchAutoGuard = async () => {
+    try {
+        // 获取后端自动守护的状态（开关、待启动节点、最近的启动记录等）
+        const response = await axios.get(`${API_BASE_URL}/auto_guard`);
+        return response.data;
+    } catch (error) {
+        console.error("获取自动守护状态失败:", error);
+        throw error;
+    }
+};